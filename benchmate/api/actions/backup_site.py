@@ -1,116 +1,100 @@
+import json
 import os
-import subprocess
-import time
 
 import frappe
 
+from benchmate.api.log_sink import LogSink
+from benchmate.api.runner import SITE_BACKUP_PATH, get_low_priority, run_bench_command, run_bench_script
+from benchmate.api.scheduler import is_cancel_requested, submit_action
 from benchmate.api.utils import get_benchmate_settings
 
 
-def update_backup_log_status(docname, new_text=None, status=None):
-	"""
-	Update the BM Log record for a given docname.
-	Appends log text and/or updates the status field, committing immediately.
-	"""
-	try:
-		log_doc = frappe.get_doc("BM Log", docname)
-
-		# Append new log text if provided
-		if new_text:
-			updated_log = (log_doc.log or "") + new_text
-			log_doc.db_set("log", updated_log, update_modified=False)
-
-		# Update status if provided
-		if status:
-			log_doc.db_set("status", status, update_modified=False)
-
-		frappe.db.commit()
-		log_doc.reload()
-	except Exception as e:
-		frappe.log_error(f"Error updating BM Log: {e}", "BenchMate SiteBackupLogs")
-
-
-def backup_site_background(bench_name: str, bench_path: str, site_name: str, sudo_password: str):
+def backup_site_background(
+	bench_name: str,
+	bench_path: str,
+	site_name: str,
+	sudo_password: str,
+	log_name: str,
+	low_priority: int = 0,
+):
 	"""
 	Background task to take a backup of a Frappe site inside a given bench.
-	Captures real-time logs into BM Log doctype,
-	and cleans up temporary log files after completion.
+	Streams the command output into the BM Log doctype as it arrives.
+	Bulk backups pass `low_priority` to run with the nice and I/O priority set in BM Settings.
 	"""
 	bench_path = os.path.abspath(bench_path)
-	log_file = os.path.join(bench_path, f"bench_backup_site_{site_name}.log")
-
-	# Create a unique BM Log record for tracking
-	log_timestamp = int(time.time())
-	log_name = f"Backup Site-{log_timestamp}"
-	if not frappe.db.exists("BM Log", log_name):
-		frappe.get_doc(
-			{
-				"doctype": "BM Log",
-				"title": f"Backup Site - {site_name}",
-				"log": "",
-				"log_timestamp": log_timestamp,
-				"status": "In Process",
-				"action": "Backup Site",
-			}
-		).insert(ignore_permissions=True)
-		frappe.db.commit()
+	backup_path = os.path.join(bench_path, "sites", site_name, "private", "backups")
+
+	# Buffer output into the BM Log created when the action was queued
+	log = LogSink(log_name, error_title="BenchMate SiteBackupLogs")
 
 	# Command to run backup with files
-	cmd = [
-		"sudo",
-		"-S",
-		"bench",
+	args = [
 		"--site",
 		site_name,
 		"backup",
 		"--with-files",
 	]
 
+	# Run the command, streaming its output into the BM Log as it arrives
 	try:
-		# Launch subprocess and redirect stdout/stderr into a log file
-		with open(log_file, "w") as f:
-			proc = subprocess.Popen(
-				cmd,
-				cwd=bench_path,
-				stdin=subprocess.PIPE,
-				stdout=f,
-				stderr=subprocess.STDOUT,
-				text=True,
+		settings = get_benchmate_settings()
+		jobs = str(settings.get("backup_jobs"))
+		priority = get_low_priority() if low_priority else None
+		existing_files = list_backup_files(backup_path)
+
+		# Deduplicated files: only new or changed files are written to the site's file store
+		dedup_files = settings.get("file_backup_mode") == "Deduplicated"
+		if dedup_files:
+			args.remove("--with-files")
+
+		# Parallel engine: dump the tables concurrently and write a manifest next to the backup
+		if settings.get("backup_engine") == "Parallel":
+			result = run_bench_script(
+				SITE_BACKUP_PATH,
+				[
+					"dump",
+					"--site",
+					site_name,
+					"--jobs",
+					jobs,
+					"--dedup-files" if dedup_files else "--with-files",
+				],
+				bench_path=bench_path,
+				sink=log,
+				sudo_password=sudo_password,
+				cancel_check=lambda: is_cancel_requested(log_name),
+				timeout=900,  # Terminate the backup after 15 mins
+				priority=priority,
 			)
-			# Send sudo password
-			proc.stdin.write(sudo_password + "\n")
-			proc.stdin.flush()
-			proc.stdin.close()
-
-			# Wait for process completion with timeout (15 mins)
-			try:
-				proc.wait(timeout=900)
-			except subprocess.TimeoutExpired:
-				proc.kill()
-				update_backup_log_status(
-					log_name,
-					new_text="\nTimed out while taking backup!\n",
-					status="Error",
-				)
-				frappe.msgprint(
-					msg=f"Timeout expired while backing up site {site_name}.",
-					title="Site Backup Timeout",
-					alert=True,
-					indicator="red",
+		else:
+			result = run_bench_command(
+				args,
+				bench_path=bench_path,
+				sink=log,
+				sudo_password=sudo_password,
+				cancel_check=lambda: is_cancel_requested(log_name),
+				timeout=900,  # Terminate the command after 15 mins
+				priority=priority,
+			)
+			if dedup_files and result["outcome"] == "success":
+				result = run_bench_script(
+					SITE_BACKUP_PATH,
+					["backup-files", "--site", site_name, "--jobs", jobs],
+					bench_path=bench_path,
+					sink=log,
+					sudo_password=sudo_password,
+					cancel_check=lambda: is_cancel_requested(log_name),
+					timeout=900,  # Terminate the file backup after 15 mins
+					priority=priority,
 				)
-				return
 
-		# Tail the log file and update BM Log in real-time
-		with open(log_file) as f:
-			f.seek(0, os.SEEK_SET)
-			for line in f:
-				update_backup_log_status(log_name, new_text=line)
-
-		# Update status based on exit code
-		if proc.returncode == 0:
-			update_backup_log_status(log_name, status="Success")
-		else:
-			update_backup_log_status(log_name, status="Error")
+		# Size of the files this backup wrote, shown per site in bulk backups
+		if result["outcome"] == "success":
+			new_files = dict(list_backup_files(backup_path).items() - existing_files.items())
+			backup_size = sum(new_files.values()) + get_file_store_bytes(backup_path, new_files)
+			frappe.db.set_value("BM Log", log_name, "backup_size", backup_size, update_modified=False)
+		log.set_status(result["status"])
 
 	except Exception as e:
 		frappe.msgprint(
@@ -121,31 +105,91 @@ def backup_site_background(bench_name: str, bench_path: str, site_name: str, sud
 			indicator="red",
 		)
 		frappe.log_error(f"Error running bench backup: {e}", "BenchMate SiteBackupLogs")
-		update_backup_log_status(log_name, status="Error")
+		log.set_status("Error")
 
 	else:
-		frappe.msgprint(
-			msg=f"Backup for site {site_name} completed successfully in bench {bench_name}",
-			title="Site Backup Success",
-			realtime=True,
-			alert=True,
-			indicator="green",
-		)
+		# Notify the user based on how the command ended
+		if result["outcome"] == "success":
+			frappe.msgprint(
+				msg=f"Backup for site {site_name} completed successfully in bench {bench_name}",
+				title="Site Backup Success",
+				realtime=True,
+				alert=True,
+				indicator="green",
+			)
+		elif result["outcome"] == "timeout":
+			frappe.msgprint(
+				msg=f"Timeout expired while backing up site {site_name}.",
+				title="Site Backup Timeout",
+				realtime=True,
+				alert=True,
+				indicator="red",
+			)
+		elif result["outcome"] == "cancelled":
+			frappe.msgprint(
+				msg=f"Backup of site {site_name} was cancelled.",
+				title="Site Backup Cancelled",
+				realtime=True,
+				alert=True,
+				indicator="orange",
+			)
+		else:
+			frappe.msgprint(
+				msg=f"Error while taking backup of site {site_name} in bench {bench_name}",
+				title="Site Backup Error",
+				realtime=True,
+				alert=True,
+				indicator="red",
+			)
 
 	finally:
-		# Always clean up the temporary log file
+		# Write any output still buffered
+		log.close()
+
+
+def list_backup_files(backup_path: str) -> dict[str, int]:
+	"""
+	List the files in the backup folder of a site with their sizes.
+
+	Args:
+		backup_path (str): `private/backups` folder of the site.
+
+	Returns:
+		dict[str, int]: Size of every file by name, empty when the folder cannot be read.
+	"""
+	try:
+		with os.scandir(backup_path) as entries:
+			return {entry.name: entry.stat().st_size for entry in entries if entry.is_file()}
+	except OSError:
+		return {}
+
+
+def get_file_store_bytes(backup_path: str, file_names) -> int:
+	"""
+	Bytes that deduplicated file backups added to the site's file store.
+	Their `<prefix>-files.json` manifests only list chunks, the chunks themselves live in the store.
+
+	Args:
+		backup_path (str): `private/backups` folder of the site.
+		file_names (Iterable[str]): Files the backup wrote to the folder.
+
+	Returns:
+		int: Sum of `written_bytes` in the stats of the files manifests, 0 without any.
+	"""
+	written = 0
+	for name in file_names:
+		if not name.endswith("-files.json"):
+			continue
 		try:
-			if os.path.exists(log_file):
-				os.remove(log_file)
-		except Exception as cleanup_error:
-			frappe.log_error(
-				f"Failed to remove temp log file {log_file}: {cleanup_error}",
-				"BenchMate SiteBackupLogs",
-			)
+			with open(os.path.join(backup_path, name), encoding="utf-8") as manifest:
+				written += json.load(manifest).get("stats", {}).get("written_bytes") or 0
+		except (OSError, ValueError, AttributeError):
+			continue
+	return written
 
 
 @frappe.whitelist()
-def execute(bench_name: str, bench_path: str, site_name: str):
+def execute(bench_name: str, bench_path: str, site_name: str, priority: int = 0):
 	"""
 	Public API method (whitelisted) to enqueue site backup.
 	Validates input and enqueues the background site backup task.
@@ -160,15 +204,14 @@ def execute(bench_name: str, bench_path: str, site_name: str):
 	if not sudo_password:
 		frappe.throw("Sudo password not configured", frappe.ValidationError)
 
+	# Queue the action, the scheduler starts it once the site and bench are free
 	try:
-		frappe.enqueue(
-			backup_site_background,
-			queue="long",
-			timeout=3600,
+		log_name = submit_action(
+			"Backup Site",
 			bench_name=bench_name,
 			bench_path=bench_path,
 			site_name=site_name,
-			sudo_password=sudo_password,
+			priority=priority,
 		)
 	except Exception as e:
 		frappe.throw(f"Failed to enqueue site backup: {e!s}")
@@ -178,5 +221,5 @@ def execute(bench_name: str, bench_path: str, site_name: str):
 		"message": (
 			f"Backing up site <b>{site_name}</b> in the background. Check the <b>BM Log</b> for more details."
 		),
-		"data": None,
+		"data": {"log": log_name},
 	}
@@ -0,0 +1,255 @@
+import time
+
+import frappe
+from frappe.utils import format_duration, get_datetime, now_datetime, time_diff_in_seconds
+from frappe.utils.synchronization import filelock
+
+from benchmate.api.log_sink import LogSink
+from benchmate.api.scheduler import dispatch_actions, submit_action
+from benchmate.api.utils import get_benchmate_settings
+
+# ? Statuses of a site backup that did not end yet
+PENDING_STATUSES = ["Queued", "In Process"]
+
+
+def format_size(size: float | None) -> str:
+	"""Human readable size, e.g. "1.5 GB", "-" when unknown."""
+	if size is None:
+		return "-"
+	for unit in ("B", "KB", "MB", "GB"):
+		if size < 1024:
+			return f"{size:.1f} {unit}"
+		size /= 1024
+	return f"{size:.1f} TB"
+
+
+def get_target_sites(
+	bench_name: str | None = None, site_names: list[str] | None = None, filters: list | dict | None = None
+) -> list[dict]:
+	"""
+	Resolve the sites of a bulk backup, active sites unless the filters ask for a status.
+
+	Args:
+		bench_name (str | None): Only the sites of this bench.
+		site_names (list[str] | None): Only these BM Sites.
+		filters (list | dict | None): Further BM Site filters, e.g. {"site_name": ["like", "%.example.com"]}.
+
+	Returns:
+		list[dict]: {"name", "site_name", "bench_name", "bench_path"} of every site, by bench and site.
+	"""
+	site_filters = []
+	if isinstance(filters, dict):
+		for field, value in filters.items():
+			site_filters.append([field, *value] if isinstance(value, list | tuple) else [field, "=", value])
+	elif filters:
+		site_filters = list(filters)
+
+	if not any("status" in condition for condition in site_filters):
+		site_filters.append(["status", "=", "Active"])
+	if bench_name:
+		site_filters.append(["bench_name", "=", bench_name])
+	if site_names:
+		site_filters.append(["name", "in", site_names])
+
+	sites = frappe.get_all(
+		"BM Site",
+		filters=site_filters,
+		fields=["name", "site_name", "bench_name"],
+		order_by="bench_name asc, site_name asc",
+		limit_page_length=0,
+	)
+	bench_paths = dict(
+		frappe.get_all(
+			"BM Bench",
+			filters={"name": ["in", list({site.bench_name for site in sites})]},
+			fields=["name", "path"],
+			as_list=True,
+		)
+	)
+	return [
+		{**site, "bench_path": bench_paths[site.bench_name]}
+		for site in sites
+		if bench_paths.get(site.bench_name)
+	]
+
+
+def record_site_backup(bulk_log: str, log_name: str | None = None):
+	"""
+	Add the result of a site backup to the aggregated BM Log of its bulk backup.
+	Once every site backup ended, the aggregated log gets a summary of all sites and its final status.
+
+	Args:
+		bulk_log (str): Aggregated BM Log of the bulk backup.
+		log_name (str | None): BM Log of the site backup that ended, None to only finalize the
+			aggregated log, e.g. from `reclaim_stale_actions` after recording a backup failed.
+	"""
+	# ? Site backups end on several workers, one of them writes the summary
+	with filelock(f"benchmate_bulk_action_{bulk_log}", timeout=60, is_global=True):
+		log = LogSink(bulk_log, error_title="BenchMate BulkBackupLogs")
+		if log_name:
+			entry = frappe.db.get_value(
+				"BM Log",
+				log_name,
+				["name", "site_name", "bench_name", "status", "started_on", "ended_on", "backup_size"],
+				as_dict=True,
+			)
+			log.write(
+				f"{entry.bench_name}/{entry.site_name}: {entry.status} in {get_duration(entry)}, "
+				f"{format_size(entry.backup_size if entry.status == 'Success' else None)} ({entry.name})\n"
+			)
+
+		pending = frappe.db.count("BM Log", {"bulk_log": bulk_log, "status": ["in", PENDING_STATUSES]})
+		if pending or frappe.db.get_value("BM Log", bulk_log, "status") != "In Process":
+			log.close()
+			return
+
+		entries = frappe.get_all(
+			"BM Log",
+			filters={"bulk_log": bulk_log},
+			fields=["name", "site_name", "bench_name", "status", "started_on", "ended_on", "backup_size"],
+			order_by="bench_name asc, site_name asc",
+			limit_page_length=0,
+		)
+		log.write(format_summary(bulk_log, entries))
+
+		statuses = {entry.status for entry in entries}
+		status = "Success" if statuses == {"Success"} else "Cancelled" if "Error" not in statuses else "Error"
+		frappe.db.set_value("BM Log", bulk_log, "ended_on", now_datetime(), update_modified=False)
+		log.set_status(status)
+
+
+def get_duration(entry) -> str:
+	"""How long a site backup ran, "-" when it never started."""
+	if not entry.started_on or not entry.ended_on:
+		return "-"
+	return format_duration(
+		round(time_diff_in_seconds(get_datetime(entry.ended_on), get_datetime(entry.started_on)))
+	)
+
+
+def format_summary(bulk_log: str, entries: list) -> str:
+	"""
+	Table of every site backup of a bulk backup with its status, duration and size, then the totals.
+
+	Args:
+		bulk_log (str): Aggregated BM Log of the bulk backup.
+		entries (list): BM Logs of the site backups.
+
+	Returns:
+		str: Summary to append to the aggregated log.
+	"""
+	rows = [("Site", "Bench", "Status", "Duration", "Size", "Log")]
+	for entry in entries:
+		size = entry.backup_size if entry.status == "Success" else None
+		rows.append(
+			(
+				entry.site_name,
+				entry.bench_name,
+				entry.status,
+				get_duration(entry),
+				format_size(size),
+				entry.name,
+			)
+		)
+
+	widths = [max(len(str(row[column])) for row in rows) for column in range(len(rows[0]))]
+	lines = ["", "Summary:"]
+	for row in rows:
+		lines.append("  ".join(str(value).ljust(width) for value, width in zip(row, widths, strict=True)))
+
+	succeeded = [entry for entry in entries if entry.status == "Success"]
+	elapsed = time_diff_in_seconds(
+		now_datetime(), get_datetime(frappe.db.get_value("BM Log", bulk_log, "creation"))
+	)
+	lines.append(
+		f"\nBacked up {len(succeeded)} of {len(entries)} sites in {format_duration(round(elapsed))}, "
+		f"{format_size(sum(entry.backup_size or 0 for entry in succeeded))} in total"
+	)
+	return "\n".join(lines) + "\n"
+
+
+# ! benchmate.api.actions.backup_sites.execute
+@frappe.whitelist()
+def execute(
+	bench_name: str | None = None,
+	site_names: str | list | None = None,
+	filters: str | list | dict | None = None,
+	priority: int = -1,
+):
+	"""
+	Back up many sites at once: all active sites, the sites of one bench or a filtered list.
+
+	Every site gets its own "Backup Site" action, run at the nice and I/O priority set in BM Settings
+	within the limits of the scheduler ("Heavy I/O Actions", "Heavy I/O Actions Per Disk"). An aggregated
+	"Backup Sites" BM Log lists every site with its status, duration and backup size as it ends.
+
+	Args:
+		bench_name (str | None): Only back up the sites of this bench.
+		site_names (str | list | None): Only back up these BM Sites, a list or its JSON.
+		filters (str | list | dict | None): Further BM Site filters, or their JSON.
+		priority (int): Priority of the site backups, below single actions by default.
+
+	Returns:
+		dict: {"success", "message", "data"} with the aggregated BM Log and the number of sites.
+	"""
+	# ? Fetch global BenchMate settings (sudo password)
+	settings = get_benchmate_settings()
+	if not settings.get("sudo_password"):
+		frappe.throw("Sudo password not configured", frappe.ValidationError)
+
+	sites = get_target_sites(
+		bench_name=bench_name,
+		site_names=frappe.parse_json(site_names) if site_names else None,
+		filters=frappe.parse_json(filters) if filters else None,
+	)
+	if not sites:
+		frappe.throw("No sites to back up", frappe.ValidationError)
+
+	# ? Queue every site backup behind one aggregated log, then start what the limits allow
+	try:
+		bulk_log = frappe.get_doc(
+			{
+				"doctype": "BM Log",
+				"title": f"Backup Sites - {bench_name or f'{len(sites)} Sites'}",
+				"log": "",
+				"log_timestamp": int(time.time()),
+				"status": "Queued",
+				"action": "Backup Sites",
+				"bench_name": bench_name,
+				"priority": frappe.utils.cint(priority),
+			}
+		).insert(ignore_permissions=True)
+
+		with LogSink(bulk_log.name, error_title="BenchMate BulkBackupLogs") as log:
+			try:
+				log.write(f"Backing up {len(sites)} sites:\n")
+				for site in sites:
+					log_name = submit_action(
+						"Backup Site",
+						bench_name=site["bench_name"],
+						bench_path=site["bench_path"],
+						site_name=site["site_name"],
+						priority=priority,
+						bulk_log=bulk_log.name,
+						dispatch=False,
+						low_priority=1,
+					)
+					log.write(f"Queued {site['bench_name']}/{site['site_name']} ({log_name})\n")
+				log.write("\n")
+			finally:
+				# ? Site backups started meanwhile may already end, the aggregated log only gets its
+				# ? summary once it is In Process, i.e. once every site backup is queued
+				log.set_status("In Process")
+
+		# ? Also finalizes the aggregated log when its site backups all ended already
+		dispatch_actions()
+	except Exception as e:
+		frappe.throw(f"Failed to enqueue the bulk backup: {e!s}")
+
+	return {
+		"success": True,
+		"message": (
+			f"Backing up <b>{len(sites)}</b> sites in the background. Check the <b>BM Log</b> for more details."
+		),
+		"data": {"log": bulk_log.name, "sites": len(sites)},
+	}
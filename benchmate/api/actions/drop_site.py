@@ -1,67 +1,32 @@
 import os
-import subprocess
-import time
 
 import frappe
 
+from benchmate.api.log_sink import LogSink
+from benchmate.api.runner import run_bench_command
+from benchmate.api.scheduler import is_cancel_requested, submit_action
 from benchmate.api.utils import get_benchmate_settings
 
 
-def update_deletion_log_status(docname, new_text=None, status=None):
-	"""
-	? Update the BM Log record for a given docname.
-	? Appends log text and/or updates the status field, committing immediately.
-	"""
-	try:
-		log_doc = frappe.get_doc("BM Log", docname)
-
-		# ? Append new log text if provided
-		if new_text:
-			updated_log = (log_doc.log or "") + new_text
-			log_doc.db_set("log", updated_log, update_modified=False)
-
-		# ? Update status if provided
-		if status:
-			log_doc.db_set("status", status, update_modified=False)
-
-		frappe.db.commit()
-		log_doc.reload()
-	except Exception as e:
-		frappe.log_error(f"Error updating BM Log: {e}", "BenchMate SiteDeletionLogs")
-
-
 def drop_site_background(
-	bench_name: str, bench_path: str, site_name: str, sudo_password: str, mysql_root_password: str
+	bench_name: str,
+	bench_path: str,
+	site_name: str,
+	sudo_password: str,
+	mysql_root_password: str,
+	log_name: str,
 ):
 	"""
 	Background task to drop (delete) a Frappe site inside a given bench.
-	Captures real-time logs into BM Log doctype,
-	and cleans up temporary log files after completion.
+	Streams the command output into the BM Log doctype as it arrives.
 	"""
 	bench_path = os.path.abspath(bench_path)
-	log_file = os.path.join(bench_path, f"bench_drop_site_{site_name}.log")
-
-	# ? Create a unique BM Log record for tracking
-	log_timestamp = int(time.time())
-	log_name = f"Drop Site-{log_timestamp}"
-	if not frappe.db.exists("BM Log", log_name):
-		frappe.get_doc(
-			{
-				"doctype": "BM Log",
-				"title": f"Drop Site - {site_name}",
-				"log": "",
-				"log_timestamp": log_timestamp,
-				"status": "In Process",
-				"action": "Drop Site",
-			}
-		).insert(ignore_permissions=True)
-		frappe.db.commit()
+
+	# ? Buffer output into the BM Log created when the action was queued
+	log = LogSink(log_name, error_title="BenchMate SiteDeletionLogs")
 
 	# ? Command to drop the site with root DB password, no --verbose
-	cmd = [
-		"sudo",
-		"-S",
-		"bench",
+	args = [
 		"drop-site",
 		site_name,
 		"--db-root-password",
@@ -70,53 +35,20 @@ def drop_site_background(
 		"--force",
 	]
 
-	# ? Launch subprocess and redirect stdout/stderr into a log file
+	# ? Run the command, streaming its output into the BM Log as it arrives
 	try:
-		with open(log_file, "w") as f:
-			proc = subprocess.Popen(
-				cmd,
-				cwd=bench_path,
-				stdin=subprocess.PIPE,
-				stdout=f,
-				stderr=subprocess.STDOUT,
-				text=True,
-			)
-			# ? Send sudo password to subprocess
-			proc.stdin.write(sudo_password + "\n")
-			proc.stdin.flush()
-			proc.stdin.close()
-
-			# ? Wait for process completion with timeout (10 mins)
-			try:
-				proc.wait(timeout=600)
-			except subprocess.TimeoutExpired:
-				proc.kill()
-				update_deletion_log_status(
-					log_name,
-					new_text="\nTimed out while deleting site!\n",
-					status="Error",
-				)
-				frappe.msgprint(
-					msg=f"Timeout expired while deleting site {site_name}.",
-					title="Site Deletion Timeout",
-					alert=True,
-					indicator="red",
-				)
-				return
-
-		# ? Tail the log file and update BM Log in real-time
-		with open(log_file) as f:
-			f.seek(0, os.SEEK_SET)
-			# ? Stream entire log file content to document
-			for line in f:
-				update_deletion_log_status(log_name, new_text=line)
-
-		# ? Update status based on exit code
-		if proc.returncode == 0:
-			update_deletion_log_status(log_name, status="Success")
+		result = run_bench_command(
+			args,
+			bench_path=bench_path,
+			sink=log,
+			sudo_password=sudo_password,
+			cancel_check=lambda: is_cancel_requested(log_name),
+			timeout=600,  # ? Terminate the command after 10 mins
+		)
+		log.set_status(result["status"])
+
+		if result["outcome"] == "success":
 			remove_bm_site(bench_name=bench_name, bench_path=bench_path, site_name=site_name)
-		else:
-			update_deletion_log_status(log_name, status="Error")
 
 	except Exception as e:
 		frappe.msgprint(
@@ -127,27 +59,46 @@ def drop_site_background(
 			indicator="red",
 		)
 		frappe.log_error(f"Error running bench drop-site: {e}", "BenchMate SiteDeletionLogs")
-		update_deletion_log_status(log_name, status="Error")
+		log.set_status("Error")
 
 	else:
-		frappe.msgprint(
-			msg=f"Site {site_name} deleted successfully from bench {bench_name}",
-			title="Site Deletion Success",
-			realtime=True,
-			alert=True,
-			indicator="green",
-		)
+		# ? Notify the user based on how the command ended
+		if result["outcome"] == "success":
+			frappe.msgprint(
+				msg=f"Site {site_name} deleted successfully from bench {bench_name}",
+				title="Site Deletion Success",
+				realtime=True,
+				alert=True,
+				indicator="green",
+			)
+		elif result["outcome"] == "timeout":
+			frappe.msgprint(
+				msg=f"Timeout expired while deleting site {site_name}.",
+				title="Site Deletion Timeout",
+				realtime=True,
+				alert=True,
+				indicator="red",
+			)
+		elif result["outcome"] == "cancelled":
+			frappe.msgprint(
+				msg=f"Deletion of site {site_name} was cancelled.",
+				title="Site Deletion Cancelled",
+				realtime=True,
+				alert=True,
+				indicator="orange",
+			)
+		else:
+			frappe.msgprint(
+				msg=f"Error While Deleting Site {site_name} in bench {bench_name}",
+				title="Site Deletion Error",
+				realtime=True,
+				alert=True,
+				indicator="red",
+			)
 
 	finally:
-		# ? Always clean up the temporary log file
-		try:
-			if os.path.exists(log_file):
-				os.remove(log_file)
-		except Exception as cleanup_error:
-			frappe.log_error(
-				f"Failed to remove temp log file {log_file}: {cleanup_error}",
-				"BenchMate SiteDeletionLogs",
-			)
+		# ? Write any output still buffered
+		log.close()
 
 
 def remove_bm_site(bench_name: str, bench_path: str, site_name: str):
@@ -163,7 +114,7 @@ def remove_bm_site(bench_name: str, bench_path: str, site_name: str):
 
 
 @frappe.whitelist()
-def execute(bench_name: str, bench_path: str, site_name: str):
+def execute(bench_name: str, bench_path: str, site_name: str, priority: int = 0):
 	"""
 	? Public API method (whitelisted) to enqueue site deletion.
 	? Validates input and enqueues the background site deletion task.
@@ -182,17 +133,14 @@ def execute(bench_name: str, bench_path: str, site_name: str):
 	if not mysql_root_password:
 		frappe.throw("MySQL root password not configured", frappe.ValidationError)
 
-	# ? Enqueue background task for long execution
+	# ? Queue the action, the scheduler starts it once the site and bench are free
 	try:
-		frappe.enqueue(
-			drop_site_background,
-			queue="long",
-			timeout=3600,
+		log_name = submit_action(
+			"Drop Site",
 			bench_name=bench_name,
 			bench_path=bench_path,
 			site_name=site_name,
-			sudo_password=sudo_password,
-			mysql_root_password=mysql_root_password,
+			priority=priority,
 		)
 	except Exception as e:
 		frappe.throw(f"Failed to enqueue site deletion: {e!s}")
@@ -203,5 +151,5 @@ def execute(bench_name: str, bench_path: str, site_name: str):
 			f"Deleting site <b>{site_name}</b> in the background. "
 			f"Check the <b>BM Log</b> for more details."
 		),
-		"data": None,
+		"data": {"log": log_name},
 	}
@@ -1,33 +1,13 @@
 import os
-import subprocess
-import time
 
 import frappe
 
+from benchmate.api.log_sink import LogSink
+from benchmate.api.runner import SITE_BACKUP_PATH, run_bench_command, run_bench_script
+from benchmate.api.scheduler import is_cancel_requested, submit_action
 from benchmate.api.utils import get_benchmate_settings
 
 
-def update_restore_log_status(docname, new_text=None, status=None):
-	"""
-	Update the BM Log record for a given docname.
-	Appends log text and/or updates the status field, committing immediately.
-	"""
-	try:
-		log_doc = frappe.get_doc("BM Log", docname)
-
-		if new_text:
-			updated_log = (log_doc.log or "") + new_text
-			log_doc.db_set("log", updated_log, update_modified=False)
-
-		if status:
-			log_doc.db_set("status", status, update_modified=False)
-
-		frappe.db.commit()
-		log_doc.reload()
-	except Exception as e:
-		frappe.log_error(f"Error updating BM Log: {e}", "BenchMate SiteRestoreLogs")
-
-
 def restore_site_background(
 	bench_name: str,
 	bench_path: str,
@@ -37,94 +17,86 @@ def restore_site_background(
 	private_files_path: str,
 	sudo_password: str,
 	mysql_root_password: str,
+	log_name: str,
 ):
 	"""
 	Background task to restore a Frappe site from backup files.
-	Captures real-time logs into BM Log doctype,
-	and cleans up temporary log files after completion.
+	Streams the command output into the BM Log doctype as it arrives.
 	"""
 	bench_path = os.path.abspath(bench_path)
-	log_file = os.path.join(bench_path, f"bench_restore_site_{site_name}.log")
-
-	# Create BM Log record
-	log_timestamp = int(time.time())
-	log_name = f"Restore Site-{log_timestamp}"
-	if not frappe.db.exists("BM Log", log_name):
-		frappe.get_doc(
-			{
-				"doctype": "BM Log",
-				"title": f"Restore Site - {site_name}",
-				"log": "",
-				"log_timestamp": log_timestamp,
-				"status": "In Process",
-				"action": "Restore Site",
-			}
-		).insert(ignore_permissions=True)
-		frappe.db.commit()
 
-	# Build restore command with MySQL root password
-	cmd = [
-		"sudo",
-		"-S",
-		"bench",
-		"--site",
-		site_name,
-		"--force",
-		"restore",
-		db_files_path,
-		"--with-public-files",
-		public_files_path,
-		"--with-private-files",
-		private_files_path,
-		"--mariadb-root-password",
-		mysql_root_password,  # ✅ Pass MySQL root password
+	# Buffer output into the BM Log created when the action was queued
+	log = LogSink(log_name, error_title="BenchMate SiteRestoreLogs")
+
+	# A files manifest of a deduplicated backup rebuilds both public and private files from the store
+	files_manifest_path = next(
+		(path for path in (public_files_path, private_files_path) if path.endswith(".json")), None
+	)
+	file_archives = [
+		(option, path)
+		for option, path in (
+			("--with-public-files", public_files_path),
+			("--with-private-files", private_files_path),
+		)
+		if path and not path.endswith(".json")
 	]
 
+	# Build restore command with MySQL root password
+	args = ["--site", site_name, "--force", "restore", db_files_path]
+	for option, path in file_archives:
+		args += [option, path]
+	args += ["--mariadb-root-password", mysql_root_password]  # ✅ Pass MySQL root password
+
+	# Run the command, streaming its output into the BM Log as it arrives
 	try:
-		with open(log_file, "w") as f:
-			proc = subprocess.Popen(
-				cmd,
-				cwd=bench_path,
-				stdin=subprocess.PIPE,
-				stdout=f,
-				stderr=subprocess.STDOUT,
-				text=True,
+		settings = get_benchmate_settings()
+		jobs = str(settings.get("restore_jobs"))
+
+		# Parallel engine: load the tables over several connections, reporting each table
+		if settings.get("restore_engine") == "Parallel":
+			script_args = [
+				"restore",
+				db_files_path,
+				"--site",
+				site_name,
+				"--jobs",
+				jobs,
+			]
+			for option, path in file_archives:
+				script_args += [option, path]
+			if files_manifest_path:
+				script_args += ["--with-files-manifest", files_manifest_path]
+
+			result = run_bench_script(
+				SITE_BACKUP_PATH,
+				script_args,
+				bench_path=bench_path,
+				sink=log,
+				sudo_password=sudo_password,
+				cancel_check=lambda: is_cancel_requested(log_name),
+				timeout=1200,  # Terminate the restore after 20 mins
+				input_text=mysql_root_password,  # The root password is read from stdin
 			)
-
-			# Send sudo password
-			proc.stdin.write(sudo_password + "\n")
-			proc.stdin.flush()
-			proc.stdin.close()
-
-			# Wait with timeout (20 mins)
-			try:
-				proc.wait(timeout=1200)
-			except subprocess.TimeoutExpired:
-				proc.kill()
-				update_restore_log_status(
-					log_name,
-					new_text="\nTimed out while restoring site!\n",
-					status="Error",
-				)
-				frappe.msgprint(
-					msg=f"Timeout expired while restoring site {site_name}.",
-					title="Site Restore Timeout",
-					alert=True,
-					indicator="red",
-				)
-				return
-
-		# Stream logs into BM Log
-		with open(log_file) as f:
-			f.seek(0, os.SEEK_SET)
-			for line in f:
-				update_restore_log_status(log_name, new_text=line)
-
-		# Success or error status
-		if proc.returncode == 0:
-			update_restore_log_status(log_name, status="Success")
 		else:
-			update_restore_log_status(log_name, status="Error")
+			result = run_bench_command(
+				args,
+				bench_path=bench_path,
+				sink=log,
+				sudo_password=sudo_password,
+				cancel_check=lambda: is_cancel_requested(log_name),
+				timeout=1200,  # Terminate the command after 20 mins
+			)
+			if files_manifest_path and result["outcome"] == "success":
+				result = run_bench_script(
+					SITE_BACKUP_PATH,
+					["restore-files", files_manifest_path, "--site", site_name, "--jobs", jobs],
+					bench_path=bench_path,
+					sink=log,
+					sudo_password=sudo_password,
+					cancel_check=lambda: is_cancel_requested(log_name),
+					timeout=1200,  # Terminate the file restore after 20 mins
+				)
+		log.set_status(result["status"])
 
 	except Exception as e:
 		frappe.msgprint(
@@ -135,26 +107,46 @@ def restore_site_background(
 			indicator="red",
 		)
 		frappe.log_error(f"Error running bench restore: {e}", "BenchMate SiteRestoreLogs")
-		update_restore_log_status(log_name, status="Error")
+		log.set_status("Error")
 
 	else:
-		frappe.msgprint(
-			msg=f"Site {site_name} restored successfully in bench {bench_name}",
-			title="Site Restore Success",
-			realtime=True,
-			alert=True,
-			indicator="green",
-		)
+		# Notify the user based on how the command ended
+		if result["outcome"] == "success":
+			frappe.msgprint(
+				msg=f"Site {site_name} restored successfully in bench {bench_name}",
+				title="Site Restore Success",
+				realtime=True,
+				alert=True,
+				indicator="green",
+			)
+		elif result["outcome"] == "timeout":
+			frappe.msgprint(
+				msg=f"Timeout expired while restoring site {site_name}.",
+				title="Site Restore Timeout",
+				realtime=True,
+				alert=True,
+				indicator="red",
+			)
+		elif result["outcome"] == "cancelled":
+			frappe.msgprint(
+				msg=f"Restore of site {site_name} was cancelled.",
+				title="Site Restore Cancelled",
+				realtime=True,
+				alert=True,
+				indicator="orange",
+			)
+		else:
+			frappe.msgprint(
+				msg=f"Error while restoring site {site_name} in bench {bench_name}",
+				title="Site Restore Error",
+				realtime=True,
+				alert=True,
+				indicator="red",
+			)
 
 	finally:
-		try:
-			if os.path.exists(log_file):
-				os.remove(log_file)
-		except Exception as cleanup_error:
-			frappe.log_error(
-				f"Failed to remove temp log file {log_file}: {cleanup_error}",
-				"BenchMate SiteRestoreLogs",
-			)
+		# Write any output still buffered
+		log.close()
 
 
 @frappe.whitelist()
@@ -164,7 +156,8 @@ def execute(
 	site_name: str,
 	db_files_path: str,
 	public_files_path: str,
-	private_files_path: str,
+	private_files_path: str | None = None,
+	priority: int = 0,
 ):
 	"""
 	Public API method (whitelisted) to enqueue site restore.
@@ -177,7 +170,9 @@ def execute(
 	absolute_site_path = os.path.abspath(frappe.get_site_path())
 	db_files_path = os.path.join(absolute_site_path, db_files_path.lstrip("/"))
 	public_files_path = os.path.join(absolute_site_path, public_files_path.lstrip("/"))
-	private_files_path = os.path.join(absolute_site_path, private_files_path.lstrip("/"))
+	private_files_path = (
+		os.path.join(absolute_site_path, private_files_path.lstrip("/")) if private_files_path else ""
+	)
 
 	settings = get_benchmate_settings()
 	sudo_password = settings.get("sudo_password")
@@ -189,21 +184,18 @@ def execute(
 	if not mysql_root_password:
 		frappe.throw("MySQL root password not configured", frappe.ValidationError)
 
+	# ? Queue the action, the scheduler starts it once the site and bench are free
 	try:
-		frappe.enqueue(
-			restore_site_background,
-			queue="long",
-			timeout=7200,
+		log_name = submit_action(
+			"Restore Site",
 			bench_name=bench_name,
 			bench_path=bench_path,
 			site_name=site_name,
 			db_files_path=db_files_path,
 			public_files_path=public_files_path,
 			private_files_path=private_files_path,
-			sudo_password=sudo_password,
-			mysql_root_password=mysql_root_password,
+			priority=priority,
 		)
-
 	except Exception as e:
 		frappe.throw(f"Failed to enqueue site restore: {e!s}")
 
@@ -212,5 +204,5 @@ def execute(
 		"message": (
 			f"Restoring site <b>{site_name}</b> in the background. Check the <b>BM Log</b> for more details."
 		),
-		"data": None,
+		"data": {"log": log_name},
 	}
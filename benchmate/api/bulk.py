@@ -0,0 +1,282 @@
+import frappe
+
+# ? Fields written by the sync for each parent doctype
+SYNC_FIELDS = {
+	"BM Bench": [
+		"bench_name",
+		"path",
+		"branch",
+		"version",
+		"status",
+		"error_message",
+		"last_synced_on",
+		"fingerprint",
+	],
+	"BM Site": [
+		"site_name",
+		"bench_name",
+		"path",
+		"status",
+		"error_message",
+		"last_synced_on",
+		"fingerprint",
+	],
+	"BM App": ["app_name", "app_title", "link"],
+}
+
+# ? Sync bookkeeping, written without a Version entry or a `modified` bump
+BOOKKEEPING_FIELDS = ("last_synced_on", "fingerprint")
+
+INSTALLED_APPS_DOCTYPE = "BM Installed Apps"
+INSTALLED_APPS_FIELD = "installed_apps"
+INSTALLED_APP_FIELDS = ["app_name", "app_title", "branch", "version", "link", "commit"]
+
+# ? Savepoint around an insert, so a duplicate only undoes that insert
+INSERT_SAVEPOINT = "benchmate_sync_insert"
+
+
+def _differs(current, new) -> bool:
+	"""Compare a stored value with a new one, treating None and "" as equal."""
+	if current in (None, "") and new in (None, ""):
+		return False
+	return current != new
+
+
+class BulkWriter:
+	"""
+	Batch the BM Bench / BM Site / BM App writes of a sync.
+
+	- Existing records of one bench and their `installed_apps` rows are prefetched with one query
+	  per doctype, so memory stays bounded by the largest bench rather than the fleet.
+	- New records are inserted through the document API, so naming, defaults and validations apply.
+	  A record another sync job inserted in the meantime (BM Apps are shared by every bench) is
+	  updated instead.
+	- Records whose fields or `installed_apps` rows really changed are saved through the document API,
+	  so the tracked doctypes get their Version entry, hooks run and `modified` moves.
+	- Records where only the sync bookkeeping (`fingerprint`) changed are written in batches with
+	  `frappe.db.bulk_update`, leaving `modified` alone. Unchanged records are not written at all;
+	  `last_synced_on` alone never counts as a change.
+
+	Args:
+		batch_size (int): Number of pending bookkeeping updates after which the writer flushes.
+	"""
+
+	def __init__(self, batch_size: int = 100):
+		self.batch_size = batch_size
+		self.records: dict[str, dict[str, dict]] = {doctype: {} for doctype in SYNC_FIELDS}
+		self.children: dict[tuple[str, str], list[dict]] = {}
+		self._updates: dict[str, dict[str, dict]] = {}
+
+	def prefetch(self, names: dict[str, list[str]]):
+		"""
+		Load the given existing records and their installed apps rows, one query per doctype.
+		Records of previously prefetched benches are dropped; queued changes must be flushed
+		or discarded first.
+
+		Args:
+			names (dict[str, list[str]]): Record names per parent doctype, e.g. from `get_record_names`.
+		"""
+		for doctype, fields in SYNC_FIELDS.items():
+			record_names = names.get(doctype) or []
+			rows = (
+				frappe.get_all(
+					doctype,
+					filters={"name": ["in", record_names]},
+					fields=["name", *fields],
+					limit_page_length=0,
+				)
+				if record_names
+				else []
+			)
+			self.records[doctype] = {row.name: dict(row) for row in rows}
+
+		self.children = {}
+		parents = [*self.records["BM Bench"], *self.records["BM Site"]]
+		if not parents:
+			return
+
+		child_rows = frappe.get_all(
+			INSTALLED_APPS_DOCTYPE,
+			filters={
+				"parenttype": ["in", ["BM Bench", "BM Site"]],
+				"parentfield": INSTALLED_APPS_FIELD,
+				"parent": ["in", parents],
+			},
+			fields=["name", "parent", "parenttype", "idx", *INSTALLED_APP_FIELDS],
+			order_by="idx asc",
+			limit_page_length=0,
+		)
+		for row in child_rows:
+			self.children.setdefault((row.parenttype, row.parent), []).append(dict(row))
+
+	def discard(self):
+		"""Drop the queued changes and prefetched records, e.g. after the bench they belong to was rolled back."""
+		self._updates = {}
+		self.records = {doctype: {} for doctype in SYNC_FIELDS}
+		self.children = {}
+
+	def get(self, doctype: str, name: str) -> dict | None:
+		"""
+		Get the known values of a record, including pending changes.
+
+		Args:
+			doctype (str): Parent doctype.
+			name (str): Record name.
+
+		Returns:
+			dict | None: Record values if the record exists.
+		"""
+		return self.records[doctype].get(name)
+
+	def upsert(self, doctype: str, name: str, values: dict, installed_apps: list[dict] | None = None) -> bool:
+		"""
+		Insert a record, save its real changes or queue its bookkeeping changes.
+
+		Args:
+			doctype (str): Parent doctype.
+			name (str): Expected record name.
+			values (dict): Field values.
+			installed_apps (list[dict] | None): Desired `installed_apps` rows, None to leave them untouched.
+
+		Returns:
+			bool: True if the record was inserted or changed, bookkeeping aside.
+		"""
+		existing = self.records[doctype].get(name)
+
+		# ? New records go through the document API
+		if existing is None:
+			doc = frappe.get_doc({"doctype": doctype, **values})
+			for row in installed_apps or []:
+				doc.append(INSTALLED_APPS_FIELD, row)
+			frappe.db.savepoint(INSERT_SAVEPOINT)
+			try:
+				doc.insert(ignore_permissions=True)
+			except frappe.DuplicateEntryError:
+				# ? A concurrent sync job inserted the shared record first (e.g. a BM App), update it instead
+				frappe.db.rollback(save_point=INSERT_SAVEPOINT)
+				existing = self._fetch(doctype, name)
+			else:
+				self._remember(doc)
+				return True
+
+		changes = {
+			field: value
+			for field, value in values.items()
+			if field not in BOOKKEEPING_FIELDS and _differs(existing.get(field), value)
+		}
+		children_changed = installed_apps is not None and self._installed_apps_differ(
+			doctype, name, installed_apps
+		)
+
+		# ? Real changes are saved, so tracked doctypes keep their history
+		if changes or children_changed:
+			doc = frappe.get_doc(doctype, name, for_update=True)
+			doc.update(values)
+			if installed_apps is not None:
+				self._set_installed_apps(doc, installed_apps)
+			doc.save(ignore_permissions=True)
+			self._remember(doc)
+			return True
+
+		# ? A new fingerprint alone is bookkeeping: batched, without a Version entry or `modified` bump
+		if "fingerprint" in values and _differs(existing.get("fingerprint"), values["fingerprint"]):
+			bookkeeping = {field: values[field] for field in BOOKKEEPING_FIELDS if field in values}
+			self._updates.setdefault(doctype, {}).setdefault(name, {}).update(bookkeeping)
+			existing.update(bookkeeping)
+			self._flush_if_full()
+
+		return False
+
+	def _fetch(self, doctype: str, name: str) -> dict:
+		"""
+		Load a record committed by another transaction after the prefetch, with a locking read
+		so the transaction snapshot does not hide it.
+
+		Args:
+			doctype (str): Parent doctype.
+			name (str): Record name.
+
+		Returns:
+			dict: Record values.
+		"""
+		values = frappe.db.get_value(
+			doctype, name, ["name", *SYNC_FIELDS[doctype]], as_dict=True, for_update=True
+		)
+		self.records[doctype][name] = dict(values)
+		if frappe.get_meta(doctype).has_field(INSTALLED_APPS_FIELD):
+			self.children[(doctype, name)] = [
+				dict(row)
+				for row in frappe.get_all(
+					INSTALLED_APPS_DOCTYPE,
+					filters={"parenttype": doctype, "parentfield": INSTALLED_APPS_FIELD, "parent": name},
+					fields=["name", "parent", "parenttype", "idx", *INSTALLED_APP_FIELDS],
+					order_by="idx asc",
+					for_update=True,
+				)
+			]
+		return self.records[doctype][name]
+
+	def _remember(self, doc):
+		"""Keep the stored values and `installed_apps` rows of an inserted or saved record."""
+		self.records[doc.doctype][doc.name] = {
+			"name": doc.name,
+			**{f: doc.get(f) for f in SYNC_FIELDS[doc.doctype]},
+		}
+		if doc.meta.has_field(INSTALLED_APPS_FIELD):
+			self.children[(doc.doctype, doc.name)] = [
+				{"name": row.name, "idx": row.idx, **{f: row.get(f) for f in INSTALLED_APP_FIELDS}}
+				for row in doc.get(INSTALLED_APPS_FIELD) or []
+			]
+
+	def _installed_apps_differ(self, parenttype: str, parent: str, rows: list[dict]) -> bool:
+		"""
+		Compare the stored `installed_apps` rows of a record with the desired rows, order included.
+
+		Args:
+			parenttype (str): Parent doctype.
+			parent (str): Parent record name.
+			rows (list[dict]): Desired rows in order.
+
+		Returns:
+			bool: True if an app was added, removed, moved or changed.
+		"""
+		current_rows = self.children.get((parenttype, parent), [])
+		if len(current_rows) != len(rows):
+			return True
+		return any(
+			_differs(current.get(field), row.get(field))
+			for current, row in zip(current_rows, rows, strict=True)
+			for field in INSTALLED_APP_FIELDS
+		)
+
+	@staticmethod
+	def _set_installed_apps(doc, rows: list[dict]):
+		"""
+		Replace the `installed_apps` rows of a document, keeping the rows of apps that stay installed
+		so the Version entry shows changed rows instead of a removed and an added row.
+
+		Args:
+			doc (Document): BM Bench or BM Site.
+			rows (list[dict]): Desired rows in order.
+		"""
+		current = {row.app_name: row for row in doc.get(INSTALLED_APPS_FIELD) or []}
+		children = []
+		for idx, row in enumerate(rows, start=1):
+			child = current.pop(row.get("app_name"), None)
+			if child is None:
+				children.append({**row, "idx": idx})
+				continue
+			child.update({**row, "idx": idx})
+			children.append(child)
+		doc.set(INSTALLED_APPS_FIELD, children)
+
+	def _flush_if_full(self):
+		if sum(len(updates) for updates in self._updates.values()) >= self.batch_size:
+			self.flush()
+
+	def flush(self):
+		"""Write all queued bookkeeping updates."""
+		for doctype, updates in self._updates.items():
+			if updates:
+				frappe.db.bulk_update(doctype, updates, chunk_size=self.batch_size, update_modified=False)
+		self._updates = {}
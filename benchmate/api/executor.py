@@ -0,0 +1,224 @@
+import asyncio
+import os
+import signal
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+
+class CommandExecutor:
+	"""
+	Run shell commands on a private asyncio loop with a global concurrency cap.
+
+	Every command runs in its own process group with a deadline. When the deadline
+	passes the whole group (e.g. `bench` and the Python/MariaDB clients it spawned)
+	is sent SIGTERM and, after a grace period, SIGKILL. Timings and exit status of
+	every command are recorded.
+
+	The loop lives in a daemon thread, so `run` can be called from any thread,
+	e.g. the scan workers of the sync.
+
+	Args:
+		max_concurrency (int): Commands allowed to run at the same time.
+		timeout (float): Default deadline of a command in seconds.
+		kill_grace (float): Seconds between SIGTERM and SIGKILL on timeout.
+		history (int): Number of command results kept.
+	"""
+
+	def __init__(
+		self, max_concurrency: int = 4, timeout: float = 120.0, kill_grace: float = 5.0, history: int = 1000
+	):
+		self.max_concurrency = max_concurrency
+		self.timeout = timeout
+		self.kill_grace = kill_grace
+		self.results: deque[dict] = deque(maxlen=history)
+		self._loop: asyncio.AbstractEventLoop | None = None
+		self._slots: asyncio.Condition | None = None
+		self._running = 0
+		self._pid = None
+		self._lock = threading.Lock()
+
+	def configure(self, max_concurrency: int | None = None, timeout: float | None = None):
+		"""
+		Change the concurrency cap and default deadline, applied to commands started afterwards.
+		Running commands keep their slot; a lower cap only holds back new ones until enough finished.
+
+		Args:
+			max_concurrency (int | None): Commands allowed to run at the same time.
+			timeout (float | None): Default deadline of a command in seconds.
+		"""
+		with self._lock:
+			if max_concurrency:
+				self.max_concurrency = max_concurrency
+			if timeout:
+				self.timeout = timeout
+			loop, slots = self._loop, self._slots
+
+		# ? Wake commands waiting for a slot, a higher cap may let them start
+		if slots is not None and loop.is_running() and self._pid == os.getpid():
+			asyncio.run_coroutine_threadsafe(self._notify_slots(), loop)
+
+	def _get_loop(self) -> asyncio.AbstractEventLoop:
+		"""Start the loop thread on first use (again after a fork, e.g. in an RQ job)."""
+		with self._lock:
+			if self._loop is None or self._pid != os.getpid():
+				self._loop = asyncio.new_event_loop()
+				self._slots = asyncio.Condition()
+				self._running = 0
+				self._pid = os.getpid()
+				threading.Thread(
+					target=self._loop.run_forever, name="benchmate-executor", daemon=True
+				).start()
+			return self._loop
+
+	async def _notify_slots(self):
+		async with self._slots:
+			self._slots.notify_all()
+
+	async def _acquire_slot(self):
+		"""Wait until fewer commands than the current cap run, then take a slot."""
+		async with self._slots:
+			await self._slots.wait_for(lambda: self._running < self.max_concurrency)
+			self._running += 1
+
+	async def _release_slot(self):
+		async with self._slots:
+			self._running -= 1
+			self._slots.notify_all()
+
+	async def run_async(self, cmd: str, cwd: Path | None = None, timeout: float | None = None) -> dict:
+		"""
+		Run a shell command on the executor loop.
+
+		Args:
+			cmd (str): Command to run.
+			cwd (Path | None): Directory to execute in.
+			timeout (float | None): Deadline in seconds, the default timeout when not given.
+
+		Returns:
+			dict: {"cmd", "cwd", "output", "returncode", "timed_out", "duration"}
+		"""
+		timeout = timeout or self.timeout
+
+		await self._acquire_slot()
+		try:
+			started = time.monotonic()
+			proc = await asyncio.create_subprocess_shell(
+				cmd,
+				cwd=cwd,
+				stdout=asyncio.subprocess.PIPE,
+				stderr=asyncio.subprocess.STDOUT,
+				start_new_session=True,  # ? own process group, killed as a whole on timeout
+			)
+
+			timed_out = False
+			try:
+				output, _ = await asyncio.wait_for(proc.communicate(), timeout)
+			except asyncio.TimeoutError:
+				timed_out, output = True, b""
+				await self._kill_group(proc)
+
+			result = {
+				"cmd": cmd,
+				"cwd": str(cwd) if cwd else None,
+				"output": output.decode(errors="replace").strip(),
+				"returncode": proc.returncode,
+				"timed_out": timed_out,
+				"duration": round(time.monotonic() - started, 3),
+			}
+		finally:
+			await self._release_slot()
+
+		self.results.append(result)
+		return result
+
+	async def _kill_group(self, proc: asyncio.subprocess.Process):
+		"""Terminate the process group of a command, escalating to SIGKILL after the grace period."""
+		for sig in (signal.SIGTERM, signal.SIGKILL):
+			try:
+				os.killpg(proc.pid, sig)
+			except ProcessLookupError:
+				pass
+			try:
+				await asyncio.wait_for(proc.wait(), self.kill_grace)
+				return
+			except asyncio.TimeoutError:
+				continue
+
+	def run(self, cmd: str, cwd: Path | None = None, timeout: float | None = None) -> dict:
+		"""
+		Run a shell command and block until it finished or was killed.
+
+		Args:
+			cmd (str): Command to run.
+			cwd (Path | None): Directory to execute in.
+			timeout (float | None): Deadline in seconds, the default timeout when not given.
+
+		Returns:
+			dict: {"cmd", "cwd", "output", "returncode", "timed_out", "duration"}
+		"""
+		future = asyncio.run_coroutine_threadsafe(self.run_async(cmd, cwd, timeout), self._get_loop())
+		return future.result()
+
+	def pop_results(self) -> list[dict]:
+		"""
+		Take the recorded command results.
+
+		Returns:
+			list[dict]: Results in completion order.
+		"""
+		results = []
+		while self.results:
+			results.append(self.results.popleft())
+		return results
+
+
+def summarize_results(results: list[dict], slowest: int = 5) -> dict:
+	"""
+	Summarize command results for a sync log.
+
+	Args:
+		results (list[dict]): Results from `CommandExecutor.pop_results`.
+		slowest (int): Number of slowest commands to include.
+
+	Returns:
+		dict: {"count", "failed", "timed_out", "total_duration", "slowest"}
+	"""
+
+	def brief(result: dict) -> dict:
+		return {k: result[k] for k in ("cmd", "cwd", "returncode", "timed_out", "duration")}
+
+	return {
+		"count": len(results),
+		"failed": [brief(r) for r in results if r["returncode"] and not r["timed_out"]],
+		"timed_out": [brief(r) for r in results if r["timed_out"]],
+		"total_duration": round(sum(r["duration"] for r in results), 3),
+		"slowest": [brief(r) for r in sorted(results, key=lambda r: r["duration"], reverse=True)[:slowest]],
+	}
+
+
+def merge_command_summaries(summaries: list[dict], slowest: int = 5) -> dict:
+	"""
+	Merge command summaries, e.g. of the jobs of a fan-out sync.
+
+	Args:
+		summaries (list[dict]): Summaries from `summarize_results`.
+		slowest (int): Number of slowest commands to keep.
+
+	Returns:
+		dict: {"count", "failed", "timed_out", "total_duration", "slowest"}
+	"""
+	return {
+		"count": sum(s["count"] for s in summaries),
+		"failed": [r for s in summaries for r in s["failed"]],
+		"timed_out": [r for s in summaries for r in s["timed_out"]],
+		"total_duration": round(sum(s["total_duration"] for s in summaries), 3),
+		"slowest": sorted(
+			(r for s in summaries for r in s["slowest"]), key=lambda r: r["duration"], reverse=True
+		)[:slowest],
+	}
+
+
+# ? Process-wide executor used by the sync
+command_executor = CommandExecutor()
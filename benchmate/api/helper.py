@@ -0,0 +1,224 @@
+"""
+Privileged helper running site commands for BenchMate without `sudo` and a cold `bench` CLI per action.
+
+Run it as root, next to the bench where BenchMate is installed:
+
+	sudo ./env/bin/python -m benchmate.api.helper --user frappe --bench-root /home/frappe/benches \\
+		--token-file /etc/benchmate/helper.token
+
+It listens on a Unix socket and runs the commands on warm workers (see `worker_pool.py`),
+running as the owner of the bench. A request is only served when
+- the connecting process runs as the allowed user (or root), checked with SO_PEERCRED
+- it carries the token from the token file
+- the bench lies under an allowed bench root
+- the command is one of `ALLOWED_COMMANDS`
+
+Requests and responses are JSON lines:
+
+	-> {"token": "...", "bench_path": "/home/frappe/benches/b1", "args": ["--site", "a.localhost", "backup"],
+		"priority": {"nice": 10, "io_class": 2, "io_level": 7}}
+	<- {"data": "..."}
+	<- {"exit": 0}  or  {"error": "..."}
+
+Closing the connection terminates the command, that is how clients cancel and time out.
+This module must not import Frappe, it runs outside of any site.
+"""
+
+import argparse
+import hmac
+import json
+import os
+import pwd
+import socket
+import struct
+import sys
+import threading
+from pathlib import Path
+
+from benchmate.api.worker_pool import WorkerPool
+
+# ? Bench commands the helper runs, the first argument that is not an option
+ALLOWED_COMMANDS = {"new-site", "drop-site", "backup", "restore"}
+
+DEFAULT_SOCKET = "/run/benchmate/helper.sock"
+
+
+def get_command(args: list[str]) -> str | None:
+	"""
+	Find the bench command in its arguments, e.g. "backup" in `--site a.localhost backup`.
+
+	Args:
+		args (list[str]): Arguments after `bench`.
+
+	Returns:
+		str | None: Command name.
+	"""
+	skip = False
+	for arg in args:
+		if skip:
+			skip = False
+		elif arg == "--site":
+			skip = True
+		elif not arg.startswith("-"):
+			return arg
+	return None
+
+
+class Helper:
+	"""
+	Unix socket server handing authenticated requests to the warm workers.
+
+	Args:
+		socket_path (str): Socket to listen on.
+		token (str): Shared secret, also stored in BM Settings.
+		allowed_uid (int): User allowed to connect besides root.
+		bench_roots (list[Path]): Directories the benches must be in.
+		pool (WorkerPool): Workers running the commands.
+	"""
+
+	def __init__(
+		self, socket_path: str, token: str, allowed_uid: int, bench_roots: list[Path], pool: WorkerPool
+	):
+		self.socket_path = socket_path
+		self.token = token
+		self.allowed_uid = allowed_uid
+		self.bench_roots = [root.resolve() for root in bench_roots]
+		self.pool = pool
+
+	def validate(self, conn: socket.socket, request: dict) -> tuple[Path, list[str], dict | None]:
+		"""Check the peer, token, bench, command and priority of a request."""
+		creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+		_, uid, _ = struct.unpack("3i", creds)
+		if uid not in (0, self.allowed_uid):
+			raise PermissionError(f"User {uid} is not allowed")
+
+		if not hmac.compare_digest(str(request.get("token") or ""), self.token):
+			raise PermissionError("Invalid token")
+
+		bench_path = Path(str(request.get("bench_path") or "")).resolve()
+		if not any(bench_path.is_relative_to(root) and bench_path != root for root in self.bench_roots):
+			raise PermissionError(f"{bench_path} is not under an allowed bench root")
+		if not (bench_path / "sites").is_dir() or not (bench_path / "env" / "bin" / "python").exists():
+			raise ValueError(f"{bench_path} is not a bench")
+
+		args = [str(arg) for arg in request.get("args") or []]
+		if get_command(args) not in ALLOWED_COMMANDS:
+			raise PermissionError(f"Command {get_command(args)} is not allowed")
+
+		# ? Only nice levels 0-19 and the best-effort and idle I/O classes, never the real-time class
+		priority = request.get("priority")
+		if priority:
+			priority = {
+				"nice": min(max(int(priority.get("nice") or 0), 0), 19),
+				"io_class": int(priority.get("io_class") or 0),
+				"io_level": min(max(int(priority.get("io_level") or 0), 0), 7),
+			}
+			if priority["io_class"] not in (0, 2, 3):
+				raise PermissionError(f"I/O class {priority['io_class']} is not allowed")
+
+		return bench_path, args, priority
+
+	def handle(self, conn: socket.socket):
+		"""Serve one request, terminating the command when the client disconnects."""
+		reader = conn.makefile("rb")
+
+		def send(message: dict):
+			try:
+				conn.sendall((json.dumps(message) + "\n").encode())
+			except OSError:
+				disconnected.set()
+
+		# ? Watch the connection, the client closes it to cancel
+		disconnected = threading.Event()
+
+		def wait_for_disconnect():
+			try:
+				reader.read()
+			except OSError:
+				pass
+			disconnected.set()
+
+		try:
+			try:
+				bench_path, args, priority = self.validate(conn, json.loads(reader.readline() or b"{}"))
+			except Exception as e:
+				send({"error": str(e)})
+				return
+
+			threading.Thread(target=wait_for_disconnect, daemon=True).start()
+
+			# ? Run as the bench owner, so files it creates (e.g. backups) keep their owner
+			stat = bench_path.stat()
+			result = self.pool.run(
+				bench_path,
+				args,
+				on_output=lambda data: send({"data": data}),
+				cancel_check=disconnected.is_set,
+				cancel_interval=0.5,
+				user=stat.st_uid,
+				group=stat.st_gid,
+				priority=priority,
+			)
+			if result["error"]:
+				send({"error": result["error"]})
+			elif result["returncode"] is not None:
+				send({"exit": result["returncode"]})
+		finally:
+			conn.close()
+
+	def serve(self):
+		"""Listen on the socket, one thread per connection."""
+		socket_path = Path(self.socket_path)
+		socket_path.parent.mkdir(parents=True, exist_ok=True)
+		socket_path.unlink(missing_ok=True)
+
+		server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		server.bind(str(socket_path))
+		os.chown(socket_path, 0, pwd.getpwuid(self.allowed_uid).pw_gid)
+		os.chmod(socket_path, 0o660)
+		server.listen(64)
+
+		print(f"BenchMate helper listening on {socket_path}", flush=True)
+		try:
+			while True:
+				conn, _ = server.accept()
+				threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+		finally:
+			server.close()
+			socket_path.unlink(missing_ok=True)
+			self.pool.close()
+
+
+def main():
+	parser = argparse.ArgumentParser(description="BenchMate privileged helper")
+	parser.add_argument("--user", required=True, help="User running the BenchMate bench")
+	parser.add_argument("--bench-root", action="append", required=True, help="Directory containing benches")
+	parser.add_argument("--token-file", required=True, help="File holding the token set in BM Settings")
+	parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket to listen on")
+	parser.add_argument("--max-workers", default=4, type=int, help="Warm workers over all benches")
+	parser.add_argument("--workers-per-bench", default=2, type=int, help="Warm workers of a single bench")
+	parser.add_argument("--idle-timeout", default=600, type=float, help="Seconds before an idle worker stops")
+	args = parser.parse_args()
+
+	if os.geteuid() != 0:
+		sys.exit("The BenchMate helper must run as root")
+
+	token = Path(args.token_file).read_text().strip()
+	if not token:
+		sys.exit(f"{args.token_file} is empty")
+
+	# ? Only root may read the token file, otherwise any local user could authenticate
+	if Path(args.token_file).stat().st_mode & 0o077:
+		sys.exit(f"{args.token_file} must not be readable by group or others")
+
+	Helper(
+		socket_path=args.socket,
+		token=token,
+		allowed_uid=pwd.getpwnam(args.user).pw_uid,
+		bench_roots=[Path(root) for root in args.bench_root],
+		pool=WorkerPool(args.max_workers, args.workers_per_bench, args.idle_timeout),
+	).serve()
+
+
+if __name__ == "__main__":
+	main()
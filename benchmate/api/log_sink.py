@@ -0,0 +1,203 @@
+import time
+
+import frappe
+
+# ? Savepoint around a chunk write, so a failed write leaves no orphan chunk in the transaction
+FLUSH_SAVEPOINT = "benchmate_log_flush"
+
+
+def split_lines(text: str) -> list[str]:
+	"""
+	Split log output into lines, a trailing newline does not start a new line.
+
+	Args:
+		text (str): Log output.
+
+	Returns:
+		list[str]: Lines without their newline.
+	"""
+	if not text:
+		return []
+	lines = text.split("\n")
+	if lines[-1] == "":
+		lines.pop()
+	return lines
+
+
+class LogSink:
+	"""
+	Buffer the output of a running action and store it as BM Log Chunk records.
+
+	Lines are collected in memory and written as one append-only chunk once the
+	buffer reaches `flush_bytes` or `flush_interval` seconds passed since the last
+	write. Every write inserts a single chunk and bumps the `line_count` and
+	`byte_count` of the BM Log, so appends stay O(1) however long the log grows.
+	Chunks end on a line boundary except for the last one, an incomplete line is
+	kept in the buffer until its newline arrives or the sink is closed. A line
+	reaching `max_line_length` without a newline is wrapped, so `line_count` and
+	the chunk start lines always count whole stored lines.
+	Call `close` (or use the sink as a context manager) to write what is left.
+
+	Every written chunk is also published as a "benchmate_log" realtime event to
+	the BM Log document room, with its start line, so viewers append new lines
+	as they arrive and resume from the last line they received.
+
+	Args:
+		docname (str): BM Log name.
+		error_title (str): Title used when a write fails.
+		flush_bytes (int): Buffered characters that trigger a write.
+		flush_interval (float): Seconds after which buffered output is written.
+		max_line_length (int): Characters after which an incomplete line is wrapped.
+	"""
+
+	def __init__(
+		self,
+		docname: str,
+		error_title: str = "BenchMate Logs",
+		flush_bytes: int = 16 * 1024,
+		flush_interval: float = 1.0,
+		max_line_length: int = 256 * 1024,
+	):
+		self.docname = docname
+		self.error_title = error_title
+		self.flush_bytes = flush_bytes
+		self.flush_interval = flush_interval
+		self.max_line_length = max_line_length
+		self._buffer: list[str] = []
+		self._size = 0
+		self._held = 0
+		self._last_flush = time.monotonic()
+		self._line_count = None
+		self._pending_status = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		self.close()
+
+	def write(self, text: str):
+		"""
+		Buffer output, writing it once a size or time threshold is reached.
+
+		Args:
+			text (str): Output to append.
+		"""
+		if text:
+			self._buffer.append(text)
+			self._size += len(text)
+		self.flush_if_due()
+
+	def flush_if_due(self):
+		"""Write buffered output if the size or time threshold is reached, e.g. while idle."""
+		# ? A held back incomplete line alone does not make a write due until it is too long to hold
+		due = self._size - self._held
+		if (
+			due >= self.flush_bytes
+			or self._size >= self.max_line_length
+			or (due and time.monotonic() - self._last_flush >= self.flush_interval)
+		):
+			self.flush()
+
+	def set_status(self, status: str):
+		"""
+		Write all buffered output together with a new status (e.g. "Success", "Error").
+
+		Args:
+			status (str): New BM Log status.
+		"""
+		self.flush(status=status, final=True)
+
+	def flush(self, status: str | None = None, final: bool = False):
+		"""
+		Append buffered output as one chunk, optionally setting the status, and commit.
+		When the write fails, the output and status are kept and retried by the next flush.
+
+		Args:
+			status (str | None): New BM Log status.
+			final (bool): Also write an incomplete last line.
+		"""
+		status = status or self._pending_status
+		text = "".join(self._buffer)
+
+		# ? Hold back an incomplete line until its newline arrives, wrap it once it is too long to hold
+		pending = ""
+		if not final and text and not text.endswith("\n"):
+			cut = text.rfind("\n") + 1
+			text, pending = text[:cut], text[cut:]
+			if len(pending) >= self.max_line_length:
+				text, pending = f"{text}{pending}\n", ""
+
+		self._buffer, self._size = ([pending], len(pending)) if pending else ([], 0)
+		self._held = len(pending)
+		self._last_flush = time.monotonic()
+
+		if not text and not status:
+			return
+
+		frappe.db.savepoint(FLUSH_SAVEPOINT)
+		try:
+			if self._line_count is None:
+				self._line_count = frappe.db.get_value("BM Log", self.docname, "line_count") or 0
+
+			lines = split_lines(text)
+			byte_count = len(text.encode())
+
+			if lines:
+				frappe.get_doc(
+					{
+						"doctype": "BM Log Chunk",
+						"log": self.docname,
+						"start_line": self._line_count,
+						"line_count": len(lines),
+						"byte_count": byte_count,
+						"content": text,
+					}
+				).insert(ignore_permissions=True)
+
+			frappe.db.sql(
+				"""UPDATE `tabBM Log`
+				SET `line_count` = `line_count` + %(lines)s, `byte_count` = `byte_count` + %(bytes)s,
+					`status` = COALESCE(%(status)s, `status`)
+				WHERE `name` = %(name)s""",
+				{"lines": len(lines), "bytes": byte_count, "status": status, "name": self.docname},
+			)
+			frappe.db.commit()
+			start_line = self._line_count
+			self._line_count += len(lines)
+			self._pending_status = None
+		except Exception as e:
+			# ? Undo a chunk inserted before the failure, then keep the text (ahead of the held back line)
+			# ? and the status for the next flush
+			try:
+				frappe.db.rollback(save_point=FLUSH_SAVEPOINT)
+			except Exception:
+				# ? The savepoint is gone when the whole transaction was rolled back, e.g. on a deadlock
+				frappe.db.rollback()
+			if text:
+				self._buffer.insert(0, text)
+				self._size += len(text)
+			self._pending_status = status
+			frappe.log_error(f"Error updating BM Log: {e}", self.error_title)
+			return
+
+		# ? Push the new lines to open viewers, they are already committed for catch-up reads
+		try:
+			frappe.publish_realtime(
+				"benchmate_log",
+				{
+					"log": self.docname,
+					"start": start_line,
+					"lines": lines,
+					"line_count": self._line_count,
+					"status": status,
+				},
+				doctype="BM Log",
+				docname=self.docname,
+			)
+		except Exception as e:
+			frappe.log_error(f"Error publishing BM Log output: {e}", self.error_title)
+
+	def close(self):
+		"""Write whatever is still buffered."""
+		self.flush(final=True)
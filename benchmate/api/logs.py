@@ -0,0 +1,137 @@
+import frappe
+
+from benchmate.api.log_sink import split_lines
+
+# ? Upper bound of lines returned by a single read
+MAX_LINES_PER_READ = 5000
+
+
+def read_log_lines(log_name: str, start: int = 0, end: int | None = None, tail: int | None = None) -> dict:
+	"""
+	Read a range of lines of a BM Log.
+
+	Only the chunks overlapping the range are loaded. Logs written before
+	chunked storage (and small logs such as sync summaries) are read from
+	the `log` field.
+
+	Args:
+		log_name (str): BM Log name.
+		start (int): First line, 0 based.
+		end (int | None): Line after the last one, defaults to `start + MAX_LINES_PER_READ`.
+		tail (int | None): Read this many lines from the end instead of `start`/`end`.
+
+	Returns:
+		dict: {"lines", "start", "end", "line_count", "byte_count", "status"}
+	"""
+	log = frappe.db.get_value("BM Log", log_name, ["line_count", "byte_count", "status"], as_dict=True)
+	if not log:
+		frappe.throw(f"BM Log {log_name} not found", frappe.DoesNotExistError)
+
+	# ? Unchunked log, stored in the log field
+	all_lines = None
+	if not log.line_count:
+		text = frappe.db.get_value("BM Log", log_name, "log") or ""
+		all_lines, log.byte_count = split_lines(text), len(text.encode())
+
+	if tail is not None:
+		end = log.line_count or len(all_lines)
+		start = end - tail
+	start = max(0, int(start))
+	end = start + MAX_LINES_PER_READ if end is None else min(int(end), start + MAX_LINES_PER_READ)
+
+	if all_lines is not None:
+		return {
+			"lines": all_lines[start:end],
+			"start": start,
+			"end": min(end, len(all_lines)),
+			"line_count": len(all_lines),
+			"byte_count": log.byte_count,
+			"status": log.status,
+		}
+
+	end = min(end, log.line_count)
+	lines = []
+	if start < end:
+		# ? Load only the chunks overlapping the range
+		chunks = frappe.db.sql(
+			"""SELECT `start_line`, `line_count`, `content` FROM `tabBM Log Chunk`
+			WHERE `log` = %s AND `start_line` < %s AND `start_line` + `line_count` > %s
+			ORDER BY `start_line` ASC""",
+			(log_name, end, start),
+			as_dict=True,
+		)
+		for chunk in chunks:
+			chunk_lines = split_lines(chunk.content)
+			lines.extend(chunk_lines[max(0, start - chunk.start_line) : end - chunk.start_line])
+
+	return {
+		"lines": lines,
+		"start": start,
+		"end": start + len(lines),
+		"line_count": log.line_count,
+		"byte_count": log.byte_count,
+		"status": log.status,
+	}
+
+
+# ! benchmate.api.logs.get_log_lines
+@frappe.whitelist()
+def get_log_lines(log_name: str, start: int = 0, end: int | None = None):
+	"""
+	Get a range of lines of a BM Log, e.g. lines 5000-6000.
+
+	Args:
+		log_name (str): BM Log name.
+		start (int): First line, 0 based.
+		end (int | None): Line after the last one.
+
+	Returns:
+		dict: {"success", "message", "data"} with the lines and log totals.
+	"""
+	try:
+		frappe.has_permission("BM Log", "read", log_name, throw=True)
+		data = read_log_lines(
+			log_name, frappe.utils.cint(start), None if end is None else frappe.utils.cint(end)
+		)
+	except Exception as e:
+		return {
+			"success": False,
+			"message": str(e),
+			"data": None,
+		}
+	else:
+		return {
+			"success": True,
+			"message": "Successfully Get The Log Lines",
+			"data": data,
+		}
+
+
+# ! benchmate.api.logs.tail_log
+@frappe.whitelist()
+def tail_log(log_name: str, lines: int = 200):
+	"""
+	Get the last lines of a BM Log.
+
+	Args:
+		log_name (str): BM Log name.
+		lines (int): Number of lines from the end.
+
+	Returns:
+		dict: {"success", "message", "data"} with the lines and log totals.
+	"""
+	try:
+		frappe.has_permission("BM Log", "read", log_name, throw=True)
+		data = read_log_lines(log_name, tail=min(max(frappe.utils.cint(lines), 1), MAX_LINES_PER_READ))
+	except Exception as e:
+		return {
+			"success": False,
+			"message": str(e),
+			"data": None,
+		}
+	else:
+		return {
+			"success": True,
+			"message": "Successfully Get The Log Tail",
+			"data": data,
+		}
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+def stat_key(prefix: str, *paths: Path) -> str:
+	"""
+	Build a cache key from the identity (device, inode, mtime, size) of files.
+
+	Args:
+		prefix (str): Key namespace, e.g. "remote".
+		*paths (Path): Files the cached value is derived from.
+
+	Returns:
+		str: Cache key that changes whenever one of the files changes.
+	"""
+	parts = [prefix]
+	for path in paths:
+		try:
+			stat = path.stat()
+		except OSError:
+			parts.append("-")
+			continue
+		parts.append(f"{stat.st_dev}:{stat.st_ino}:{stat.st_mtime_ns}:{stat.st_size}")
+	return "|".join(parts)
+
+
+def file_size(path: Path) -> int:
+	"""Size of a file, -1 when missing."""
+	try:
+		return path.stat().st_size
+	except OSError:
+		return -1
+
+
+class MetadataCache:
+	"""
+	Thread-safe LRU cache of parsed app metadata, persisted as JSON between sync runs.
+
+	Keys are either content based (app name plus commit), so identical checkouts on
+	different benches share one entry, or file identity based (see `stat_key`).
+
+	Args:
+		max_entries (int): Entries kept before the least recently used are evicted.
+	"""
+
+	def __init__(self, max_entries: int = 4096):
+		self.max_entries = max_entries
+		self.path: Path | None = None
+		self._entries: OrderedDict[str, object] = OrderedDict()
+		self._lock = threading.Lock()
+		self._dirty = False
+
+	def get(self, key: str, compute):
+		"""
+		Get a cached value, computing and storing it on a miss.
+
+		Args:
+			key (str): Cache key.
+			compute (Callable): Produces the value on a miss. Must return JSON serializable data.
+
+		Returns:
+			Any: Cached or computed value.
+		"""
+		with self._lock:
+			if key in self._entries:
+				self._entries.move_to_end(key)
+				return self._entries[key]
+
+		value = compute()
+
+		with self._lock:
+			self._entries[key] = value
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+			self._dirty = True
+
+		return value
+
+	def load(self, path: Path):
+		"""
+		Load persisted entries from a JSON file, once per path.
+
+		Args:
+			path (Path): Cache file.
+		"""
+		path = Path(path)
+		if self.path == path:
+			return
+
+		entries = []
+		try:
+			entries = json.loads(path.read_text(encoding="utf-8"))
+		except (OSError, ValueError):
+			pass
+
+		with self._lock:
+			self.path = path
+			self._entries = OrderedDict((key, value) for key, value in entries[-self.max_entries :])
+			self._dirty = False
+
+	def save(self):
+		"""Write the entries, least recently used first, if anything changed."""
+		with self._lock:
+			if not self.path or not self._dirty:
+				return
+			data = json.dumps(list(self._entries.items()))
+			self._dirty = False
+
+		# ? Write atomically so a concurrent reader never sees a partial file
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+		tmp_path.write_text(data, encoding="utf-8")
+		os.replace(tmp_path, self.path)
+
+
+# ? Process-wide cache shared by every bench inspected in this process
+metadata_cache = MetadataCache()
@@ -0,0 +1,450 @@
+import codecs
+import json
+import os
+import pwd
+import selectors
+import shutil
+import signal
+import socket
+import subprocess
+import time
+from pathlib import Path
+
+import frappe
+
+from benchmate.api.log_sink import LogSink
+from benchmate.api.utils import get_benchmate_settings
+
+# ? BenchMate's own backup engine, run with the python of the bench it backs up
+SITE_BACKUP_PATH = Path(__file__).with_name("site_backup.py")
+
+# ? ionice class and level of each bulk backup I/O priority, class 0 leaves the I/O priority alone
+IO_PRIORITIES = {"Low": (2, 7), "Idle": (3, 0), "Normal": (0, 0)}
+
+# ? BM Log status for each way a command can end
+STATUS_BY_OUTCOME = {
+	"success": "Success",
+	"failed": "Error",
+	"timeout": "Error",
+	"cancelled": "Cancelled",
+}
+
+
+def _kill_group(proc: subprocess.Popen, grace: float = 10.0):
+	"""
+	Terminate the process group of a command, escalating to SIGKILL after the grace period.
+	`sudo` relays the SIGTERM it receives to the command it runs.
+
+	Args:
+		proc (subprocess.Popen): Process started with `start_new_session=True`.
+		grace (float): Seconds between SIGTERM and SIGKILL.
+	"""
+	for sig in (signal.SIGTERM, signal.SIGKILL):
+		try:
+			os.killpg(proc.pid, sig)
+		except (ProcessLookupError, PermissionError):
+			pass
+		try:
+			proc.wait(timeout=grace)
+			return
+		except subprocess.TimeoutExpired:
+			continue
+
+
+def get_low_priority() -> dict:
+	"""
+	CPU and I/O priority of background bulk work (e.g. bulk backups), from BM Settings.
+
+	Returns:
+		dict: {"nice", "io_class", "io_level"} as taken by the `priority` of `run_command`.
+	"""
+	settings = get_benchmate_settings()
+	io_class, io_level = IO_PRIORITIES.get(settings.get("bulk_backup_io_priority"), IO_PRIORITIES["Low"])
+	return {"nice": settings.get("bulk_backup_nice"), "io_class": io_class, "io_level": io_level}
+
+
+def _with_priority(cmd: list[str], priority: dict | None) -> list[str]:
+	"""Prefix a command with `ionice` and `nice`, its children (e.g. sudo and bench) inherit both."""
+	if not priority:
+		return cmd
+
+	prefix = []
+	if priority.get("io_class") and shutil.which("ionice"):
+		prefix += ["ionice", "-c", str(priority["io_class"])]
+		if priority["io_class"] == 2:
+			prefix += ["-n", str(priority.get("io_level") or 0)]
+	if priority.get("nice"):
+		prefix += ["nice", "-n", str(priority["nice"])]
+	return prefix + cmd
+
+
+def run_command(
+	cmd: list[str],
+	cwd: str | Path,
+	sink: LogSink,
+	stdin_text: str | None = None,
+	timeout: float | None = None,
+	cancel_check=None,
+	cancel_interval: float = 2.0,
+	use_pty: bool = True,
+	priority: dict | None = None,
+) -> dict:
+	"""
+	Run a command and stream its output into a log sink as it arrives.
+
+	Output is read straight from a pty (or a pipe) with non-blocking I/O, so there
+	is no temp file and no polling delay. A pty keeps `bench` and the Python
+	processes it starts line buffered. The command runs in its own process group,
+	which is terminated on timeout or cancellation.
+
+	Args:
+		cmd (list[str]): Command and arguments.
+		cwd (str | Path): Directory to execute in.
+		sink (LogSink): Sink receiving the output.
+		stdin_text (str | None): Text written to stdin, e.g. the sudo password for `sudo -S`.
+		timeout (float | None): Seconds before the command is terminated.
+		cancel_check (Callable | None): Returns True when the command should be cancelled.
+		cancel_interval (float): Seconds between two `cancel_check` calls.
+		use_pty (bool): Read output through a pty, falls back to a pipe where unavailable.
+		priority (dict | None): {"nice", "io_class", "io_level"} to run the command with, see `get_low_priority`.
+
+	Returns:
+		dict: {"outcome", "status", "returncode", "duration", "bytes"} where outcome is
+		"success", "failed", "timeout" or "cancelled" and status the matching BM Log status.
+	"""
+	started = time.monotonic()
+	deadline = started + timeout if timeout else None
+	use_pty = use_pty and hasattr(os, "openpty")
+
+	if use_pty:
+		read_fd, write_fd = os.openpty()
+		stdout = write_fd
+	else:
+		read_fd, write_fd, stdout = None, None, subprocess.PIPE
+
+	try:
+		proc = subprocess.Popen(
+			_with_priority(cmd, priority),
+			cwd=cwd,
+			stdin=subprocess.PIPE,
+			stdout=stdout,
+			stderr=subprocess.STDOUT,
+			start_new_session=True,
+		)
+	except Exception:
+		if use_pty:
+			os.close(read_fd)
+			os.close(write_fd)
+		raise
+
+	if use_pty:
+		# ? Only the child keeps the terminal side open, so EOF means it exited
+		os.close(write_fd)
+	else:
+		read_fd = proc.stdout.fileno()
+	os.set_blocking(read_fd, False)
+
+	# ? Send stdin (e.g. the sudo password), then close it
+	try:
+		if stdin_text:
+			proc.stdin.write(stdin_text.encode())
+		proc.stdin.close()
+	except BrokenPipeError:
+		pass
+
+	decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+	selector = selectors.DefaultSelector()
+	selector.register(read_fd, selectors.EVENT_READ)
+	outcome, total_bytes, next_cancel_check = None, 0, started
+
+	try:
+		while True:
+			now = time.monotonic()
+
+			if cancel_check and now >= next_cancel_check:
+				next_cancel_check = now + cancel_interval
+				if cancel_check():
+					outcome = "cancelled"
+					break
+
+			if deadline and now >= deadline:
+				outcome = "timeout"
+				break
+
+			wait = 0.5 if not deadline else max(0.0, min(0.5, deadline - now))
+			if not selector.select(timeout=wait):
+				sink.flush_if_due()
+				continue
+
+			try:
+				data = os.read(read_fd, 64 * 1024)
+			except BlockingIOError:
+				continue
+			except OSError:
+				# ? A pty reports EIO once the child side is closed
+				data = b""
+
+			if not data:
+				break
+
+			total_bytes += len(data)
+			sink.write(decoder.decode(data).replace("\r\n", "\n"))
+	except BaseException:
+		# ? E.g. the job timeout of the worker, do not leave the command running
+		outcome = outcome or "cancelled"
+		raise
+	finally:
+		selector.close()
+
+		# ? The output closed, the command still has to exit before the deadline
+		if not outcome:
+			try:
+				proc.wait(timeout=max(0.0, deadline - time.monotonic()) if deadline else None)
+			except subprocess.TimeoutExpired:
+				outcome = "timeout"
+
+		if outcome:
+			_kill_group(proc)
+		proc.wait()
+
+		remaining = decoder.decode(b"", final=True)
+		if remaining:
+			sink.write(remaining)
+
+		if use_pty:
+			os.close(read_fd)
+		elif proc.stdout:
+			proc.stdout.close()
+
+	return _finish(sink, outcome, proc.returncode, started, total_bytes)
+
+
+def _finish(
+	sink: LogSink, outcome: str | None, returncode: int | None, started: float, total_bytes: int
+) -> dict:
+	"""Write how a command ended and build the result of `run_command`."""
+	duration = round(time.monotonic() - started, 3)
+	if outcome == "timeout":
+		sink.write(f"\nTimed out after {int(duration)}s, the command was terminated.\n")
+	elif outcome == "cancelled":
+		sink.write("\nCancelled, the command was terminated.\n")
+	elif returncode != 0:
+		outcome = "failed"
+		sink.write(f"\nCommand exited with status {returncode}.\n")
+	else:
+		outcome = "success"
+
+	return {
+		"outcome": outcome,
+		"status": STATUS_BY_OUTCOME[outcome],
+		"returncode": returncode,
+		"duration": duration,
+		"bytes": total_bytes,
+	}
+
+
+class HelperUnavailable(Exception):
+	"""The privileged helper is not running."""
+
+
+def run_helper_command(
+	socket_path: str,
+	token: str,
+	bench_path: str | Path,
+	args: list[str],
+	sink: LogSink,
+	timeout: float | None = None,
+	cancel_check=None,
+	cancel_interval: float = 2.0,
+	priority: dict | None = None,
+) -> dict:
+	"""
+	Run a bench command through the privileged helper, see `benchmate.api.helper`.
+
+	The helper streams the output back over its Unix socket. Closing the connection
+	makes it terminate the command, which is how timeouts and cancellation work here.
+
+	Args:
+		socket_path (str): Socket of the helper.
+		token (str): Token set in BM Settings.
+		bench_path (str | Path): Bench to run the command in.
+		args (list[str]): Arguments after `bench`.
+		sink (LogSink): Sink receiving the output.
+		timeout (float | None): Seconds before the command is terminated.
+		cancel_check (Callable | None): Returns True when the command should be cancelled.
+		cancel_interval (float): Seconds between two `cancel_check` calls.
+		priority (dict | None): CPU and I/O priority of the command, see `run_command`.
+
+	Returns:
+		dict: Same as `run_command`.
+
+	Raises:
+		HelperUnavailable: When the helper does not accept connections, nothing was run.
+	"""
+	started = time.monotonic()
+	deadline = started + timeout if timeout else None
+
+	conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		conn.connect(socket_path)
+	except OSError as e:
+		conn.close()
+		raise HelperUnavailable(str(e)) from e
+
+	selector = selectors.DefaultSelector()
+	outcome, returncode, total_bytes, next_cancel_check = None, None, 0, started
+	buffer = b""
+	try:
+		request = {"token": token, "bench_path": str(bench_path), "args": args, "priority": priority}
+		conn.sendall((json.dumps(request) + "\n").encode())
+		selector.register(conn, selectors.EVENT_READ)
+
+		while returncode is None:
+			now = time.monotonic()
+
+			if cancel_check and now >= next_cancel_check:
+				next_cancel_check = now + cancel_interval
+				if cancel_check():
+					outcome = "cancelled"
+					break
+
+			if deadline and now >= deadline:
+				outcome = "timeout"
+				break
+
+			wait = 0.5 if not deadline else max(0.0, min(0.5, deadline - now))
+			if not selector.select(timeout=wait):
+				sink.flush_if_due()
+				continue
+
+			data = conn.recv(64 * 1024)
+			if not data:
+				sink.write("\nThe helper closed the connection.\n")
+				returncode = -1
+				break
+
+			buffer += data
+			while b"\n" in buffer:
+				line, buffer = buffer.split(b"\n", 1)
+				message = json.loads(line)
+				if "data" in message:
+					total_bytes += len(message["data"].encode())
+					sink.write(message["data"].replace("\r\n", "\n"))
+				elif "exit" in message:
+					returncode = message["exit"]
+				elif "error" in message:
+					sink.write(f"\nHelper error: {message['error']}\n")
+					returncode = -1
+	except BaseException:
+		outcome = outcome or "cancelled"
+		raise
+	finally:
+		# ? Closing the connection terminates a command that is still running
+		selector.close()
+		conn.close()
+
+	return _finish(sink, outcome, returncode, started, total_bytes)
+
+
+def run_bench_command(
+	args: list[str],
+	bench_path: str | Path,
+	sink: LogSink,
+	sudo_password: str,
+	timeout: float | None = None,
+	cancel_check=None,
+	priority: dict | None = None,
+) -> dict:
+	"""
+	Run a bench command, through the privileged helper when enabled and running, else with `sudo -S bench`.
+
+	Actions do not use the worker pool: every job runs in a freshly forked work-horse that would
+	start (and tear down) a warm worker for a single command, the long-lived helper keeps them warm.
+
+	Args:
+		args (list[str]): Arguments after `bench`, e.g. ["--site", "a.localhost", "backup"].
+		bench_path (str | Path): Bench to run the command in.
+		sink (LogSink): Sink receiving the output.
+		sudo_password (str): Password for `sudo -S`, used when falling back.
+		timeout (float | None): Seconds before the command is terminated.
+		cancel_check (Callable | None): Returns True when the command should be cancelled.
+		priority (dict | None): CPU and I/O priority of the command, see `run_command`.
+
+	Returns:
+		dict: Same as `run_command`.
+	"""
+	settings = get_benchmate_settings()
+	if settings.get("use_helper"):
+		try:
+			return run_helper_command(
+				settings.get("helper_socket"),
+				settings.get("helper_token"),
+				bench_path,
+				args,
+				sink,
+				timeout=timeout,
+				cancel_check=cancel_check,
+				priority=priority,
+			)
+		except HelperUnavailable as e:
+			# ? Helper not running, take the sudo path
+			frappe.log_error(f"BenchMate helper unavailable, using sudo: {e}", "BenchMate Helper")
+
+	return run_command(
+		["sudo", "-S", "bench", *args],
+		cwd=bench_path,
+		sink=sink,
+		stdin_text=sudo_password + "\n",
+		timeout=timeout,
+		cancel_check=cancel_check,
+		priority=priority,
+	)
+
+
+def run_bench_script(
+	script: str | Path,
+	args: list[str],
+	bench_path: str | Path,
+	sink: LogSink,
+	sudo_password: str,
+	timeout: float | None = None,
+	cancel_check=None,
+	input_text: str | None = None,
+	priority: dict | None = None,
+) -> dict:
+	"""
+	Run a standalone BenchMate script (e.g. `SITE_BACKUP_PATH`) with the python of a bench, from its
+	`sites` directory. The script runs as the bench owner, through `sudo -S -u` when that is another user.
+
+	Args:
+		script (str | Path): Script to run, it may only use the standard library and the bench's packages.
+		args (list[str]): Arguments of the script.
+		bench_path (str | Path): Bench to run the script in.
+		sink (LogSink): Sink receiving the output.
+		sudo_password (str): Password for `sudo -S`.
+		timeout (float | None): Seconds before the script is terminated.
+		cancel_check (Callable | None): Returns True when the script should be cancelled.
+		input_text (str | None): Line written to the script's stdin (after the sudo password), e.g. a secret.
+		priority (dict | None): CPU and I/O priority of the script, see `run_command`.
+
+	Returns:
+		dict: Same as `run_command`.
+	"""
+	bench_path = Path(bench_path)
+	cmd = [str(bench_path / "env" / "bin" / "python"), str(script), *args]
+
+	stdin_text = f"{input_text}\n" if input_text else None
+	owner = bench_path.stat().st_uid
+	if owner != os.getuid():
+		cmd = ["sudo", "-S", "-u", pwd.getpwuid(owner).pw_name, *cmd]
+		stdin_text = sudo_password + "\n" + (stdin_text or "")
+
+	return run_command(
+		cmd,
+		cwd=bench_path / "sites",
+		sink=sink,
+		stdin_text=stdin_text,
+		timeout=timeout,
+		cancel_check=cancel_check,
+		priority=priority,
+	)
@@ -0,0 +1,503 @@
+import json
+import os
+import time
+from collections import Counter
+
+import frappe
+from frappe.utils import get_datetime, now_datetime, time_diff_in_seconds
+from frappe.utils.synchronization import filelock
+
+from benchmate.api.log_sink import LogSink
+from benchmate.api.logs import MAX_LINES_PER_READ, read_log_lines
+from benchmate.api.utils import get_benchmate_settings
+
+# ? Background task, job timeout, I/O weight and secrets of every scheduled action
+ACTIONS = {
+	"Create Site": {
+		"method": "benchmate.api.actions.create_site.create_site_background",
+		"timeout": 3600,
+		"heavy_io": True,
+		"secrets": {"sudo_password": "sudo_password", "mysql_root_password": "db_password"},
+	},
+	"Drop Site": {
+		"method": "benchmate.api.actions.drop_site.drop_site_background",
+		"timeout": 3600,
+		"heavy_io": False,
+		"secrets": {"sudo_password": "sudo_password", "mysql_root_password": "db_password"},
+	},
+	"Backup Site": {
+		"method": "benchmate.api.actions.backup_site.backup_site_background",
+		"timeout": 3600,
+		"heavy_io": True,
+		"secrets": {"sudo_password": "sudo_password"},
+	},
+	"Restore Site": {
+		"method": "benchmate.api.actions.restore_site.restore_site_background",
+		"timeout": 7200,
+		"heavy_io": True,
+		"secrets": {"sudo_password": "sudo_password", "mysql_root_password": "db_password"},
+	},
+}
+
+# ? Bulk actions, each keeping an aggregated BM Log of the actions it queued, and the method
+# ? recording an action in it once that action ended; called without an action it only
+# ? finalizes the aggregated log when no action is pending
+BULK_ACTIONS = {
+	"Backup Sites": "benchmate.api.actions.backup_sites.record_site_backup",
+}
+
+# ? Seconds past the job timeout after which a running action is considered lost
+STALE_GRACE = 300
+
+
+def submit_action(
+	action: str,
+	bench_name: str,
+	bench_path: str,
+	site_name: str,
+	priority: int = 0,
+	bulk_log: str | None = None,
+	dispatch: bool = True,
+	**job_args,
+):
+	"""
+	Queue an action on a site and start it as soon as the scheduling limits allow.
+
+	The action is stored as a "Queued" BM Log holding its arguments. Secrets are not
+	stored, they are read from BM Settings when the action starts.
+
+	Args:
+		action (str): One of `ACTIONS`, e.g. "Backup Site".
+		bench_name (str): Bench of the site.
+		bench_path (str): Path of the bench.
+		site_name (str): Site the action runs on.
+		priority (int): Higher priorities start first, equal priorities in submission order.
+		bulk_log (str | None): BM Log of the bulk action (e.g. "Backup Sites") queueing this one.
+		dispatch (bool): Start queued actions right away, bulk actions dispatch once after queueing all.
+		**job_args: Extra arguments of the background task, e.g. backup file paths.
+
+	Returns:
+		str: BM Log name, the handle the background task writes to.
+	"""
+	if action not in ACTIONS:
+		frappe.throw(f"Unknown action {action}", frappe.ValidationError)
+
+	log_timestamp = int(time.time())
+	log = frappe.get_doc(
+		{
+			"doctype": "BM Log",
+			"title": f"{action} - {site_name}",
+			"log": "",
+			"log_timestamp": log_timestamp,
+			"status": "Queued",
+			"action": action,
+			"bench_name": bench_name,
+			"site_name": site_name,
+			"priority": frappe.utils.cint(priority),
+			"bulk_log": bulk_log,
+			"job_args": json.dumps({"bench_path": bench_path, **job_args}),
+		}
+	).insert(ignore_permissions=True)
+	frappe.db.commit()
+
+	if dispatch:
+		dispatch_actions()
+	return log.name
+
+
+def get_disk(job_args: str | None) -> int | None:
+	"""
+	Device of the disk the bench of an action lives on.
+
+	Args:
+		job_args (str | None): Job arguments of the action, holding its bench path.
+
+	Returns:
+		int | None: Device id, None when the bench cannot be read.
+	"""
+	try:
+		return os.stat(json.loads(job_args or "{}")["bench_path"]).st_dev
+	except (OSError, KeyError, TypeError, ValueError):
+		return None
+
+
+def dispatch_actions():
+	"""
+	Start the queued actions allowed by the scheduling limits.
+
+	Queued actions are considered by priority, then in submission order:
+	- only one action runs on a site at a time, later actions of that site wait behind it
+	- at most "Actions Per Bench" actions run on a bench
+	- at most "Heavy I/O Actions" disk and DB heavy actions (create, backup, restore) run on the host
+	- at most "Heavy I/O Actions Per Disk" of them run on benches on the same disk
+
+	An action that has to wait does not hold back actions of other sites. Waiting actions
+	get their position in the queue. Runs under a host-wide lock, so concurrent calls from
+	web requests and workers never start the same action twice.
+	"""
+	if (
+		not frappe.db.exists("BM Log", {"status": "Queued"})
+		and not frappe.db.exists("BM Log", {"status": "In Process", "started_on": ["is", "set"]})
+		and not frappe.db.exists("BM Log", {"status": "In Process", "action": ["in", list(BULK_ACTIONS)]})
+	):
+		return
+
+	settings = get_benchmate_settings()
+	bench_limit = settings.get("max_actions_per_bench")
+	heavy_limit = settings.get("max_heavy_actions")
+	disk_limit = settings.get("max_heavy_actions_per_disk")
+
+	with filelock("benchmate_action_scheduler", timeout=60, is_global=True):
+		reclaim_stale_actions()
+
+		running = frappe.get_all(
+			"BM Log",
+			filters={"status": "In Process", "started_on": ["is", "set"]},
+			fields=["name", "action", "bench_name", "site_name", "job_args"],
+		)
+		busy_sites = {(entry.bench_name, entry.site_name) for entry in running}
+		bench_usage = Counter(entry.bench_name for entry in running)
+		heavy_running = [entry for entry in running if ACTIONS.get(entry.action, {}).get("heavy_io")]
+		heavy_usage = len(heavy_running)
+
+		# ? Benches of one disk share its I/O, whatever bench they belong to
+		disks = {}
+
+		def get_bench_disk(entry) -> int | None:
+			if entry.bench_name not in disks:
+				disks[entry.bench_name] = get_disk(entry.job_args)
+			return disks[entry.bench_name]
+
+		disk_usage = Counter(get_bench_disk(entry) for entry in heavy_running)
+
+		# ? Aggregated logs of bulk actions are queued while their actions are submitted, they never start
+		queued = frappe.get_all(
+			"BM Log",
+			filters={"status": "Queued", "action": ["in", list(ACTIONS)]},
+			fields=["name", "action", "bench_name", "site_name", "queue_position", "job_args"],
+			order_by="priority desc, creation asc",
+		)
+
+		position = 0
+		for entry in queued:
+			spec = ACTIONS.get(entry.action)
+			site = (entry.bench_name, entry.site_name)
+			disk = get_bench_disk(entry) if spec and spec["heavy_io"] else None
+
+			can_start = (
+				spec
+				and site not in busy_sites
+				and (not bench_limit or bench_usage[entry.bench_name] < bench_limit)
+				and (not spec["heavy_io"] or not heavy_limit or heavy_usage < heavy_limit)
+				and (disk is None or not disk_limit or disk_usage[disk] < disk_limit)
+			)
+
+			# ? Keep the actions of a site in order
+			busy_sites.add(site)
+
+			if not can_start:
+				position += 1
+				if entry.queue_position != position:
+					frappe.db.set_value(
+						"BM Log", entry.name, "queue_position", position, update_modified=False
+					)
+				continue
+
+			start_action(entry.name, spec)
+			bench_usage[entry.bench_name] += 1
+			heavy_usage += spec["heavy_io"]
+			if disk is not None:
+				disk_usage[disk] += 1
+
+		frappe.db.commit()
+
+
+def start_action(log_name: str, spec: dict):
+	"""
+	Mark a queued action as running and enqueue its background job.
+
+	Args:
+		log_name (str): BM Log of the action.
+		spec (dict): Entry of `ACTIONS`.
+	"""
+	frappe.db.set_value(
+		"BM Log", log_name, {"queue_position": 0, "started_on": now_datetime()}, update_modified=False
+	)
+
+	# ? Commits and tells open viewers the action started
+	LogSink(log_name, error_title="BenchMate Scheduler").set_status("In Process")
+
+	try:
+		frappe.enqueue(
+			"benchmate.api.scheduler.run_action",
+			queue="long",
+			timeout=spec["timeout"],
+			log_name=log_name,
+		)
+	except Exception as e:
+		frappe.log_error(f"Failed to enqueue action {log_name}: {e}", "BenchMate Scheduler")
+		end_action(log_name, "Error", f"\nFailed to enqueue the action: {e}\n")
+
+
+def run_action(log_name: str):
+	"""
+	Background job running a scheduled action, then starting the next queued ones.
+
+	Args:
+		log_name (str): BM Log of the action.
+	"""
+	log = frappe.db.get_value(
+		"BM Log", log_name, ["action", "bench_name", "site_name", "status", "job_args"], as_dict=True
+	)
+	if not log or log.status != "In Process":
+		return
+
+	try:
+		spec = ACTIONS[log.action]
+
+		# ? Cancelled while waiting for a worker
+		if is_cancel_requested(log_name):
+			end_action(log_name, "Cancelled", "\nCancelled before it started.\n")
+			return
+
+		# ? Resolve secrets only now, they never sit in the queue
+		settings = get_benchmate_settings()
+		secrets = {arg: settings.get(key) for arg, key in spec["secrets"].items()}
+
+		frappe.get_attr(spec["method"])(
+			log_name=log_name,
+			bench_name=log.bench_name,
+			site_name=log.site_name,
+			**json.loads(log.job_args or "{}"),
+			**secrets,
+		)
+	except Exception as e:
+		frappe.log_error(f"Error running action {log_name}: {e}", "BenchMate Scheduler")
+	finally:
+		# ? A task that died early must not hold its site
+		if frappe.db.get_value("BM Log", log_name, "status") == "In Process":
+			end_action(log_name, "Error")
+		else:
+			if not frappe.db.get_value("BM Log", log_name, "ended_on"):
+				frappe.db.set_value("BM Log", log_name, "ended_on", now_datetime(), update_modified=False)
+			record_in_bulk_log(log_name)
+		frappe.db.commit()
+		frappe.cache.delete_value(_cancel_key(log_name))
+
+		# ? Free the slot for the next queued action
+		dispatch_actions()
+
+
+def end_action(log_name: str, status: str, message: str | None = None):
+	"""
+	Close an action that did not run to completion, e.g. cancelled while queued.
+
+	Args:
+		log_name (str): BM Log of the action.
+		status (str): Final BM Log status.
+		message (str | None): Line appended to the log.
+	"""
+	frappe.db.set_value("BM Log", log_name, "ended_on", now_datetime(), update_modified=False)
+
+	log = LogSink(log_name, error_title="BenchMate Scheduler")
+	if message:
+		log.write(message)
+	log.set_status(status)
+
+	record_in_bulk_log(log_name)
+
+
+def record_in_bulk_log(log_name: str):
+	"""
+	Record an ended action in the aggregated BM Log of the bulk action that queued it, if any.
+
+	Args:
+		log_name (str): BM Log of the action.
+	"""
+	bulk_log = frappe.db.get_value("BM Log", log_name, "bulk_log")
+	if not bulk_log:
+		return
+
+	# ? A failure here leaves the aggregated log open, `reclaim_stale_actions` finalizes it later
+	try:
+		method = BULK_ACTIONS[frappe.db.get_value("BM Log", bulk_log, "action")]
+		frappe.get_attr(method)(bulk_log, log_name)
+	except Exception:
+		frappe.log_error(title=f"Error recording {log_name} in {bulk_log}", message=frappe.get_traceback())
+
+
+def reclaim_stale_actions():
+	"""
+	Mark running actions whose job outlived its timeout (e.g. a killed worker) as Error, and
+	finalize bulk actions whose actions all ended but whose aggregated log was left open.
+	"""
+	running = frappe.get_all(
+		"BM Log",
+		filters={"status": "In Process", "started_on": ["is", "set"]},
+		fields=["name", "action", "started_on"],
+	)
+	for entry in running:
+		timeout = ACTIONS.get(entry.action, {}).get("timeout", 3600)
+		if time_diff_in_seconds(now_datetime(), get_datetime(entry.started_on)) < timeout + STALE_GRACE:
+			continue
+
+		end_action(
+			entry.name, "Error", "\nThe job did not finish within its timeout and was marked as Error.\n"
+		)
+
+	# ? Aggregated logs have no `started_on`, they end once none of their actions is pending
+	bulk_logs = frappe.get_all(
+		"BM Log",
+		filters={"status": "In Process", "action": ["in", list(BULK_ACTIONS)]},
+		fields=["name", "action"],
+	)
+	for entry in bulk_logs:
+		if frappe.db.exists("BM Log", {"bulk_log": entry.name, "status": ["in", ["Queued", "In Process"]]}):
+			continue
+		try:
+			frappe.get_attr(BULK_ACTIONS[entry.action])(entry.name)
+		except Exception:
+			frappe.log_error(title=f"Error finalizing {entry.name}", message=frappe.get_traceback())
+
+
+def _cancel_key(log_name: str) -> str:
+	return f"benchmate_cancel|{log_name}"
+
+
+def is_cancel_requested(log_name: str) -> bool:
+	"""
+	Check whether the user asked to cancel a running action, polled by the command runner.
+
+	Args:
+		log_name (str): BM Log of the action.
+
+	Returns:
+		bool: True when the action should be terminated.
+	"""
+	return bool(frappe.cache.get_value(_cancel_key(log_name)))
+
+
+# ! benchmate.api.scheduler.cancel_action
+@frappe.whitelist()
+def cancel_action(log_name: str):
+	"""
+	Cancel a site action.
+
+	A queued action is marked "Cancelled" right away. A running action is flagged, its
+	job then terminates the whole sudo/bench process group within a few seconds and
+	marks the BM Log "Cancelled". Cancelling a bulk action cancels every action it queued
+	that did not end yet.
+
+	Args:
+		log_name (str): BM Log of the action.
+
+	Returns:
+		dict: {"success", "message", "data"} with the BM Log status.
+	"""
+	try:
+		frappe.has_permission("BM Log", "write", log_name, throw=True)
+
+		# ? Hold the scheduler lock so the action is not started meanwhile
+		with filelock("benchmate_action_scheduler", timeout=60, is_global=True):
+			log = frappe.db.get_value("BM Log", log_name, ["action", "status"], as_dict=True)
+			if not log or (log.action not in ACTIONS and log.action not in BULK_ACTIONS):
+				frappe.throw(f"BM Log {log_name} is not a site action", frappe.ValidationError)
+			if log.status not in ("Queued", "In Process"):
+				frappe.throw(f"The action already ended with status {log.status}", frappe.ValidationError)
+
+			if log.action in BULK_ACTIONS:
+				actions = frappe.get_all(
+					"BM Log",
+					filters={"bulk_log": log_name, "status": ["in", ["Queued", "In Process"]]},
+					fields=["name", "action", "status"],
+				)
+				for entry in actions:
+					_cancel(entry.name, entry.action, entry.status)
+				message = f"Cancelling {len(actions)} actions"
+			elif log.status == "Queued":
+				_cancel(log_name, log.action, log.status)
+				message = "Action cancelled"
+			else:
+				_cancel(log_name, log.action, log.status)
+				message = "Cancellation requested, the command is being terminated"
+
+		# ? Move the actions behind it up the queue
+		dispatch_actions()
+
+	except Exception as e:
+		return {
+			"success": False,
+			"message": str(e),
+			"data": None,
+		}
+	else:
+		return {
+			"success": True,
+			"message": message,
+			"data": {"status": frappe.db.get_value("BM Log", log_name, "status")},
+		}
+
+
+def _cancel(log_name: str, action: str, status: str):
+	"""End a queued action, flag a running one for its job to terminate."""
+	if status == "Queued":
+		end_action(log_name, "Cancelled", "\nCancelled before it started.\n")
+	else:
+		frappe.cache.set_value(
+			_cancel_key(log_name), 1, expires_in_sec=ACTIONS[action]["timeout"] + STALE_GRACE
+		)
+
+
+# ! benchmate.api.scheduler.get_action_status
+@frappe.whitelist()
+def get_action_status(log_name: str, lines: int = 20):
+	"""
+	Get the progress of a site action without loading its full log.
+
+	Args:
+		log_name (str): BM Log of the action.
+		lines (int): Number of last output lines to include.
+
+	Returns:
+		dict: {"success", "message", "data"} with the status, queue position, elapsed
+		seconds, bytes and lines of output and the last lines.
+	"""
+	try:
+		frappe.has_permission("BM Log", "read", log_name, throw=True)
+		log = frappe.db.get_value(
+			"BM Log",
+			log_name,
+			["action", "status", "bench_name", "site_name", "queue_position", "started_on", "ended_on"],
+			as_dict=True,
+		)
+		if not log:
+			frappe.throw(f"BM Log {log_name} not found", frappe.DoesNotExistError)
+
+		tail = read_log_lines(log_name, tail=min(max(frappe.utils.cint(lines), 1), MAX_LINES_PER_READ))
+
+		elapsed = None
+		if log.started_on:
+			elapsed = time_diff_in_seconds(
+				get_datetime(log.ended_on) if log.ended_on else now_datetime(), get_datetime(log.started_on)
+			)
+
+		data = {
+			**log,
+			"elapsed": elapsed,
+			"byte_count": tail["byte_count"],
+			"line_count": tail["line_count"],
+			"lines": tail["lines"],
+			"cancel_requested": log.status == "In Process" and is_cancel_requested(log_name),
+		}
+	except Exception as e:
+		return {
+			"success": False,
+			"message": str(e),
+			"data": None,
+		}
+	else:
+		return {
+			"success": True,
+			"message": "Successfully Get The Action Status",
+			"data": data,
+		}
@@ -0,0 +1,1512 @@
+"""
+BenchMate's own backup engine for Frappe sites, dumping and restoring the tables of a site in parallel.
+
+Runs with the bench's own `env/bin/python` from its `sites` directory (PyMySQL ships with Frappe):
+
+	../env/bin/python site_backup.py dump --site a.localhost --jobs 4 --with-files
+
+Every worker process opens its own connection and snapshot, then dumps tables from a shared
+queue, one gzip member per table. The members are joined in table order into the usual
+`<timestamp>-<site>-database.sql.gz`, which `bench restore` reads like any other backup. A
+manifest next to it lists every table with its row count, size, checksum and position in the
+dump, so tables can be verified and loaded on their own.
+
+While the workers open their snapshots the tables of the site are locked for reading, so the
+dumped tables are consistent with each other.
+
+`restore` recreates the site database and loads a dump over several connections, with foreign key
+and unique checks relaxed. Dumps with a manifest are loaded table by table straight from their
+gzip members, other dumps (e.g. from `bench backup`) are split by table while they are read,
+decompressed by `pigz` or `gzip` in a pipe. Nothing is extracted to disk first: file archives are
+streamed into `tar` as well. Throughput of every stream is printed while it runs:
+
+	../env/bin/python site_backup.py restore --site a.localhost --jobs 4 <dump.sql.gz> \\
+		--with-public-files <files.tar> --with-private-files <private-files.tar>
+
+With `--dedup-files` (or `backup-files` on its own) public and private files go into a
+content-addressed store, `<site>/private/file-store`, instead of being tarred again. Files are
+split into chunks saved once under their SHA-256, and `<prefix>-files.json` lists the chunks of
+every file. Files unchanged since the previous backup are not even read, so a backup costs what
+changed. `restore --with-files-manifest` and `restore-files` rebuild the files from any manifest:
+
+	../env/bin/python site_backup.py restore-files --site a.localhost <prefix>-files.json
+
+This file runs inside other benches, so it only uses the standard library and the bench's own
+packages. Progress is printed line by line for the BM Log.
+"""
+
+import argparse
+import codecs
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from pathlib import Path
+from stat import S_IMODE, S_ISREG
+
+MANIFEST_VERSION = 1
+
+# ? Size of a single INSERT statement, well below the default max_allowed_packet
+INSERT_BYTES = 1024 * 1024
+
+# ? Seconds a worker may take to open its connection and snapshot
+SNAPSHOT_TIMEOUT = 60
+
+# ? Bytes loaded between two commits of a restore worker
+COMMIT_BYTES = 64 * 1024 * 1024
+
+# ? Bytes read at once from a dump
+READ_BYTES = 1024 * 1024
+
+# ? Seconds between two progress lines of a restore
+PROGRESS_INTERVAL = 10
+
+# ? Statements waiting per restore worker before the splitter blocks
+QUEUE_SIZE = 256
+
+# ? Session settings of a restore connection, keys and foreign keys are not checked while loading
+RELAXED_CHECKS = ("SET FOREIGN_KEY_CHECKS=0", "SET UNIQUE_CHECKS=0", "SET autocommit=0")
+
+TABLE_STATEMENT = re.compile(
+	r"^(?:/\*!\d+\s+)?(?:DROP TABLE IF EXISTS|CREATE TABLE(?: IF NOT EXISTS)?|INSERT(?: IGNORE)? INTO|"
+	r"REPLACE INTO|ALTER TABLE)\s+`((?:[^`]|``)+)`",
+	re.IGNORECASE,
+)
+SESSION_STATEMENT = re.compile(r"^(?:/\*!\d+\s+)?SET\s", re.IGNORECASE)
+SKIPPED_STATEMENT = re.compile(r"^(?:/\*!\d+\s+)?(?:LOCK|UNLOCK) TABLES\b", re.IGNORECASE)
+
+# ? Size of a chunk of the deduplicated file store
+CHUNK_BYTES = 4 * 1024 * 1024
+
+# ? Folders of a site backed up into the file store, below `<site>/<folder>/files`
+FILE_FOLDERS = ("public", "private")
+
+# ? File store of a site, below its private folder but outside of `private/files` and `private/backups`
+FILE_STORE = "file-store"
+
+DEFINER_PATTERN = re.compile(r"\s+DEFINER=`[^`]*`@`[^`]*`")
+
+DUMP_HEADER = """-- BenchMate parallel dump of {site}
+/*!40101 SET NAMES utf8mb4 */;
+SET FOREIGN_KEY_CHECKS=0;
+SET UNIQUE_CHECKS=0;
+SET SQL_MODE='NO_AUTO_VALUE_ON_ZERO';
+"""
+
+DUMP_FOOTER = """SET FOREIGN_KEY_CHECKS=1;
+SET UNIQUE_CHECKS=1;
+-- Dump completed on {created}
+"""
+
+
+def read_site_config(site_name: str) -> dict:
+	"""Effective config of a site, `site_config.json` overriding `common_site_config.json`."""
+	config = {}
+	for config_path in (Path("common_site_config.json"), Path(site_name) / "site_config.json"):
+		if config_path.is_file():
+			config.update(json.loads(config_path.read_text(encoding="utf-8")))
+	return config
+
+
+def connect(config: dict, root_password: str | None = None, database: str | None = None):
+	"""
+	Connect to the database server of a site.
+
+	Args:
+		config (dict): Effective site config.
+		root_password (str | None): Connect as the DB root user instead of the site user.
+		database (str | None): Database to use, the site database by default.
+	"""
+	import pymysql
+
+	kwargs = {
+		"host": config.get("db_host") or "127.0.0.1",
+		"port": int(config.get("db_port") or 3306),
+		"user": config.get("db_user") or config["db_name"],
+		"password": config["db_password"],
+		"database": database or config["db_name"],
+		"charset": "utf8mb4",
+	}
+	if root_password:
+		kwargs.update({"user": config.get("root_login") or "root", "password": root_password})
+	if config.get("db_socket"):
+		kwargs["unix_socket"] = config["db_socket"]
+	return pymysql.connect(**kwargs)
+
+
+def quote(name: str) -> str:
+	"""Quote an identifier."""
+	return "`" + name.replace("`", "``") + "`"
+
+
+def get_backup_prefix(site_name: str) -> str:
+	"""File name prefix of a backup, the same as `bench backup` uses."""
+	return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}-{site_name.replace('.', '_')}"
+
+
+class HashingWriter:
+	"""File wrapper counting and hashing the bytes written through it."""
+
+	def __init__(self, file):
+		self.file = file
+		self.sha256 = hashlib.sha256()
+		self.size = 0
+
+	def write(self, data: bytes) -> int:
+		self.sha256.update(data)
+		self.size += len(data)
+		return self.file.write(data)
+
+	def flush(self):
+		self.file.flush()
+
+
+def write_member(path: Path, text: str, compress_level: int) -> dict:
+	"""Write text as a single gzip member, returning its size and checksum."""
+	with open(path, "wb") as raw:
+		writer = HashingWriter(raw)
+		with gzip.GzipFile(fileobj=writer, mode="wb", compresslevel=compress_level, mtime=0) as out:
+			out.write(text.encode())
+	return {"bytes": len(text.encode()), "compressed_bytes": writer.size, "sha256": writer.sha256.hexdigest()}
+
+
+def dump_table(conn, table: str, path: Path, compress_level: int) -> dict:
+	"""
+	Dump the schema and rows of a table into a gzip file, reading rows unbuffered.
+
+	Returns:
+		dict: {"name", "rows", "bytes", "compressed_bytes", "sha256", "seconds"}
+	"""
+	import pymysql.cursors
+
+	started = time.monotonic()
+	rows = size = 0
+
+	cursor = conn.cursor()
+	cursor.execute(f"SHOW CREATE TABLE {quote(table)}")
+	create = cursor.fetchone()[1]
+	cursor.close()
+
+	with open(path, "wb") as raw:
+		writer = HashingWriter(raw)
+		with gzip.GzipFile(fileobj=writer, mode="wb", compresslevel=compress_level, mtime=0) as out:
+
+			def emit(text: str):
+				nonlocal size
+				# ? Bytes of binary columns that are not UTF-8 come back as escaped surrogates
+				data = text.encode("utf-8", "surrogateescape")
+				size += len(data)
+				out.write(data)
+
+			emit(f"\n-- Table {table}\nDROP TABLE IF EXISTS {quote(table)};\n{create};\n")
+
+			cursor = conn.cursor(pymysql.cursors.SSCursor)
+			try:
+				cursor.execute(f"SELECT * FROM {quote(table)}")
+				insert = f"INSERT INTO {quote(table)} VALUES "
+				values, values_size = [], 0
+				while batch := cursor.fetchmany(1000):
+					for row in batch:
+						value = conn.escape(row)
+						values.append(value)
+						values_size += len(value) + 1
+						if values_size >= INSERT_BYTES:
+							emit(insert + ",".join(values) + ";\n")
+							values, values_size = [], 0
+					rows += len(batch)
+				if values:
+					emit(insert + ",".join(values) + ";\n")
+			finally:
+				cursor.close()
+
+	return {
+		"name": table,
+		"rows": rows,
+		"bytes": size,
+		"compressed_bytes": writer.size,
+		"sha256": writer.sha256.hexdigest(),
+		"seconds": round(time.monotonic() - started, 3),
+	}
+
+
+def dump_worker(config: dict, parts_path: Path, compress_level: int, tasks, results, ready):
+	"""Worker process: open a snapshot, report ready, then dump tables until the queue is drained."""
+	signal.signal(signal.SIGTERM, signal.SIG_DFL)
+	try:
+		conn = connect(config)
+		cursor = conn.cursor()
+		cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+		cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+		cursor.close()
+	except Exception as e:
+		ready.put(str(e))
+		return
+	ready.put(None)
+
+	while (task := tasks.get()) is not None:
+		index, table = task
+		try:
+			results.put(dump_table(conn, table, parts_path / f"{index}.sql.gz", compress_level))
+		except Exception as e:
+			results.put({"name": table, "error": str(e)})
+	conn.close()
+
+
+def list_tables(conn, db_name: str) -> tuple[list[str], list[str]]:
+	"""Base tables of the database, largest first, and its views."""
+	cursor = conn.cursor()
+	cursor.execute(
+		"SELECT TABLE_NAME, TABLE_TYPE FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s "
+		"ORDER BY DATA_LENGTH + INDEX_LENGTH DESC",
+		(db_name,),
+	)
+	rows = cursor.fetchall()
+	cursor.close()
+	tables = [name for name, kind in rows if kind == "BASE TABLE"]
+	views = sorted(name for name, kind in rows if kind == "VIEW")
+	return tables, views
+
+
+def get_view_definitions(conn, views: list[str]) -> str:
+	"""`CREATE VIEW` statements of the views, without their definer."""
+	statements = []
+	cursor = conn.cursor()
+	for view in views:
+		cursor.execute(f"SHOW CREATE VIEW {quote(view)}")
+		create = DEFINER_PATTERN.sub("", cursor.fetchone()[1])
+		statements.append(f"DROP VIEW IF EXISTS {quote(view)};\n{create};\n")
+	cursor.close()
+	return "".join(statements)
+
+
+def start_file_backups(site_name: str, prefix: Path) -> dict[str, tuple[Path, subprocess.Popen]]:
+	"""Tar the public and private files in the background, laid out like `bench backup --with-files`."""
+	archives = {}
+	for folder, suffix in (("public", "files"), ("private", "private-files")):
+		archive = prefix.with_name(f"{prefix.name}-{suffix}.tar")
+		proc = subprocess.Popen(["tar", "-cf", str(archive), f"./{site_name}/{folder}/files"])
+		archives[folder] = (archive, proc)
+	return archives
+
+
+def dump(args) -> int:
+	"""Dump a site into `<prefix>-database.sql.gz` and `<prefix>-database.json`, see the module docstring."""
+	site_name = args.site
+	config = read_site_config(site_name)
+	if config.get("db_type", "mariadb") != "mariadb":
+		print(f"Unsupported db_type {config.get('db_type')}", flush=True)
+		return 1
+
+	backup_path = Path(args.output or Path(site_name) / "private" / "backups")
+	backup_path.mkdir(parents=True, exist_ok=True)
+	prefix = backup_path / get_backup_prefix(site_name)
+	database_path = prefix.with_name(f"{prefix.name}-database.sql.gz")
+	manifest_path = prefix.with_name(f"{prefix.name}-database.json")
+	files_manifest_path = prefix.with_name(f"{prefix.name}-files.json")
+	parts_path = prefix.with_name(f".{prefix.name}-parts")
+	parts_path.mkdir()
+
+	started = time.monotonic()
+	created = datetime.now().isoformat(timespec="seconds")
+	ctx = multiprocessing.get_context("fork")
+	workers, queues = [], []
+	archives = {}
+	file_backup = None
+	completed = False
+
+	try:
+		if args.dedup_files:
+			file_backup = Background(
+				backup_files, site_name, get_file_store(site_name, args.store), files_manifest_path, args.jobs
+			)
+		elif args.with_files:
+			archives = start_file_backups(site_name, prefix)
+		if args.with_files or args.dedup_files:
+			shutil.copy(Path(site_name) / "site_config.json", f"{prefix}-site_config_backup.json")
+
+		lock_conn = connect(config)
+		tables, views = list_tables(lock_conn, config["db_name"])
+		jobs = max(1, min(args.jobs, len(tables)))
+		print(f"Dumping {len(tables)} tables of {site_name} with {jobs} workers", flush=True)
+
+		# ? Hold writes while every worker opens its snapshot, so all tables show the same moment
+		consistent = True
+		cursor = lock_conn.cursor()
+		try:
+			cursor.execute("LOCK TABLES " + ", ".join(f"{quote(table)} READ" for table in tables))
+		except Exception as e:
+			consistent = False
+			print(f"Could not lock the tables ({e}), tables are only consistent on their own", flush=True)
+
+		tasks, results, ready = queues = [ctx.Queue(), ctx.Queue(), ctx.Queue()]
+		for _ in range(jobs):
+			worker = ctx.Process(
+				target=dump_worker, args=(config, parts_path, args.compress_level, tasks, results, ready)
+			)
+			worker.start()
+			workers.append(worker)
+
+		try:
+			for _ in workers:
+				error = ready.get(timeout=SNAPSHOT_TIMEOUT)
+				if error:
+					raise RuntimeError(f"Worker could not open a snapshot: {error}")
+		finally:
+			if consistent:
+				cursor.execute("UNLOCK TABLES")
+			cursor.close()
+
+		views_sql = get_view_definitions(lock_conn, views)
+		lock_conn.close()
+
+		# ? Largest tables first, parts are named after their position in the dump
+		positions = {table: index for index, table in enumerate(sorted(tables))}
+		for table in tables:
+			tasks.put((positions[table], table))
+		for _ in workers:
+			tasks.put(None)
+
+		# ? Collect the results as tables complete
+		dumped = {}
+		while len(dumped) < len(tables):
+			try:
+				result = results.get(timeout=5)
+			except queue.Empty:
+				if not any(worker.is_alive() for worker in workers):
+					raise RuntimeError("Dump workers exited before all tables were dumped") from None
+				continue
+			if result.get("error"):
+				raise RuntimeError(f"Could not dump {result['name']}: {result['error']}")
+
+			dumped[result["name"]] = result
+			print(
+				f"[{len(dumped)}/{len(tables)}] {result['name']}: {result['rows']} rows, "
+				f"{result['bytes']} bytes in {result['seconds']}s",
+				flush=True,
+			)
+
+		for worker in workers:
+			worker.join()
+
+		# ? Join the members in table order, recording where each table starts
+		header = write_member(
+			parts_path / "header.sql.gz", DUMP_HEADER.format(site=site_name), args.compress_level
+		)
+		footer = write_member(
+			parts_path / "footer.sql.gz", views_sql + DUMP_FOOTER.format(created=created), args.compress_level
+		)
+		manifest_tables = []
+		with open(database_path, "wb") as out:
+			header["offset"] = out.tell()
+			with open(parts_path / "header.sql.gz", "rb") as part:
+				shutil.copyfileobj(part, out)
+
+			for table in sorted(tables):
+				entry = dumped[table]
+				entry["offset"] = out.tell()
+				with open(parts_path / f"{positions[table]}.sql.gz", "rb") as part:
+					shutil.copyfileobj(part, out)
+				manifest_tables.append(entry)
+
+			footer["offset"] = out.tell()
+			with open(parts_path / "footer.sql.gz", "rb") as part:
+				shutil.copyfileobj(part, out)
+
+		files = {}
+		for folder, (archive, proc) in archives.items():
+			if proc.wait():
+				raise RuntimeError(f"Could not archive the {folder} files")
+			files[folder] = {"file": archive.name, "bytes": archive.stat().st_size}
+		if file_backup:
+			file_stats = file_backup.wait()
+			files["manifest"] = {"file": files_manifest_path.name, **file_stats}
+
+		manifest = {
+			"version": MANIFEST_VERSION,
+			"site": site_name,
+			"db_name": config["db_name"],
+			"created": created,
+			"consistent": consistent,
+			"jobs": jobs,
+			"database": database_path.name,
+			"header": header,
+			"tables": manifest_tables,
+			"views": views,
+			"footer": footer,
+			"files": files,
+			"seconds": round(time.monotonic() - started, 3),
+		}
+		manifest_path.write_text(json.dumps(manifest, indent=1))
+		completed = True
+
+		print(
+			f"Dumped {len(tables)} tables, {sum(t['rows'] for t in manifest_tables)} rows in "
+			f"{manifest['seconds']}s\nDatabase: {database_path}\nManifest: {manifest_path}",
+			flush=True,
+		)
+		for folder, entry in archives.items():
+			print(f"{folder.title()} files: {entry[0]}", flush=True)
+		if file_backup:
+			report_file_backup(files_manifest_path, file_stats)
+		return 0
+
+	finally:
+		for worker in workers:
+			if worker.is_alive():
+				worker.terminate()
+		# ? Do not wait on exit for messages no worker will read
+		for pending in queues:
+			pending.cancel_join_thread()
+		shutil.rmtree(parts_path, ignore_errors=True)
+
+		# ? A failed or cancelled backup leaves no partial files behind
+		if not completed:
+			for _, proc in archives.values():
+				if proc.poll() is None:
+					proc.terminate()
+			for path in (
+				database_path,
+				manifest_path,
+				files_manifest_path,
+				Path(f"{prefix}-site_config_backup.json"),
+			):
+				path.unlink(missing_ok=True)
+			for archive, _ in archives.values():
+				archive.unlink(missing_ok=True)
+
+
+# ? ---------------------------------------------------------------
+# ? Restore
+# ? ---------------------------------------------------------------
+
+
+def iter_statements(lines: Iterable[str]) -> Iterator[str]:
+	"""
+	Split a SQL dump into statements, a statement ends with a line ending in `;`.
+	Dumps write one statement per line except for `CREATE TABLE`, newlines in values are escaped.
+	"""
+	statement = []
+	for line in lines:
+		if not statement and (not line.strip() or line.startswith("--")):
+			continue
+		statement.append(line)
+		if line.rstrip().endswith(";"):
+			yield "".join(statement).strip()
+			statement = []
+	if statement:
+		yield "".join(statement).strip()
+
+
+def route_statement(statement: str) -> tuple[str, str | None]:
+	"""
+	Where a statement of a split dump goes: "skip", "session" (every connection), "table" (the
+	connection loading that table) or "deferred" (run once all tables are loaded, e.g. views).
+
+	Returns:
+		tuple[str, str | None]: The route and, for "table", the unquoted table name.
+	"""
+	if SKIPPED_STATEMENT.match(statement):
+		return "skip", None
+	if SESSION_STATEMENT.match(statement):
+		return "session", None
+	match = TABLE_STATEMENT.match(statement)
+	if not match:
+		return "deferred", None
+	return "table", match.group(1).replace("``", "`")
+
+
+def iter_member_lines(path: Path, entry: dict) -> Iterator[str]:
+	"""
+	Lines of a single gzip member of a dump, located by its manifest entry.
+	Raises ValueError at the end when the member does not match its checksum.
+	"""
+	decompressor = zlib.decompressobj(wbits=31)
+	decoder = codecs.getincrementaldecoder("utf-8")(errors="surrogateescape")
+	sha256 = hashlib.sha256()
+	remaining = entry["compressed_bytes"]
+	buffer = ""
+
+	with open(path, "rb") as file:
+		file.seek(entry["offset"])
+		while remaining:
+			chunk = file.read(min(READ_BYTES, remaining))
+			if not chunk:
+				break
+			remaining -= len(chunk)
+			sha256.update(chunk)
+
+			buffer += decoder.decode(decompressor.decompress(chunk))
+			lines = buffer.split("\n")
+			buffer = lines.pop()
+			for line in lines:
+				yield line + "\n"
+
+	buffer += decoder.decode(decompressor.flush(), final=True)
+	if buffer:
+		yield buffer
+	if remaining or sha256.hexdigest() != entry["sha256"]:
+		raise ValueError(f"Checksum mismatch in {entry.get('name', 'dump')}")
+
+
+def format_size(size: float) -> str:
+	"""Human readable size, e.g. "1.5 GB"."""
+	for unit in ("B", "KB", "MB", "GB"):
+		if size < 1024:
+			return f"{size:.1f} {unit}"
+		size /= 1024
+	return f"{size:.1f} TB"
+
+
+class Throughput:
+	"""
+	Bytes moved per stream of a restore (e.g. "dump", "sql", "public files"), printed every
+	`PROGRESS_INTERVAL` seconds and summed up at the end. Streams are fed from several threads.
+	"""
+
+	def __init__(self):
+		self.started = time.monotonic()
+		self.last_report = self.started
+		self.streams: dict[str, list] = {}
+		self.lock = threading.Lock()
+
+	def expect(self, name: str, total: int | None):
+		"""Register a stream and its expected size."""
+		with self.lock:
+			self.streams.setdefault(name, [0, None])[1] = total
+
+	def add(self, name: str, size: int):
+		with self.lock:
+			self.streams.setdefault(name, [0, None])[0] += size
+
+	def describe(self) -> str:
+		elapsed = max(time.monotonic() - self.started, 0.001)
+		with self.lock:
+			streams = [(name, size, total) for name, (size, total) in self.streams.items()]
+
+		parts = []
+		for name, size, total in streams:
+			part = f"{name} {format_size(size)}"
+			if total:
+				part += f" of {format_size(total)} ({size * 100 // total}%)"
+			parts.append(f"{part} at {format_size(size / elapsed)}/s")
+		return ", ".join(parts)
+
+	def report_if_due(self):
+		now = time.monotonic()
+		if now - self.last_report >= PROGRESS_INTERVAL:
+			self.last_report = now
+			print(f"Progress: {self.describe()}", flush=True)
+
+
+def feed_file(path: Path, target, throughput: Throughput, name: str):
+	"""Copy a file into a pipe (e.g. the stdin of a decompressor), counting the bytes."""
+	try:
+		with open(path, "rb") as file:
+			while chunk := file.read(READ_BYTES):
+				target.write(chunk)
+				throughput.add(name, len(chunk))
+	except (BrokenPipeError, ValueError):
+		# ? The reading side went away, it reports its own error
+		pass
+	finally:
+		try:
+			target.close()
+		except BrokenPipeError:
+			pass
+
+
+def iter_dump_lines(path: Path, throughput: Throughput) -> Iterator[str]:
+	"""
+	Stream the lines of a `.sql` or `.sql.gz` dump without extracting it to disk.
+
+	Compressed dumps are piped through `pigz` or `gzip` when installed, so decompression runs
+	on another core while the lines are split into statements. Bytes of the dump and of the
+	SQL read from it are counted as the "dump" and "sql" streams.
+	"""
+	throughput.expect("dump", path.stat().st_size)
+
+	if not path.name.endswith(".gz"):
+		with open(path, "rb") as file:
+			for line in file:
+				throughput.add("dump", len(line))
+				throughput.add("sql", len(line))
+				yield line.decode("utf-8", "surrogateescape")
+		return
+
+	tool = shutil.which("pigz") or shutil.which("gzip")
+	if not tool:
+		with open(path, "rb") as raw, gzip.GzipFile(fileobj=raw) as file:
+			position = 0
+			for line in file:
+				throughput.add("dump", raw.tell() - position)
+				position = raw.tell()
+				throughput.add("sql", len(line))
+				yield line.decode("utf-8", "surrogateescape")
+		return
+
+	proc = subprocess.Popen([tool, "-dc"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+	threading.Thread(target=feed_file, args=(path, proc.stdin, throughput, "dump"), daemon=True).start()
+	try:
+		for line in proc.stdout:
+			throughput.add("sql", len(line))
+			yield line.decode("utf-8", "surrogateescape")
+		if proc.wait():
+			raise ValueError(f"{Path(tool).name} could not decompress {path.name}")
+	finally:
+		if proc.poll() is None:
+			proc.kill()
+			proc.wait()
+
+
+def find_manifest(database_path: Path) -> dict | None:
+	"""The manifest of a dump written by `dump`, if it is next to the dump and matches it."""
+	if not database_path.name.endswith("-database.sql.gz"):
+		return None
+
+	manifest_path = database_path.with_name(database_path.name.removesuffix(".sql.gz") + ".json")
+	try:
+		manifest = json.loads(manifest_path.read_text())
+	except (OSError, ValueError):
+		return None
+
+	footer = manifest.get("footer") or {}
+	if (
+		manifest.get("version") != MANIFEST_VERSION
+		or manifest.get("database") != database_path.name
+		or footer.get("offset", -1) + footer.get("compressed_bytes", 0) != database_path.stat().st_size
+	):
+		return None
+	return manifest
+
+
+class Loader:
+	"""Execute statements on a connection with relaxed checks, committing in large batches."""
+
+	def __init__(self, conn):
+		self.conn = conn
+		self.cursor = conn.cursor()
+		self.pending = 0
+		for statement in RELAXED_CHECKS:
+			self.cursor.execute(statement)
+
+	def execute(self, statement: str) -> int:
+		self.cursor.execute(statement)
+		self.pending += len(statement)
+		if self.pending >= COMMIT_BYTES:
+			self.commit()
+		return len(statement)
+
+	def commit(self):
+		self.conn.commit()
+		self.pending = 0
+
+	def close(self):
+		self.commit()
+		self.cursor.close()
+		self.conn.close()
+
+
+def manifest_worker(config: dict, root_password: str, database_path: Path, header: dict, tasks, results):
+	"""Worker process: load whole tables straight from their gzip members in the dump."""
+	signal.signal(signal.SIGTERM, signal.SIG_DFL)
+	try:
+		loader = Loader(connect(config, root_password))
+		for statement in iter_statements(iter_member_lines(database_path, header)):
+			loader.execute(statement)
+	except Exception as e:
+		results.put({"error": str(e)})
+		return
+
+	while (entry := tasks.get()) is not None:
+		started = time.monotonic()
+		try:
+			for statement in iter_statements(iter_member_lines(database_path, entry)):
+				loader.execute(statement)
+			loader.commit()
+		except Exception as e:
+			results.put({"name": entry["name"], "error": str(e)})
+			return
+		results.put(
+			{
+				"name": entry["name"],
+				"rows": entry["rows"],
+				"bytes": entry["bytes"],
+				"compressed_bytes": entry["compressed_bytes"],
+				"seconds": round(time.monotonic() - started, 3),
+			}
+		)
+	loader.close()
+
+
+def split_worker(config: dict, root_password: str, inbox, results):
+	"""
+	Worker process: execute the statements the splitter sends, table by table.
+	Messages are ("session", sql) for settings, ("table", name) when a table starts,
+	("sql", sql) for its statements and ("end", name) once it is complete.
+	"""
+	signal.signal(signal.SIGTERM, signal.SIG_DFL)
+	try:
+		loader = Loader(connect(config, root_password))
+	except Exception as e:
+		results.put({"error": str(e)})
+		return
+
+	table, size, started = None, 0, time.monotonic()
+	while (message := inbox.get()) is not None:
+		kind, value = message
+		try:
+			if kind == "table":
+				table, size, started = value, 0, time.monotonic()
+			elif kind == "end":
+				loader.commit()
+				results.put({"name": table, "bytes": size, "seconds": round(time.monotonic() - started, 3)})
+			else:
+				size += loader.execute(value)
+		except Exception as e:
+			results.put({"name": table, "error": str(e)})
+			return
+	loader.close()
+
+
+class Restore:
+	"""
+	Load a dump into a freshly created site database with several connections.
+
+	Args:
+		config (dict): Effective site config.
+		root_password (str): DB root password, used to recreate the database and load it.
+		database_path (Path): `.sql` or `.sql.gz` dump.
+		jobs (int): Tables loaded at the same time.
+	"""
+
+	def __init__(self, config: dict, root_password: str, database_path: Path, jobs: int):
+		self.config = config
+		self.root_password = root_password
+		self.database_path = database_path
+		self.jobs = max(1, jobs)
+		self.ctx = multiprocessing.get_context("fork")
+		self.workers = []
+		self.queues = []
+		self.results = self.queue()
+		self.loaded = 0
+		self.total = None
+		self.throughput = Throughput()
+
+	def recreate_database(self):
+		"""Drop and create the site database, its user keeps its grants on the database name."""
+		db_name = self.config["db_name"]
+		conn = connect(self.config, self.root_password, database="mysql")
+		cursor = conn.cursor()
+		cursor.execute(f"DROP DATABASE IF EXISTS {quote(db_name)}")
+		cursor.execute(f"CREATE DATABASE {quote(db_name)} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+		cursor.close()
+		conn.close()
+
+	def report(self, result: dict):
+		"""Print the progress of a loaded table, raise when a worker failed."""
+		if result.get("error"):
+			raise RuntimeError(f"Could not load {result.get('name') or 'the dump'}: {result['error']}")
+
+		self.loaded += 1
+		if "compressed_bytes" in result:
+			self.throughput.add("dump", result["compressed_bytes"])
+			self.throughput.add("sql", result["bytes"])
+
+		rows = f"{result['rows']} rows, " if "rows" in result else ""
+		total = f"/{self.total}" if self.total else ""
+		print(
+			f"[{self.loaded}{total}] {result['name']}: {rows}{result['bytes']} bytes in {result['seconds']}s",
+			flush=True,
+		)
+
+	def drain(self, block: bool = False):
+		"""Report the results that arrived, waiting for one when blocking."""
+		while True:
+			self.throughput.report_if_due()
+			try:
+				result = self.results.get(timeout=5) if block else self.results.get_nowait()
+			except queue.Empty:
+				if block and not any(worker.is_alive() for worker in self.workers):
+					raise RuntimeError("Restore workers exited before the dump was loaded") from None
+				if block:
+					continue
+				return
+			self.report(result)
+			if block:
+				return
+
+	def load_from_manifest(self, manifest: dict):
+		"""Each worker reads, verifies and loads whole tables straight from the dump."""
+		tables = sorted(manifest["tables"], key=lambda entry: entry["compressed_bytes"], reverse=True)
+		self.total = len(tables)
+		self.jobs = min(self.jobs, max(1, len(tables)))
+		print(f"Loading {len(tables)} tables from the manifest with {self.jobs} workers", flush=True)
+		self.throughput.expect("dump", sum(entry["compressed_bytes"] for entry in tables))
+		self.throughput.expect("sql", sum(entry["bytes"] for entry in tables))
+
+		tasks = self.queue()
+		for entry in tables:
+			tasks.put(entry)
+		for _ in range(self.jobs):
+			tasks.put(None)
+
+		for _ in range(self.jobs):
+			self.start(manifest_worker, self.database_path, manifest["header"], tasks)
+		while self.loaded < len(tables):
+			self.drain(block=True)
+
+		# ? Views and closing statements, after every table exists
+		self.run_statements(iter_statements(iter_member_lines(self.database_path, manifest["footer"])))
+
+	def load_by_splitting(self):
+		"""
+		Read the dump once, sending the statements of each table to the least busy worker.
+		Session settings go to every worker, statements outside of a table (e.g. views) run at the end.
+		A table seen again later (e.g. the drop of a view placeholder) goes back to the same worker,
+		which runs its statements in dump order.
+		"""
+		print(f"Splitting the dump by table over {self.jobs} workers", flush=True)
+		inboxes = [self.queue(maxsize=QUEUE_SIZE) for _ in range(self.jobs)]
+		for inbox in inboxes:
+			self.start(split_worker, inbox)
+
+		session, deferred = [], []
+		current, inbox = None, None
+		assigned = {}
+
+		for statement in iter_statements(iter_dump_lines(self.database_path, self.throughput)):
+			self.throughput.report_if_due()
+			route, table = route_statement(statement)
+			if route == "skip":
+				continue
+
+			if route == "session":
+				session.append(statement)
+				for target in inboxes:
+					self.send(target, ("session", statement))
+				continue
+
+			if route == "deferred":
+				deferred.append(statement)
+				continue
+
+			if table != current:
+				if current is not None:
+					self.send(inbox, ("end", current))
+				self.drain()
+				current = table
+				inbox = assigned.get(table) or min(inboxes, key=lambda target: target.qsize())
+				assigned[table] = inbox
+				self.send(inbox, ("table", table))
+			self.send(inbox, ("sql", statement))
+
+		if current is not None:
+			self.send(inbox, ("end", current))
+		for target in inboxes:
+			self.send(target, None)
+		for worker in self.workers:
+			while worker.is_alive():
+				self.drain()
+				worker.join(timeout=1)
+		self.drain()
+
+		self.run_statements([*session, *deferred])
+
+	def start(self, target, *args):
+		"""Start a worker process, it gets the config, the root password, `args` and the results queue."""
+		worker = self.ctx.Process(target=target, args=(self.config, self.root_password, *args, self.results))
+		worker.start()
+		self.workers.append(worker)
+
+	def send(self, inbox, message):
+		"""Queue a message for a worker, reporting results while its inbox is full."""
+		while True:
+			try:
+				inbox.put(message, timeout=1)
+				return
+			except queue.Full:
+				self.drain()
+				if not all(worker.is_alive() for worker in self.workers):
+					self.drain()
+					raise RuntimeError("A restore worker exited early") from None
+
+	def run_statements(self, statements: Iterable[str]):
+		"""Run statements on a single connection, e.g. views once all tables are loaded."""
+		loader = Loader(connect(self.config, self.root_password))
+		try:
+			for statement in statements:
+				loader.execute(statement)
+		finally:
+			loader.close()
+
+	def queue(self, maxsize: int = 0):
+		"""Create a queue shared with the workers."""
+		created = self.ctx.Queue(maxsize=maxsize)
+		self.queues.append(created)
+		return created
+
+	def close(self):
+		for worker in self.workers:
+			if worker.is_alive():
+				worker.terminate()
+		# ? Do not wait on exit for messages no worker will read
+		for pending in self.queues:
+			pending.cancel_join_thread()
+
+
+def extract_files(site_name: str, archive: Path, throughput: Throughput, name: str) -> subprocess.Popen:
+	"""
+	Extract a files archive of `bench backup` into the site while it is read, without copying it first.
+	Members lose their `./<site>` prefix, the same layout `bench restore` extracts.
+	"""
+	compression = ["-z"] if archive.name.endswith((".gz", ".tgz")) else []
+	proc = subprocess.Popen(
+		["tar", "-x", *compression, "-f", "-", "--strip-components", "2"],
+		cwd=site_name,
+		stdin=subprocess.PIPE,
+	)
+	throughput.expect(name, archive.stat().st_size)
+	threading.Thread(target=feed_file, args=(archive, proc.stdin, throughput, name), daemon=True).start()
+	return proc
+
+
+def restore(args) -> int:
+	"""Restore a site from a dump and optional files archives, see `Restore`."""
+	site_name = args.site
+	config = read_site_config(site_name)
+	if config.get("db_type", "mariadb") != "mariadb":
+		print(f"Unsupported db_type {config.get('db_type')}", flush=True)
+		return 1
+
+	# ? The root password comes last on stdin, after the sudo password when sudo did not need it
+	lines = sys.stdin.read().splitlines()
+	root_password = lines[-1] if lines else ""
+	if not root_password:
+		print("The DB root password is required on stdin", flush=True)
+		return 1
+
+	database_path = Path(args.database).resolve()
+	if not database_path.is_file():
+		print(f"{database_path} not found", flush=True)
+		return 1
+
+	# ? Like `bench restore`, refuse missing file archives before the database is dropped
+	archives = (("public", args.with_public_files), ("private", args.with_private_files))
+	for _, archive in archives:
+		if archive and not Path(archive).is_file():
+			print(f"{archive} not found", flush=True)
+			return 1
+
+	started = time.monotonic()
+	job = Restore(config, root_password, database_path, args.jobs)
+	extractions = {}
+	file_restore = None
+	try:
+		manifest = find_manifest(database_path)
+		job.recreate_database()
+		print(f"Recreated database {config['db_name']}", flush=True)
+
+		for folder, archive in archives:
+			if archive:
+				extractions[folder] = extract_files(
+					site_name, Path(archive), job.throughput, f"{folder} files"
+				)
+		if args.with_files_manifest:
+			file_restore = Background(
+				restore_files,
+				Path(args.with_files_manifest),
+				site_name,
+				args.jobs,
+				job.throughput,
+				args.store,
+			)
+
+		if manifest:
+			job.load_from_manifest(manifest)
+		else:
+			job.load_by_splitting()
+
+		for folder, proc in extractions.items():
+			if proc.wait():
+				raise RuntimeError(f"Could not extract the {folder} files")
+			print(f"Extracted {folder} files", flush=True)
+		if file_restore:
+			print(f"Restored files from the store, {file_restore.wait()} files written", flush=True)
+
+		clear_site_cache(site_name)
+		print(
+			f"Restored {site_name}: {job.loaded} tables in {round(time.monotonic() - started, 3)}s\n"
+			f"Throughput: {job.throughput.describe()}",
+			flush=True,
+		)
+		return 0
+	finally:
+		job.close()
+		for proc in extractions.values():
+			if proc.poll() is None:
+				proc.terminate()
+
+
+def clear_site_cache(site_name: str):
+	"""Clear the cache of the restored site with the bench's own Frappe."""
+	try:
+		import frappe
+
+		frappe.init(site=site_name, sites_path=".")
+		frappe.connect()
+		frappe.clear_cache()
+		frappe.destroy()
+	except Exception as e:
+		print(f"Could not clear the cache of {site_name}: {e}", flush=True)
+
+
+# ? ---------------------------------------------------------------
+# ? Deduplicated file backups
+# ? ---------------------------------------------------------------
+
+
+class Background(threading.Thread):
+	"""Run a function in a daemon thread, so a cancelled backup or restore does not wait for it."""
+
+	def __init__(self, function, *args):
+		super().__init__(daemon=True)
+		self.function = function
+		self.function_args = args
+		self.result = None
+		self.error = None
+		self.start()
+
+	def run(self):
+		try:
+			self.result = self.function(*self.function_args)
+		except BaseException as e:
+			self.error = e
+
+	def wait(self):
+		self.join()
+		if self.error:
+			raise self.error
+		return self.result
+
+
+def map_in_threads(function, items: list, jobs: int) -> list:
+	"""Call `function` on every item from `jobs` daemon threads, stopping at the first error."""
+	results = [None] * len(items)
+	errors = []
+	pending = iter(enumerate(items))
+	lock = threading.Lock()
+
+	def work():
+		while not errors:
+			with lock:
+				index, item = next(pending, (None, None))
+			if index is None:
+				return
+			try:
+				results[index] = function(item)
+			except Exception as e:
+				errors.append(e)
+
+	threads = [threading.Thread(target=work, daemon=True) for _ in range(max(1, min(jobs, len(items))))]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	if errors:
+		raise errors[0]
+	return results
+
+
+class FileStore:
+	"""
+	Content-addressed store of file chunks. A chunk is saved once under its SHA-256 as
+	`objects/<first two hex digits>/<sha256>`, zlib compressed (`.z`) when that saves space.
+
+	`manifests.json` lists the file manifests written into the store, objects are pruned once one
+	of them is deleted (e.g. by the cleanup of old backups).
+	"""
+
+	def __init__(self, path: Path):
+		self.path = path
+		self.objects = path / "objects"
+		self.manifests_path = path / "manifests.json"
+
+	def object_path(self, digest: str) -> Path:
+		return self.objects / digest[:2] / digest
+
+	def has(self, digest: str) -> bool:
+		path = self.object_path(digest)
+		return path.exists() or path.with_name(f"{digest}.z").exists()
+
+	def put(self, data: bytes) -> tuple[str, int]:
+		"""Save a chunk unless the store has it already, returns its digest and the bytes written."""
+		digest = hashlib.sha256(data).hexdigest()
+		if self.has(digest):
+			return digest, 0
+
+		path = self.object_path(digest)
+		compressed = zlib.compress(data, 1)
+		if len(compressed) < len(data) * 0.9:
+			path, data = path.with_name(f"{digest}.z"), compressed
+
+		# ? Write next to the object and rename, a chunk is either complete or missing
+		path.parent.mkdir(parents=True, exist_ok=True)
+		temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+		temp_path.write_bytes(data)
+		os.replace(temp_path, path)
+		return digest, len(data)
+
+	def get(self, digest: str) -> bytes:
+		"""Read a chunk, verifying its checksum."""
+		path = self.object_path(digest)
+		if path.exists():
+			data = path.read_bytes()
+		else:
+			data = zlib.decompress(path.with_name(f"{digest}.z").read_bytes())
+		if hashlib.sha256(data).hexdigest() != digest:
+			raise ValueError(f"Checksum mismatch in chunk {digest}")
+		return data
+
+	def read_manifests(self) -> list[str]:
+		if not self.manifests_path.is_file():
+			return []
+		return json.loads(self.manifests_path.read_text())
+
+	def add_manifest(self, manifest_path: Path, manifest: dict) -> tuple[int, int]:
+		"""
+		Record a new manifest and prune the objects no remaining manifest refers to.
+
+		Returns:
+			tuple[int, int]: Objects and bytes pruned.
+		"""
+		known = self.read_manifests()
+		remaining = [path for path in known if Path(path).is_file()]
+
+		pruned = (0, 0)
+		if len(remaining) < len(known):
+			referenced = set(iter_manifest_chunks(manifest))
+			for path in remaining:
+				referenced.update(iter_manifest_chunks(json.loads(Path(path).read_text())))
+			pruned = self.prune(referenced)
+
+		self.manifests_path.write_text(json.dumps([*remaining, str(manifest_path.resolve())], indent=1))
+		return pruned
+
+	def prune(self, referenced: set[str]) -> tuple[int, int]:
+		count = size = 0
+		for path in self.objects.glob("*/*"):
+			if path.name.removesuffix(".z") not in referenced:
+				size += path.stat().st_size
+				path.unlink()
+				count += 1
+		return count, size
+
+
+def iter_manifest_chunks(manifest: dict) -> Iterator[str]:
+	for tree in manifest["folders"].values():
+		for entry in tree["files"]:
+			yield from entry["chunks"]
+
+
+def store_file(store: FileStore, path: Path) -> tuple[list[str], int]:
+	"""Save a file into the store chunk by chunk, returns its chunks and the bytes written."""
+	chunks, written = [], 0
+	with open(path, "rb") as file:
+		while data := file.read(CHUNK_BYTES):
+			digest, size = store.put(data)
+			chunks.append(digest)
+			written += size
+	return chunks, written
+
+
+def backup_files(site_name: str, store: FileStore, manifest_path: Path, jobs: int) -> dict:
+	"""
+	Back up the public and private files of a site into a `FileStore` and write a manifest of them.
+
+	Files whose size and modification time match the previous manifest keep its chunks without
+	being read again, so a backup only reads and writes what changed since the last one.
+
+	Args:
+		site_name (str): Site to back up.
+		store (FileStore): Store receiving the chunks.
+		manifest_path (Path): `<prefix>-files.json` to write.
+		jobs (int): Files read at the same time.
+
+	Returns:
+		dict: Statistics of the backup.
+	"""
+	started = time.monotonic()
+	created = datetime.now().isoformat(timespec="seconds")
+
+	# ? Chunks of unchanged files are taken from the latest manifest still around
+	previous = {}
+	for path in reversed(store.read_manifests()):
+		if Path(path).is_file():
+			for folder, tree in json.loads(Path(path).read_text())["folders"].items():
+				for entry in tree["files"]:
+					previous[(folder, entry["path"])] = entry
+			break
+
+	folders, changed = {}, []
+	for folder in FILE_FOLDERS:
+		root = Path(site_name) / folder / "files"
+		tree = folders[folder] = {"dirs": [], "files": []}
+		for dir_path, dir_names, file_names in os.walk(root):
+			dir_names.sort()
+			for name in dir_names:
+				tree["dirs"].append(str((Path(dir_path) / name).relative_to(root)))
+			for name in sorted(file_names):
+				path = Path(dir_path) / name
+				# ? Stat before reading, a file changing while it is read is read again next time
+				stat = path.lstat()
+				if not S_ISREG(stat.st_mode):
+					continue
+
+				entry = {
+					"path": str(path.relative_to(root)),
+					"size": stat.st_size,
+					"mtime_ns": stat.st_mtime_ns,
+					"mode": S_IMODE(stat.st_mode),
+				}
+				known = previous.get((folder, entry["path"]))
+				if (
+					known
+					and (known["size"], known["mtime_ns"]) == (entry["size"], entry["mtime_ns"])
+					and all(store.has(digest) for digest in known["chunks"])
+				):
+					entry["chunks"] = known["chunks"]
+				else:
+					changed.append((path, entry))
+				tree["files"].append(entry)
+
+	def store_entry(item: tuple[Path, dict]) -> int:
+		path, entry = item
+		entry["chunks"], written = store_file(store, path)
+		return written
+
+	written = sum(map_in_threads(store_entry, changed, jobs))
+
+	files = [entry for tree in folders.values() for entry in tree["files"]]
+	stats = {
+		"files": len(files),
+		"bytes": sum(entry["size"] for entry in files),
+		"changed_files": len(changed),
+		"changed_bytes": sum(entry["size"] for _, entry in changed),
+		"written_bytes": written,
+	}
+	manifest = {
+		"version": MANIFEST_VERSION,
+		"site": site_name,
+		"store": str(store.path.resolve()),
+		"created": created,
+		"chunk_bytes": CHUNK_BYTES,
+		"folders": folders,
+		"stats": stats,
+	}
+	manifest_path.write_text(json.dumps(manifest, separators=(",", ":")))
+
+	stats["pruned_objects"], stats["pruned_bytes"] = store.add_manifest(manifest_path, manifest)
+	stats["seconds"] = round(time.monotonic() - started, 3)
+	return stats
+
+
+def report_file_backup(manifest_path: Path, stats: dict):
+	print(
+		f"Backed up {stats['files']} files ({format_size(stats['bytes'])}) in {stats['seconds']}s: "
+		f"{stats['changed_files']} new or changed ({format_size(stats['changed_bytes'])}), "
+		f"{format_size(stats['written_bytes'])} written to the store",
+		flush=True,
+	)
+	if stats["pruned_objects"]:
+		print(
+			f"Pruned {stats['pruned_objects']} unused objects ({format_size(stats['pruned_bytes'])})",
+			flush=True,
+		)
+	print(f"Files manifest: {manifest_path}", flush=True)
+
+
+def get_file_store(site_name: str, store_path: str | None) -> FileStore:
+	return FileStore(Path(store_path) if store_path else Path(site_name) / "private" / FILE_STORE)
+
+
+def restore_files(
+	manifest_path: Path, site_name: str, jobs: int, throughput: Throughput, store_path: str | None = None
+) -> int:
+	"""
+	Rebuild the public and private files of a site from a files manifest.
+
+	Files already in place with the same size and modification time are kept, files that are not
+	in the manifest are left alone, like extracting an archive does.
+
+	Args:
+		manifest_path (Path): `<prefix>-files.json` of the backup to restore.
+		site_name (str): Site to restore into, may differ from the backed up site.
+		jobs (int): Files written at the same time.
+		throughput (Throughput): Counts the bytes written as "files".
+		store_path (str | None): Store holding the chunks, the one in the manifest by default.
+
+	Returns:
+		int: Files written.
+	"""
+	manifest = json.loads(manifest_path.read_text())
+	store = FileStore(Path(store_path or manifest["store"]))
+	if not store.objects.is_dir():
+		raise FileNotFoundError(f"File store {store.path} not found")
+
+	pending = []
+	for folder, tree in manifest["folders"].items():
+		if folder not in FILE_FOLDERS:
+			raise ValueError(f"Unknown folder {folder} in {manifest_path.name}")
+		root = (Path(site_name) / folder / "files").resolve()
+		for path in tree["dirs"]:
+			get_restore_path(root, path).mkdir(parents=True, exist_ok=True)
+		for entry in tree["files"]:
+			pending.append((get_restore_path(root, entry["path"]), entry))
+
+	throughput.expect("files", sum(entry["size"] for _, entry in pending))
+
+	def restore_entry(item: tuple[Path, dict]) -> bool:
+		path, entry = item
+		try:
+			stat = path.lstat()
+			if S_ISREG(stat.st_mode) and (stat.st_size, stat.st_mtime_ns) == (
+				entry["size"],
+				entry["mtime_ns"],
+			):
+				throughput.add("files", entry["size"])
+				return False
+		except FileNotFoundError:
+			pass
+
+		path.parent.mkdir(parents=True, exist_ok=True)
+		temp_path = path.with_name(f".{path.name}.{threading.get_ident()}")
+		try:
+			with open(temp_path, "wb") as file:
+				for digest in entry["chunks"]:
+					data = store.get(digest)
+					file.write(data)
+					throughput.add("files", len(data))
+			os.chmod(temp_path, entry["mode"])
+			os.utime(temp_path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+			os.replace(temp_path, path)
+		finally:
+			temp_path.unlink(missing_ok=True)
+		throughput.report_if_due()
+		return True
+
+	return sum(map_in_threads(restore_entry, pending, jobs))
+
+
+def get_restore_path(root: Path, path: str) -> Path:
+	"""Path of a manifest entry below `root`, refusing entries that point outside of it."""
+	target = Path(os.path.normpath(root / path))
+	if not target.is_relative_to(root) or target == root:
+		raise ValueError(f"Invalid path {path} in the files manifest")
+	return target
+
+
+def backup_files_command(args) -> int:
+	"""Back up the files of a site into its store, see `backup_files`."""
+	backup_path = Path(args.output or Path(args.site) / "private" / "backups")
+	backup_path.mkdir(parents=True, exist_ok=True)
+	manifest_path = backup_path / f"{get_backup_prefix(args.site)}-files.json"
+	try:
+		stats = backup_files(args.site, get_file_store(args.site, args.store), manifest_path, args.jobs)
+	except BaseException:
+		manifest_path.unlink(missing_ok=True)
+		raise
+	report_file_backup(manifest_path, stats)
+	return 0
+
+
+def restore_files_command(args) -> int:
+	"""Rebuild the files of a site from a files manifest, see `restore_files`."""
+	started = time.monotonic()
+	throughput = Throughput()
+	written = restore_files(Path(args.manifest), args.site, args.jobs, throughput, args.store)
+	print(
+		f"Restored the files of {args.site}: {written} files written in "
+		f"{round(time.monotonic() - started, 3)}s\nThroughput: {throughput.describe()}",
+		flush=True,
+	)
+	return 0
+
+
+def main():
+	parser = argparse.ArgumentParser(description="BenchMate site backup engine")
+	commands = parser.add_subparsers(dest="command", required=True)
+
+	dump_parser = commands.add_parser("dump", help="Dump the database of a site in parallel")
+	dump_parser.add_argument("--site", required=True, help="Site to back up")
+	dump_parser.add_argument("--jobs", default=4, type=int, help="Tables dumped at the same time")
+	dump_parser.add_argument(
+		"--with-files", action="store_true", help="Also archive public and private files"
+	)
+	dump_parser.add_argument(
+		"--dedup-files", action="store_true", help="Back up public and private files into the file store"
+	)
+	dump_parser.add_argument("--store", help="File store, the site's private/file-store by default")
+	dump_parser.add_argument("--output", help="Backup directory, the site's private/backups by default")
+	dump_parser.add_argument("--compress-level", default=6, type=int, help="gzip level of the dump")
+
+	restore_parser = commands.add_parser("restore", help="Restore a site, loading its tables in parallel")
+	restore_parser.add_argument("database", help="Dump to restore, .sql or .sql.gz")
+	restore_parser.add_argument("--site", required=True, help="Site to restore")
+	restore_parser.add_argument("--jobs", default=4, type=int, help="Tables loaded at the same time")
+	restore_parser.add_argument("--with-public-files", help="Public files archive to extract")
+	restore_parser.add_argument("--with-private-files", help="Private files archive to extract")
+	restore_parser.add_argument("--with-files-manifest", help="Files manifest to rebuild the files from")
+	restore_parser.add_argument("--store", help="File store, the one named in the files manifest by default")
+
+	backup_files_parser = commands.add_parser(
+		"backup-files", help="Back up public and private files into the deduplicated file store"
+	)
+	backup_files_parser.add_argument("--site", required=True, help="Site to back up")
+	backup_files_parser.add_argument("--jobs", default=4, type=int, help="Files read at the same time")
+	backup_files_parser.add_argument("--store", help="File store, the site's private/file-store by default")
+	backup_files_parser.add_argument(
+		"--output", help="Backup directory, the site's private/backups by default"
+	)
+
+	restore_files_parser = commands.add_parser(
+		"restore-files", help="Rebuild public and private files from a files manifest"
+	)
+	restore_files_parser.add_argument("manifest", help="Files manifest, <prefix>-files.json")
+	restore_files_parser.add_argument("--site", required=True, help="Site to restore")
+	restore_files_parser.add_argument("--jobs", default=4, type=int, help="Files written at the same time")
+	restore_files_parser.add_argument(
+		"--store", help="File store, the one named in the files manifest by default"
+	)
+
+	args = parser.parse_args()
+
+	# ? Terminated on timeout or cancellation, clean up on the way out
+	signal.signal(signal.SIGTERM, lambda *_: sys.exit(143))
+
+	try:
+		command = {
+			"dump": dump,
+			"restore": restore,
+			"backup-files": backup_files_command,
+			"restore-files": restore_files_command,
+		}[args.command]
+		sys.exit(command(args))
+	except Exception as e:
+		print(f"{args.command.replace('-', ' ').capitalize()} failed: {e}", flush=True)
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,201 @@
+import json
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# ? Database names are interpolated into queries, so only plain identifiers are accepted
+_DB_NAME_PATTERN = re.compile(r"^[\w$]+$")
+
+INSTALLED_APPS_QUERY = (
+	"SELECT defvalue FROM `{db_name}`.`tabDefaultValue` "
+	"WHERE parent = '__global' AND defkey = 'installed_apps'"
+)
+
+
+def read_site_config(bench_path: Path, site_name: str) -> dict:
+	"""
+	Read the effective config of a site.
+	Values from `site_config.json` override `common_site_config.json`.
+
+	Args:
+		bench_path (Path): Path to bench.
+		site_name (str): Name of site.
+
+	Returns:
+		dict: Merged site configuration.
+	"""
+	sites_path = Path(bench_path) / "sites"
+	config = {}
+	for config_path in (sites_path / "common_site_config.json", sites_path / site_name / "site_config.json"):
+		if config_path.is_file():
+			config.update(json.loads(config_path.read_text(encoding="utf-8")))
+	return config
+
+
+def _connect_mariadb(**kwargs):
+	"""
+	Open a MariaDB connection using PyMySQL (shipped with Frappe).
+
+	Args:
+		**kwargs: host, port, user, password and optional unix_socket.
+
+	Returns:
+		Connection: DB-API connection.
+	"""
+	import pymysql
+
+	# ? Bound every query too, a stuck server must not hang a sync worker
+	return pymysql.connect(charset="utf8mb4", connect_timeout=5, read_timeout=30, write_timeout=30, **kwargs)
+
+
+class ConnectionPool:
+	"""
+	Thread-safe pool of DB-API connections sharing the same credentials.
+
+	Args:
+		connect (Callable): Factory returning a new DB-API connection.
+		max_idle (int): Number of idle connections kept for reuse.
+	"""
+
+	def __init__(self, connect, max_idle: int = 4):
+		self._connect = connect
+		self._max_idle = max_idle
+		self._idle = []
+		self._lock = threading.Lock()
+
+	@contextmanager
+	def connection(self):
+		"""
+		Borrow a connection from the pool.
+		Connections that raised an error are discarded instead of being returned.
+		"""
+		with self._lock:
+			conn = self._idle.pop() if self._idle else None
+		if conn is None:
+			conn = self._connect()
+
+		try:
+			yield conn
+		except Exception:
+			self._close_quietly(conn)
+			raise
+
+		with self._lock:
+			if len(self._idle) < self._max_idle:
+				self._idle.append(conn)
+				conn = None
+		if conn is not None:
+			self._close_quietly(conn)
+
+	def close(self):
+		"""Close all idle connections."""
+		with self._lock:
+			idle, self._idle = self._idle, []
+		for conn in idle:
+			self._close_quietly(conn)
+
+	@staticmethod
+	def _close_quietly(conn):
+		try:
+			conn.close()
+		except Exception:
+			pass
+
+
+class SiteDBReader:
+	"""
+	Read site data straight from site databases instead of spawning bench commands.
+
+	Connections are pooled per DB host and credentials. When a root password is
+	given, every site on the same host shares one pool; otherwise each site uses
+	the `db_name`/`db_password` from its own `site_config.json`.
+
+	Args:
+		root_password (str | None): MariaDB root password.
+		connect (Callable | None): Connection factory accepting host, port, user,
+			password (and unix_socket), e.g. a SQLite stand-in in tests.
+		max_idle (int): Idle connections kept per pool.
+	"""
+
+	def __init__(self, root_password: str | None = None, connect=None, max_idle: int = 4):
+		self.root_password = root_password
+		self._connect = connect or _connect_mariadb
+		self._max_idle = max_idle
+		self._pools: dict[tuple, ConnectionPool] = {}
+		self._lock = threading.Lock()
+
+	def _get_pool(self, site_config: dict) -> ConnectionPool:
+		"""
+		Get or create the pool serving the DB host of a site.
+
+		Args:
+			site_config (dict): Effective site configuration.
+
+		Returns:
+			ConnectionPool: Pool for the site's DB host and credentials.
+		"""
+		if self.root_password:
+			user, password = site_config.get("root_login") or "root", self.root_password
+		else:
+			user, password = site_config["db_name"], site_config["db_password"]
+
+		connect_kwargs = {
+			"host": site_config.get("db_host") or "127.0.0.1",
+			"port": int(site_config.get("db_port") or 3306),
+			"user": user,
+			"password": password,
+		}
+		if site_config.get("db_socket"):
+			connect_kwargs["unix_socket"] = site_config["db_socket"]
+
+		key = tuple(sorted(connect_kwargs.items()))
+		with self._lock:
+			pool = self._pools.get(key)
+			if pool is None:
+				pool = self._pools[key] = ConnectionPool(
+					lambda: self._connect(**connect_kwargs), max_idle=self._max_idle
+				)
+		return pool
+
+	def get_installed_apps(self, bench_path: Path, site_name: str) -> list[str]:
+		"""
+		Get the installed apps of a site from its `installed_apps` default.
+
+		Args:
+			bench_path (Path): Path to bench.
+			site_name (str): Name of site.
+
+		Returns:
+			list[str]: Installed app names in install order.
+
+		Raises:
+			ValueError: If the site config is unusable or the site has no installed apps record.
+		"""
+		site_config = read_site_config(bench_path, site_name)
+		db_name = site_config.get("db_name")
+
+		if site_config.get("db_type", "mariadb") != "mariadb":
+			raise ValueError(f"Unsupported db_type {site_config.get('db_type')} for site {site_name}")
+		if not db_name or not _DB_NAME_PATTERN.match(db_name):
+			raise ValueError(f"Invalid db_name in site_config.json of site {site_name}")
+
+		with self._get_pool(site_config).connection() as conn:
+			cursor = conn.cursor()
+			try:
+				cursor.execute(INSTALLED_APPS_QUERY.format(db_name=db_name))
+				row = cursor.fetchone()
+			finally:
+				cursor.close()
+
+		if not row or not row[0]:
+			raise ValueError(f"No installed_apps default found for site {site_name}")
+
+		return json.loads(row[0])
+
+	def close(self):
+		"""Close all pooled connections."""
+		with self._lock:
+			pools, self._pools = list(self._pools.values()), {}
+		for pool in pools:
+			pool.close()
@@ -1,31 +1,68 @@
 import ast
 import configparser
+import hashlib
+import itertools
 import json
 import os
-import subprocess
+import re
+import shlex
+import threading
 import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import frappe
 
-from benchmate.api.utils import get_benchmate_settings
+from benchmate.api.bulk import BulkWriter
+from benchmate.api.executor import command_executor, merge_command_summaries, summarize_results
+from benchmate.api.metadata_cache import file_size, metadata_cache, stat_key
+from benchmate.api.site_db import SiteDBReader
+from benchmate.api.utils import (
+	benchmate_settings_batch,
+	clear_benchmate_settings_cache,
+	get_benchmate_settings,
+)
+from benchmate.api.worker_pool import worker_pool
 
 
 # ! benchmate.api.sync.enqueue_sync_bench_details
 @frappe.whitelist()
-def enqueue_sync_bench_details():
+def enqueue_sync_bench_details(force: bool = False):
 	"""
 	Enqueue the `sync_bench_details` function to run asynchronously using Frappe's background jobs.
+	When "Benches Per Sync Job" is set in BM Settings, a `plan_fan_out_sync` job finds the
+	changed benches and fans them out over `sync_bench_batch` jobs instead, see `enqueue_fan_out_sync`.
 
 	Queue: default
 	Timeout: 600 seconds
 
+	Args:
+		force (bool): Resync every bench and site, ignoring stored fingerprints.
+
 	Usage:
 	Called to process bench syncing in the background without blocking the main thread.
 	"""
 	try:
+		settings = get_benchmate_settings()
+		batch_size = settings.get("sync_batch_size")
+
+		# ? Fan out one job per batch of changed benches, planned off the request
+		if batch_size:
+			frappe.enqueue(
+				plan_fan_out_sync,
+				queue="default",
+				timeout=600,
+				batch_size=batch_size,
+				force=frappe.utils.cint(force),
+			)
+			data = {"queued_function": "plan_fan_out_sync"}
+
 		# ? Enqueue the sync_bench_details task in Frappe background queue
-		frappe.enqueue(sync_bench_details, queue="default", timeout=600)
+		else:
+			frappe.enqueue(sync_bench_details, queue="default", timeout=600, force=frappe.utils.cint(force))
+			data = {"queued_function": "sync_bench_details"}
 	except Exception as e:
 		# ? If enqueue fails, return error status
 		return {
@@ -38,23 +75,68 @@ def enqueue_sync_bench_details():
 		return {
 			"success": True,
 			"message": "Bench sync task enqueued successfully.",
-			"data": {"queued_function": "sync_bench_details"},
+			"data": data,
+		}
+
+
+# ! benchmate.api.sync.enqueue_sync_bench
+@frappe.whitelist()
+def enqueue_sync_bench(bench_name: str, force: bool = False):
+	"""
+	Enqueue a sync of a single bench, e.g. from the BM Bench form.
+
+	Args:
+		bench_name (str): Bench directory name under the default path.
+		force (bool): Resync the bench and its sites even when unchanged.
+
+	Returns:
+		dict: {"success", "message", "data"} with the fan-out run details.
+	"""
+	try:
+		settings = get_benchmate_settings()
+		root = Path(settings.get("default_path") or "").expanduser().resolve()
+		bench_path = root / bench_name
+
+		# ? Only accept plain bench directory names under the default path
+		if Path(bench_name).name != bench_name or bench_name.startswith("."):
+			frappe.throw(f"Invalid bench name {bench_name}", frappe.ValidationError)
+		if not (bench_path / "sites").is_dir() or not (bench_path / "Procfile").is_file():
+			frappe.throw(f"Bench {bench_name} not found under {root}", frappe.ValidationError)
+
+		data = enqueue_fan_out_sync([bench_name], 1, force)
+	except Exception as e:
+		return {
+			"success": False,
+			"message": f"Failed to enqueue sync of bench {bench_name}: {e!s}",
+			"data": None,
+		}
+	else:
+		return {
+			"success": True,
+			"message": f"Sync of bench {bench_name} enqueued successfully.",
+			"data": data,
 		}
 
 
 # ! benchmate.api.sync.sync_bench_details
 @frappe.whitelist()
-def sync_bench_details():
+def sync_bench_details(force: bool = False):
 	"""
 	Sync all benches found under the default path into the 'BM Bench' DocType.
 
 	Workflow:
+	- Streams benches through discovery, inspection and persistence.
+	- Skips benches and sites whose fingerprint matches the last sync, unless forced.
+	- Commits each bench on its own; a failing bench is logged and skipped.
 	- Creates a new Bench record if it does not exist.
 	- Updates fields if the Bench already exists.
 	- Marks Bench as "Error" if any error was captured during sync.
 	- Syncs installed apps into BM App and BM Bench doctypes.
 	- Syncs sites into BM Site doctype.
 
+	Args:
+		force (bool): Resync every bench and site, ignoring stored fingerprints.
+
 	Returns:
 	dict: {
 	"success": bool,
@@ -63,93 +145,34 @@ def sync_bench_details():
 	    "updated_benches": list[str],   # names of updated Bench docs
 	    "updated_apps": list[str],      # names of updated App docs
 	    "updated_sites": list[str],     # names of updated Site docs
+	    "failed_benches": list[str],    # names of benches skipped after a failure
+	    "commands": dict,               # timings and exit status of the bench commands
 	} | None
 	}
 	"""
+	summary = {"updated_benches": [], "updated_apps": [], "updated_sites": [], "failed_benches": []}
+
 	try:
 		# ? Get default benches path from settings
 		settings = get_benchmate_settings()
-		default_path = settings.get("default_path", "/home/karan/benches/")
-
-		# ? Gather all benches under the default path
-		benches = get_all_benches(default_path)
-		updated_benches, updated_apps, updated_sites = [], [], []
-
-		# ? Process each bench and sync into DocType
-		for bench in benches:
-			bench_name = bench["bench_name"]
-
-			# ? Create or fetch BM Bench doc
-			bench_doc = (
-				frappe.get_doc("BM Bench", bench_name)
-				if frappe.db.exists("BM Bench", bench_name)
-				else frappe.new_doc("BM Bench")
-			)
-
-			# ? If error, set status as "Error" and capture details
-			if bench.get("is_error", False):
-				bench_doc.update(
-					{
-						"status": "Error",
-						"error_message": bench.get("error_message"),
-						"last_synced_on": frappe.utils.now(),
-						"bench_name": bench_name,
-						"path": bench.get("path"),
-						"branch": bench.get("branch"),
-						"version": bench.get("version"),
-					}
-				)
 
-			# ? If no error, update valid bench details
-			else:
-				bench_doc.update(
-					{
-						"bench_name": bench_name,
-						"path": bench.get("path"),
-						"branch": bench.get("branch"),
-						"version": bench.get("version"),
-						"error_message": None,
-						"last_synced_on": frappe.utils.now(),
-					}
-				)
-
-				# ? Manage installed apps
-				if bench.get("installed_apps"):
-					# ? Sync installed apps in BM Apps & BM Bench doctypes
-					bench_doc, synced_apps = sync_app_details(bench_doc, bench.get("installed_apps"))
-
-					# ? Track updated apps if any changes were made
-					if synced_apps:
-						updated_apps.extend(synced_apps)
-
-			# ? Save or update the Bench document
-			bench_doc.save(ignore_permissions=True)
-			updated_benches.append(bench_doc.get("name"))
+		# ? Stream changed benches under the default path (all benches when forced)
+		known_fingerprints = None if frappe.utils.cint(force) else get_known_fingerprints()
+		benches = scan_benches(settings, known_fingerprints)
 
-			# ? Manage sites of the bench
-			if bench.get("sites"):
-				synced_sites = sync_site_details(bench_doc, bench.get("sites"))
+		# ? Persist and commit each bench as soon as it is inspected
+		persist_benches(benches, summary)
 
-				# ? Track updated sites if any changes were made
-				if synced_sites:
-					updated_sites.extend(synced_sites)
-
-			# ? Deduplicate lists
-			updated_benches = list(set(updated_benches))
-			updated_apps = list(set(updated_apps))
-			updated_sites = list(set(updated_sites))
+		# ? Record timings and exit status of the bench commands that ran
+		summary["commands"] = summarize_results(command_executor.pop_results())
 
 	except Exception as e:
 		# ? Rollback in case of failure
 		frappe.db.rollback()
 
-		# ? Prepare error log
+		# ? Prepare error log, benches committed before the failure are kept
 		message = "Error In Bench Sync"
-		data = {
-			"updated_benches": updated_benches if "updated_benches" in locals() else [],
-			"updated_apps": updated_apps if "updated_apps" in locals() else [],
-			"updated_sites": updated_sites if "updated_sites" in locals() else [],
-		}
+		data = summary
 
 		# ? Log sync error
 		frappe.get_doc(
@@ -174,20 +197,16 @@ def sync_bench_details():
 		}
 
 	else:
-		# ? Prepare success log
-		message = "Benches synced successfully"
-		data = {
-			"updated_benches": updated_benches,
-			"updated_apps": updated_apps,
-			"updated_sites": updated_sites,
-		}
+		# ? Prepare success log, failed benches were logged and skipped
+		message = "Benches synced with errors" if summary["failed_benches"] else "Benches synced successfully"
+		data = summary
 
-		# ? Log sync success
+		# ? Log sync result
 		frappe.get_doc(
 			{
 				"doctype": "BM Log",
 				"title": message,
-				"status": "Success",
+				"status": "Error" if summary["failed_benches"] else "Success",
 				"log": json.dumps(data, indent=4),
 				"log_timestamp": int(time.time()),
 				"action": "Sync",
@@ -207,85 +226,359 @@ def sync_bench_details():
 		}
 
 
-def sync_app_details(bench_doc, installed_apps: dict):
+def sync_benches(bench_names: list[str], force: bool = False) -> dict:
+	"""
+	Resync only the given benches and their sites.
+	Used for targeted updates, e.g. by the inventory watcher.
+
+	Args:
+		bench_names (list[str]): Bench directory names under the default path.
+		force (bool): Resync even when the stored fingerprints match.
+
+	Returns:
+		dict: {"updated_benches", "updated_apps", "updated_sites", "failed_benches"} lists of names
+		and the "commands" summary.
+	"""
+	settings = get_benchmate_settings()
+	known_fingerprints = None if force else get_known_fingerprints()
+
+	summary = {"updated_benches": [], "updated_apps": [], "updated_sites": [], "failed_benches": []}
+	persist_benches(scan_benches(settings, known_fingerprints, bench_names=bench_names), summary)
+	summary["commands"] = summarize_results(command_executor.pop_results())
+	return summary
+
+
+# ? -------------------------------------------------------------
+# ? Fan-out sync
+# ? -------------------------------------------------------------
+# ? Seconds the partial results of a fan-out run are kept in the cache
+SYNC_RUN_TTL = 24 * 60 * 60
+
+
+def _sync_run_key(run_id: str, part: str) -> str:
+	"""Cache key of a fan-out run: "pending" job counter or "results" hash."""
+	return f"benchmate_sync|{run_id}|{part}"
+
+
+def get_changed_bench_names(settings: dict, force: bool = False) -> list[str]:
 	"""
-	Sync installed apps into the 'BM App' and 'BM Bench' DocTypes.
+	List the benches under the default path that changed since the last sync.
+
+	Args:
+		settings (dict): BenchMate settings from `get_benchmate_settings`.
+		force (bool): List every bench, ignoring stored fingerprints.
+
+	Returns:
+		list[str]: Bench directory names in order.
+	"""
+	root = Path(settings.get("default_path") or "").expanduser().resolve()
+	if not root.is_dir():
+		return []
+
+	known_fingerprints = None if frappe.utils.cint(force) else get_known_fingerprints()
+	return [entry.name for entry in discover_benches(root, known_fingerprints)]
+
+
+def plan_fan_out_sync(batch_size: int, force: bool = False):
+	"""
+	Background job: fingerprint the benches under the default path, then fan the changed ones out.
+
+	Args:
+		batch_size (int): Benches per `sync_bench_batch` job.
+		force (bool): Sync every bench, ignoring stored fingerprints.
+	"""
+	settings = get_benchmate_settings()
+	enqueue_fan_out_sync(get_changed_bench_names(settings, force), batch_size, force)
+
+
+def enqueue_fan_out_sync(bench_names: list[str], batch_size: int, force: bool = False) -> dict:
+	"""
+	Enqueue one `sync_bench_batch` job per batch of benches.
+
+	The jobs store their summaries in the cache; the last one to finish
+	aggregates them into a single Sync BM Log.
+
+	Args:
+		bench_names (list[str]): Bench directory names to sync.
+		batch_size (int): Benches per job.
+		force (bool): Resync even when the stored fingerprints match.
+
+	Returns:
+		dict: {"run_id", "jobs", "benches"}
+	"""
+	run_id = frappe.generate_hash(length=12)
+	batches = [bench_names[i : i + batch_size] for i in range(0, len(bench_names), batch_size)]
+
+	# ? Nothing changed, log an empty sync right away
+	if not batches:
+		finalize_fan_out_sync(run_id)
+		return {"run_id": run_id, "jobs": 0, "benches": 0}
+
+	frappe.cache.set(frappe.cache.make_key(_sync_run_key(run_id, "pending")), len(batches), ex=SYNC_RUN_TTL)
+
+	for index, batch in enumerate(batches):
+		frappe.enqueue(
+			sync_bench_batch,
+			queue="default",
+			timeout=600,
+			run_id=run_id,
+			index=index,
+			bench_names=batch,
+			force=frappe.utils.cint(force),
+		)
+
+	return {"run_id": run_id, "jobs": len(batches), "benches": len(bench_names)}
+
+
+def sync_bench_batch(run_id: str, index: int, bench_names: list[str], force: bool = False):
+	"""
+	Background job of a fan-out run: sync a batch of benches and record its summary.
+	The last job of the run writes the aggregated BM Log.
+
+	Args:
+		run_id (str): Fan-out run id.
+		index (int): Position of the batch in the run.
+		bench_names (list[str]): Bench directory names in this batch.
+		force (bool): Resync even when the stored fingerprints match.
+	"""
+	try:
+		# ? One settings snapshot, secrets included, for the whole batch
+		with benchmate_settings_batch():
+			summary = sync_benches(bench_names, force=frappe.utils.cint(force))
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(f"Bench sync batch failed for {', '.join(bench_names)}", frappe.get_traceback())
+		frappe.db.commit()
+		summary = {
+			"updated_benches": [],
+			"updated_apps": [],
+			"updated_sites": [],
+			"failed_benches": list(bench_names),
+		}
+
+	# ? Record the batch summary, then count down the pending jobs of the run
+	results_key = _sync_run_key(run_id, "results")
+	frappe.cache.hset(results_key, str(index), summary)
+	frappe.cache.expire(frappe.cache.make_key(results_key), SYNC_RUN_TTL)
+
+	if frappe.cache.decr(frappe.cache.make_key(_sync_run_key(run_id, "pending"))) <= 0:
+		finalize_fan_out_sync(run_id)
+
+
+def merge_sync_summaries(summaries: list[dict]) -> dict:
+	"""
+	Merge the summaries of the jobs of a fan-out run.
+
+	Args:
+		summaries (list[dict]): Summaries returned by `sync_benches`.
+
+	Returns:
+		dict: Summary with deduplicated name lists and merged command stats.
+	"""
+	merged = {"updated_benches": [], "updated_apps": [], "updated_sites": [], "failed_benches": []}
+	for summary in summaries:
+		for key, names in merged.items():
+			names.extend(name for name in summary.get(key, []) if name not in names)
+
+	merged["commands"] = merge_command_summaries([s["commands"] for s in summaries if s.get("commands")])
+	return merged
+
+
+def finalize_fan_out_sync(run_id: str):
+	"""
+	Aggregate the job summaries of a fan-out run into a single Sync BM Log.
+
+	Args:
+		run_id (str): Fan-out run id.
+	"""
+	results_key = _sync_run_key(run_id, "results")
+	results = frappe.cache.hgetall(results_key) or {}
+	summary = merge_sync_summaries([results[k] for k in sorted(results, key=int)])
+
+	message = "Benches synced with errors" if summary["failed_benches"] else "Benches synced successfully"
+	frappe.get_doc(
+		{
+			"doctype": "BM Log",
+			"title": message,
+			"status": "Error" if summary["failed_benches"] else "Success",
+			"log": json.dumps(summary, indent=4),
+			"log_timestamp": int(time.time()),
+			"action": "Sync",
+		}
+	).insert()
+	frappe.db.commit()
+
+	frappe.cache.delete_key(results_key)
+	frappe.cache.delete(frappe.cache.make_key(_sync_run_key(run_id, "pending")))
+
+
+def persist_benches(benches: Iterable[dict], summary: dict) -> dict:
+	"""
+	Persistence stage of the sync pipeline.
+
+	Each bench is written and committed as soon as it arrives. When a bench fails,
+	its changes are rolled back, the error is logged and the remaining benches continue.
+
+	Args:
+		benches (Iterable[dict]): Inspected benches, e.g. from `scan_benches`.
+		summary (dict): Filled in place with `updated_benches`, `updated_apps`,
+			`updated_sites` and `failed_benches`.
+
+	Returns:
+		dict: The `summary` dict.
+	"""
+	writer = BulkWriter()
+
+	for bench in benches:
+		bench_name = bench["bench_name"]
+		try:
+			# ? Prefetch this bench's existing records so writes only cover what changed
+			writer.prefetch(get_record_names(bench))
+			bench_docname, synced_apps, synced_sites = persist_bench(bench, writer)
+			writer.flush()
+			frappe.db.commit()
+
+		except Exception:
+			# ? Drop this bench's changes, the next bench prefetches its own records
+			frappe.db.rollback()
+			writer.discard()
+			frappe.log_error(f"Bench sync failed for {bench_name}", frappe.get_traceback())
+			frappe.db.commit()
+			summary["failed_benches"].append(bench_name)
+			continue
+
+		# ? Track updated benches, apps and sites without duplicates
+		for key, names in (
+			("updated_benches", [bench_docname]),
+			("updated_apps", synced_apps),
+			("updated_sites", synced_sites),
+		):
+			summary[key].extend(name for name in names if name not in summary[key])
+
+	return summary
+
+
+def get_record_names(bench: dict) -> dict[str, list[str]]:
+	"""
+	Names of the BM Bench, BM Site and BM App records an inspected bench writes.
+
+	Args:
+		bench (dict): Bench metadata from `inspect_bench`.
+
+	Returns:
+		dict: {doctype: [record names]} for `BulkWriter.prefetch`.
+	"""
+	bench_name = bench["bench_name"]
+	return {
+		"BM Bench": [bench_name],
+		"BM Site": [f"{bench_name}-{site.get('site_name')}" for site in (bench.get("sites") or {}).values()],
+		"BM App": [app.get("app_name") for app in (bench.get("installed_apps") or {}).values()],
+	}
+
+
+def persist_bench(bench: dict, writer: BulkWriter) -> tuple[str, list[str], list[str]]:
+	"""
+	Write one inspected bench into the BM Bench, BM App and BM Site DocTypes.
+
+	Args:
+		bench (dict): Bench metadata from `inspect_bench`.
+		writer (BulkWriter): Prefetched writer batching the changes.
+
+	Returns:
+		tuple: (bench_docname, updated_apps, updated_sites)
+	"""
+	updated_apps, updated_sites, installed_apps = [], [], None
+	bench_name = bench["bench_name"]
+
+	bench_values = {
+		"bench_name": bench_name,
+		"path": bench.get("path"),
+		"branch": bench.get("branch"),
+		"version": bench.get("version"),
+		"last_synced_on": frappe.utils.now(),
+		"fingerprint": bench.get("fingerprint"),
+	}
+
+	# ? If error, set status as "Error" and capture details
+	if bench.get("is_error", False):
+		bench_values.update({"status": "Error", "error_message": bench.get("error_message")})
+
+	# ? If no error, update valid bench details
+	else:
+		bench_values["error_message"] = None
+
+		# ? Sync installed apps in BM Apps & BM Bench doctypes
+		if bench.get("installed_apps"):
+			installed_apps, updated_apps = sync_app_details(bench.get("installed_apps"), writer)
+
+	# ? Insert or queue the Bench changes
+	writer.upsert("BM Bench", bench_name, bench_values, installed_apps)
+
+	# ? Manage sites of the bench
+	if bench.get("sites"):
+		updated_sites = sync_site_details(writer.get("BM Bench", bench_name), bench.get("sites"), writer)
+
+	return bench_name, updated_apps, updated_sites
+
+
+def _installed_app_row(app: dict) -> dict:
+	"""Build a BM Installed Apps row from app metadata."""
+	return {
+		"app_name": app.get("app_name"),
+		"app_title": app.get("app_title"),
+		"branch": app.get("branch"),
+		"version": app.get("version"),
+		"link": app.get("link"),
+		"commit": app.get("commit"),
+	}
+
+
+def sync_app_details(installed_apps: dict, writer: BulkWriter):
+	"""
+	Sync installed apps into the 'BM App' DocType and build the bench's installed apps rows.
 
 	Workflow:
-	- Clears and resets `installed_apps` table in the BM Bench doc.
 	- Creates a BM App record if it does not exist.
-	- Updates fields if the App already exists.
-	- Saves only if there are changes.
+	- Updates fields if the App already exists and changed.
+	- Returns the rows for the `installed_apps` table of the BM Bench.
 
 	Args:
-		bench_doc (Document): The BM Bench document being updated.
 		installed_apps (dict): Dictionary of installed apps with details.
+		writer (BulkWriter): Prefetched writer batching the changes.
 
 	Returns:
 		tuple:
-			- bench_doc (Document): Updated BM Bench document with installed apps.
+			- rows (list[dict]): Rows for the BM Bench `installed_apps` table.
 			- updated (list[str]): List of updated BM App names.
 	"""
-	updated = []
-
-	# ? Reset installed_apps table in Bench doc
-	bench_doc.installed_apps = []
+	updated, rows = [], []
 
 	# ? Process each installed app
 	for app in installed_apps.values():
-		is_dirty = False
 		app_name = app.get("app_name")
 
-		# ? Create or fetch BM App doc
-		app_doc = (
-			frappe.get_doc("BM App", app_name)
-			if frappe.db.exists("BM App", app_name)
-			else frappe.new_doc("BM App")
-		)
+		# ? Insert the BM App or update it only if app_title/link changed
+		if writer.upsert(
+			"BM App",
+			app_name,
+			{"app_name": app_name, "app_title": app.get("app_title"), "link": app.get("link")},
+		):
+			updated.append(app_name)
 
-		# ? Update app_name if changed
-		if app_doc.get("app_name") != app_name:
-			app_doc.update({"app_name": app_name})
-			is_dirty = True
-
-		# ? Update app_title if changed
-		if app_doc.get("app_title") != app.get("app_title"):
-			app_doc.update({"app_title": app.get("app_title")})
-			is_dirty = True
-
-		# ? Update link if changed
-		if app_doc.get("link") != app.get("link"):
-			app_doc.update({"link": app.get("link")})
-			is_dirty = True
-
-		# ? Save BM App only if changes were made
-		if is_dirty:
-			app_doc.save(ignore_permissions=True)
-			updated.append(app_doc.get("name"))
-
-		# ? Add app details to installed_apps table in Bench doc
-		bench_doc.append(
-			"installed_apps",
-			{
-				"app_name": app_name,
-				"app_title": app.get("app_title"),
-				"branch": app.get("branch"),
-				"version": app.get("version"),
-				"link": app.get("link"),
-				"commit": app.get("commit"),
-			},
-		)
+		# ? Add app details to installed_apps table of the Bench
+		rows.append(_installed_app_row(app))
 
-	return bench_doc, updated
+	return rows, updated
 
 
-def sync_site_details(bench_doc, sites):
+def sync_site_details(bench_values: dict, sites: dict, writer: BulkWriter):
 	"""
 	Sync site details for a given bench into BM Site doctype.
 
 	Args:
-		bench_doc (dict): Bench document details containing bench_name, status, etc.
+		bench_values (dict): Bench record values containing bench_name, status, etc.
 		sites (dict): Dictionary of sites under this bench with keys like site_name, path, installed_apps.
+		writer (BulkWriter): Prefetched writer batching the changes.
 
 	Returns:
 		list: List of BM Site document names that were created/updated.
@@ -294,48 +587,23 @@ def sync_site_details(bench_doc, sites):
 
 	for site in sites.values():
 		# ? Generate unique BM Site name using bench + site_name
-		site_name_key = f"{bench_doc.get('bench_name')}-{site.get('site_name')}"
-
-		# ? Fetch existing BM Site doc or create a new one if it doesn't exist
-		site_doc = (
-			frappe.get_doc("BM Site", site_name_key)
-			if frappe.db.exists("BM Site", site_name_key)
-			else frappe.new_doc("BM Site")
-		)
-
-		# ? Update core site details
-		site_doc.update(
-			{
-				"site_name": site.get("site_name"),
-				"bench_name": bench_doc.get("bench_name"),
-				"status": bench_doc.get("status"),
-				"path": site.get("path"),
-				"last_synced_on": frappe.utils.now(),
-			}
-		)
-
-		# ? Reset installed_apps child table before inserting fresh entries
-		site_doc.installed_apps = []
-
-		# ? Loop through installed apps for this site and append them to child table
-		for app in site.get("installed_apps").values():
-			site_doc.append(
-				"installed_apps",
-				{
-					"app_name": app.get("app_name"),
-					"app_title": app.get("app_title"),
-					"branch": app.get("branch"),
-					"version": app.get("version"),
-					"link": app.get("link"),
-					"commit": app.get("commit"),
-				},
-			)
-
-		# ? Save or update BM Site document
-		site_doc.save()
+		site_name_key = f"{bench_values.get('bench_name')}-{site.get('site_name')}"
+
+		# ? Core site details and its installed apps rows
+		site_values = {
+			"site_name": site.get("site_name"),
+			"bench_name": bench_values.get("bench_name"),
+			"status": "Error" if site.get("is_error") else bench_values.get("status"),
+			"error_message": site.get("error_message"),
+			"path": site.get("path"),
+			"last_synced_on": frappe.utils.now(),
+			"fingerprint": site.get("fingerprint"),
+		}
+		rows = [_installed_app_row(app) for app in site.get("installed_apps").values()]
 
-		# ? Track updated/created site record name
-		updated.append(site_doc.get("name"))
+		# ? Insert or queue the BM Site changes
+		if writer.upsert("BM Site", site_name_key, site_values, rows):
+			updated.append(site_name_key)
 
 	# ? Return list of updated site document names
 	return updated
@@ -352,16 +620,114 @@ def test_sync():
 		list[dict]: List of bench metadata with sites and installed apps.
 	"""
 	settings = get_benchmate_settings()
+	return list(scan_benches(settings))
+
+
+def scan_benches(
+	settings: dict, known_fingerprints: dict | None = None, bench_names: list[str] | None = None
+) -> Iterator[dict]:
+	"""
+	Stream the benches under the default path configured in BenchMate settings.
+	Applies the sync options (worker count, site apps source) from the settings.
+
+	Args:
+		settings (dict): BenchMate settings from `get_benchmate_settings`.
+		known_fingerprints (dict | None): Fingerprints used to skip unchanged benches and sites.
+		bench_names (list[str] | None): Only scan these bench directories.
+
+	Yields:
+		dict: Bench metadata with sites and installed apps, in bench directory order.
+	"""
 	default_path = settings.get("default_path", "/home/karan/benches/")
-	return get_all_benches(default_path)
+
+	# ? Read site apps straight from the site databases when configured
+	site_db = None
+	if settings.get("site_apps_source") == "Database":
+		site_db = SiteDBReader(root_password=settings.get("db_password"))
+
+	# ? Cap concurrent bench commands and bound each one by the command timeout
+	command_executor.configure(
+		max_concurrency=settings.get("sync_workers", 1), timeout=settings.get("command_timeout")
+	)
+
+	# ? Serve site-level bench commands from warm per-bench workers when enabled
+	_sync_options["use_worker_pool"] = bool(settings.get("use_worker_pool"))
+	if _sync_options["use_worker_pool"]:
+		worker_pool.configure(
+			max_workers=settings.get("worker_pool_size"),
+			max_per_bench=settings.get("workers_per_bench"),
+			idle_timeout=settings.get("worker_idle_timeout"),
+		)
+
+	# ? App metadata parsed by previous runs, shared by all benches of this run
+	metadata_cache.load(Path(frappe.get_site_path("private", "benchmate", "app_metadata_cache.json")))
+
+	try:
+		yield from iter_benches(
+			default_path,
+			max_workers=settings.get("sync_workers", 1),
+			site_db=site_db,
+			known_fingerprints=known_fingerprints,
+			bench_names=bench_names,
+		)
+	finally:
+		if site_db:
+			site_db.close()
+		try:
+			metadata_cache.save()
+		except OSError as e:
+			frappe.log_error(f"Failed to save app metadata cache: {e}", "BenchMate Sync")
 
 
 # ? -------------------------------------------------------------
 # ? Utility functions
 # ? -------------------------------------------------------------
+# ? Per-thread buffer of errors raised while scanning in worker threads
+_thread_state = threading.local()
+
+# ? Sync options applied by `scan_benches`
+_sync_options = {"use_worker_pool": False}
+
+
+def _log_error(*args):
+	"""
+	Log an error raised by the scan helpers.
+
+	Worker threads have no Frappe DB context, so when called from a scan worker
+	the error is buffered and logged later by the main thread.
+
+	Args:
+		*args: Arguments forwarded to `frappe.log_error`.
+	"""
+	errors = getattr(_thread_state, "errors", None)
+	if errors is None:
+		frappe.log_error(*args)
+	else:
+		errors.append(args)
+
+
+def _collect_errors(func, *args):
+	"""
+	Run a scan helper inside a worker thread and capture the errors it logs.
+
+	Args:
+		func (Callable): Scan helper to run.
+		*args: Positional arguments for `func`.
+
+	Returns:
+		tuple: (result, errors) where errors is a list of `frappe.log_error` argument tuples.
+	"""
+	_thread_state.errors = []
+	try:
+		return func(*args), _thread_state.errors
+	finally:
+		_thread_state.errors = None
+
+
 def run_cmd(cmd: str, cwd: Path | None = None) -> tuple[str | None, str | None]:
 	"""
-	Execute a shell command.
+	Execute a shell command through the sync command executor.
+	The command is killed with its process group when it exceeds the command timeout.
 
 	Args:
 		cmd (str): Command to run.
@@ -370,19 +736,58 @@ def run_cmd(cmd: str, cwd: Path | None = None) -> tuple[str | None, str | None]:
 	Returns:
 		tuple: (stdout, None) if success, else (None, error_message).
 	"""
-	try:
-		out = subprocess.check_output(cmd, cwd=cwd, shell=True, text=True, stderr=subprocess.STDOUT).strip()
-		return out, None
-	except subprocess.CalledProcessError as e:
-		error_message = e.output.strip() if e.output else str(e)
-		frappe.log_error(f"Command failed: {cmd}\n{e.output}", "BenchMate run_cmd")
+	return _check_cmd_result(command_executor.run(cmd, cwd=cwd))
+
+
+def run_site_cmd(bench_path: Path, args: list[str]) -> tuple[str | None, str | None]:
+	"""
+	Execute a site-level bench command, on a warm worker of the bench when the worker pool is enabled.
+	Pooled commands are recorded with the executor results, so they show up in the sync summary.
+
+	Args:
+		bench_path (Path): Path to bench directory.
+		args (list[str]): Arguments after `bench`, e.g. ["--site", "a.localhost", "list-apps"].
+
+	Returns:
+		tuple: (stdout, None) if success, else (None, error_message).
+	"""
+	cmd = shlex.join(["bench", *args])
+	if not _sync_options["use_worker_pool"]:
+		return run_cmd(cmd, cwd=bench_path)
+
+	result = worker_pool.run(bench_path, args, timeout=command_executor.timeout)
+	result = {
+		"cmd": cmd,
+		"cwd": str(bench_path),
+		"output": (result["error"] or result["output"]).strip(),
+		"returncode": -1 if result["error"] else result["returncode"],
+		"timed_out": result["timed_out"],
+		"duration": result["duration"],
+	}
+	command_executor.results.append(result)
+	return _check_cmd_result(result)
+
+
+def _check_cmd_result(result: dict) -> tuple[str | None, str | None]:
+	"""Turn an executor result into (stdout, error_message), logging failures."""
+	cmd = result["cmd"]
+	if result["timed_out"]:
+		error_message = f"Timed out after {result['duration']}s, process group killed"
+		_log_error(f"Command timed out: {cmd}\n{error_message}", "BenchMate run_cmd")
 		return None, error_message
 
+	if result["returncode"]:
+		error_message = result["output"] or f"Command exited with status {result['returncode']}"
+		_log_error(f"Command failed: {cmd}\n{result['output']}", "BenchMate run_cmd")
+		return None, error_message
+
+	return result["output"], None
+
 
 def get_git_remote(app_path: Path) -> str | None:
 	"""
 	Get the Git remote URL for a given app.
-	Checks upstream first, then origin.
+	Cached by the identity of `.git/config`, the remote is not part of the commit.
 
 	Args:
 		app_path (Path): Path to app directory.
@@ -394,6 +799,20 @@ def get_git_remote(app_path: Path) -> str | None:
 	if not git_config.exists():
 		return None
 
+	return metadata_cache.get(stat_key("remote", git_config), lambda: _parse_git_remote(git_config))
+
+
+def _parse_git_remote(git_config: Path) -> str | None:
+	"""
+	Parse the remote URL from a git config file.
+	Checks upstream first, then origin.
+
+	Args:
+		git_config (Path): Path to `.git/config`.
+
+	Returns:
+		str | None: Remote repo URL if found.
+	"""
 	config = configparser.ConfigParser(strict=False)  # ? allow duplicate keys
 	try:
 		config.read(git_config)
@@ -402,7 +821,7 @@ def get_git_remote(app_path: Path) -> str | None:
 		if config.has_section('remote "origin"'):
 			return config.get('remote "origin"', "url", fallback=None)
 	except Exception as e:
-		frappe.log_error(f"Failed to parse git remote for {app_path}: {e}", "BenchMate Sync")
+		_log_error(f"Failed to parse git remote for {git_config.parent.parent}: {e}", "BenchMate Sync")
 	return None
 
 
@@ -431,7 +850,7 @@ def _parse_hooks_title(hooks_path: Path) -> str | None:
 							return node.value.value.strip()
 		return None
 	except Exception as e:
-		frappe.log_error(f"Failed reading hooks.py for title: {hooks_path}\n{e}", "BenchMate Title")
+		_log_error(f"Failed reading hooks.py for title: {hooks_path}\n{e}", "BenchMate Title")
 		return None
 
 
@@ -471,11 +890,38 @@ def _parse_pyproject_name(pyproject_path: Path) -> str | None:
 				return poetry.get("name")
 		return None
 	except Exception as e:
-		frappe.log_error(f"Failed reading pyproject.toml: {pyproject_path}\n{e}", "BenchMate Title")
+		_log_error(f"Failed reading pyproject.toml: {pyproject_path}\n{e}", "BenchMate Title")
 		return None
 
 
-def get_app_title(app_path: Path, app_name: str) -> str:
+def get_app_title(app_path: Path, app_name: str, commit: str | None = None) -> str:
+	"""
+	Resolve a human-readable app title, cached across benches.
+
+	With a commit the cache key is the app name, commit and the sizes of the parsed
+	files, so identical checkouts on different benches are parsed once. Without one
+	the key is the identity (inode/mtime) of the parsed files.
+
+	Args:
+		app_path (Path): Path to app folder.
+		app_name (str): Name of app.
+		commit (str | None): Checked out commit of the app.
+
+	Returns:
+		str: App title.
+	"""
+	hooks_path = app_path / app_name / "hooks.py"
+	pyproject_path = app_path / "pyproject.toml"
+
+	if commit:
+		key = f"title|{app_name}|{commit}|{file_size(hooks_path)}|{file_size(pyproject_path)}"
+	else:
+		key = stat_key(f"title|{app_name}", hooks_path, pyproject_path)
+
+	return metadata_cache.get(key, lambda: _resolve_app_title(hooks_path, pyproject_path, app_name))
+
+
+def _resolve_app_title(hooks_path: Path, pyproject_path: Path, app_name: str) -> str:
 	"""
 	Resolve a human-readable app title.
 
@@ -485,23 +931,349 @@ def get_app_title(app_path: Path, app_name: str) -> str:
 	3. fallback: prettified app_name
 
 	Args:
-		app_path (Path): Path to app folder.
+		hooks_path (Path): Path to the app's hooks.py.
+		pyproject_path (Path): Path to the app's pyproject.toml.
 		app_name (str): Name of app.
 
 	Returns:
 		str: App title.
 	"""
-	hooks_title = _parse_hooks_title(app_path / app_name / "hooks.py")
+	hooks_title = _parse_hooks_title(hooks_path)
 	if hooks_title:
 		return hooks_title
 
-	pyproject_name = _parse_pyproject_name(app_path / "pyproject.toml")
+	pyproject_name = _parse_pyproject_name(pyproject_path)
 	if pyproject_name:
 		return pyproject_name.replace("-", " ").replace("_", " ").title()
 
 	return app_name.replace("-", " ").replace("_", " ").title()
 
 
+# ? -------------------------------------------------------------
+# ? Native bench introspection
+# ? -------------------------------------------------------------
+_VERSION_PATTERN = re.compile(r"^__version__\s*=\s*[\"']([^\"']+)[\"']", re.MULTILINE)
+
+
+def _read_app_version(app_path: Path, app_name: str) -> str | None:
+	"""
+	Read `__version__` from an app's `__init__.py` without importing it.
+
+	Args:
+		app_path (Path): Path to app folder.
+		app_name (str): Name of app.
+
+	Returns:
+		str | None: Version string if found.
+	"""
+	init_path = app_path / app_name / "__init__.py"
+	if not init_path.exists():
+		return None
+	match = _VERSION_PATTERN.search(init_path.read_text(encoding="utf-8"))
+	return match.group(1) if match else None
+
+
+def _get_git_dir(app_path: Path) -> Path | None:
+	"""
+	Resolve the git directory of an app.
+	Supports `.git` files pointing elsewhere (worktrees, submodules).
+
+	Args:
+		app_path (Path): Path to app directory.
+
+	Returns:
+		Path | None: Git directory if found.
+	"""
+	git_path = app_path / ".git"
+	if git_path.is_dir():
+		return git_path
+	if git_path.is_file():
+		content = git_path.read_text(encoding="utf-8").strip()
+		if content.startswith("gitdir:"):
+			git_dir = Path(content.split(":", 1)[1].strip())
+			return git_dir if git_dir.is_absolute() else (app_path / git_dir).resolve()
+	return None
+
+
+def _get_git_common_dir(git_dir: Path) -> Path:
+	"""
+	Resolve the common directory of a git directory, where linked worktrees keep shared refs.
+
+	Args:
+		git_dir (Path): Git directory.
+
+	Returns:
+		Path: Common directory, the git directory itself outside of linked worktrees.
+	"""
+	commondir_file = git_dir / "commondir"
+	if commondir_file.is_file():
+		return (git_dir / commondir_file.read_text(encoding="utf-8").strip()).resolve()
+	return git_dir
+
+
+def _resolve_git_ref(git_dir: Path, ref: str) -> str | None:
+	"""
+	Resolve a ref to a commit hash from loose refs or `packed-refs`.
+
+	Args:
+		git_dir (Path): Git directory.
+		ref (str): Full ref name, e.g. `refs/heads/develop`.
+
+	Returns:
+		str | None: Full commit hash if found.
+	"""
+	# ? Linked worktrees keep shared refs in the common dir
+	common_dir = _get_git_common_dir(git_dir)
+
+	for base in dict.fromkeys((git_dir, common_dir)):
+		loose_ref = base / ref
+		if loose_ref.is_file():
+			return loose_ref.read_text(encoding="utf-8").strip() or None
+
+	packed_refs = common_dir / "packed-refs"
+	if packed_refs.is_file():
+		for line in packed_refs.read_text(encoding="utf-8").splitlines():
+			if not line or line.startswith(("#", "^")):
+				continue
+			commit, _, name = line.partition(" ")
+			if name.strip() == ref:
+				return commit
+	return None
+
+
+def read_git_head(app_path: Path) -> tuple[str | None, str | None]:
+	"""
+	Read the current branch and commit of an app from `.git/HEAD`.
+
+	Args:
+		app_path (Path): Path to app directory.
+
+	Returns:
+		tuple: (branch, commit) where commit is abbreviated to 7 characters,
+		matching `bench version`. Detached heads report branch "HEAD".
+	"""
+	git_dir = _get_git_dir(app_path)
+	if not git_dir:
+		return None, None
+
+	head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+	if head.startswith("ref:"):
+		ref = head.split(":", 1)[1].strip()
+		branch = ref.removeprefix("refs/heads/")
+		commit = _resolve_git_ref(git_dir, ref)
+	else:
+		branch, commit = "HEAD", head
+
+	return branch, commit[:7] if commit else None
+
+
+def read_bench_versions(entry: Path) -> list[dict]:
+	"""
+	Build the `bench version --format json` output straight from the bench tree.
+
+	Args:
+		entry (Path): Path to bench directory.
+
+	Returns:
+		list[dict]: List of {"app", "branch", "version", "commit"} dicts in `sites/apps.txt` order.
+
+	Raises:
+		FileNotFoundError: If `sites/apps.txt` or an app listed in it is missing.
+		ValueError: If `sites/apps.txt` lists no apps.
+	"""
+	app_names = [
+		line.strip()
+		for line in (entry / "sites" / "apps.txt").read_text(encoding="utf-8").splitlines()
+		if line.strip()
+	]
+	if not app_names:
+		raise ValueError(f"No apps listed in {entry / 'sites' / 'apps.txt'}")
+
+	apps = []
+	for app_name in app_names:
+		app_path = entry / "apps" / app_name
+		if not app_path.is_dir():
+			raise FileNotFoundError(f"App {app_name} listed in apps.txt not found at {app_path}")
+
+		branch, commit = read_git_head(app_path)
+		apps.append(
+			{
+				"app": app_name,
+				"branch": branch,
+				"version": _read_app_version(app_path, app_name),
+				"commit": commit,
+			}
+		)
+	return apps
+
+
+# ? -------------------------------------------------------------
+# ? Fingerprints
+# ? -------------------------------------------------------------
+def _stat_token(path: Path) -> str:
+	"""
+	Describe a path by its mtime and size, or mark it as missing.
+
+	Args:
+		path (Path): File or directory to stat.
+
+	Returns:
+		str: Stat token used in fingerprints.
+	"""
+	try:
+		stat = path.stat()
+	except OSError:
+		return f"{path}:-"
+	return f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _hash_tokens(tokens: list[str]) -> str:
+	"""
+	Hash a list of stat tokens into a fingerprint.
+
+	Args:
+		tokens (list[str]): Tokens to hash.
+
+	Returns:
+		str: Hex digest.
+	"""
+	return hashlib.sha1("\n".join(tokens).encode(), usedforsecurity=False).hexdigest()
+
+
+def get_apps_fingerprint(entry: Path) -> str:
+	"""
+	Fingerprint the app checkouts of a bench.
+	Built from `sites/apps.txt` and each app's `.git/HEAD`, current ref and `packed-refs`.
+
+	Args:
+		entry (Path): Path to bench directory.
+
+	Returns:
+		str: Apps fingerprint.
+	"""
+	tokens = [_stat_token(entry / "sites" / "apps.txt")]
+	apps_path = entry / "apps"
+
+	for app_path in sorted(apps_path.iterdir()) if apps_path.is_dir() else []:
+		git_dir = _get_git_dir(app_path)
+		if not git_dir:
+			continue
+
+		head_path = git_dir / "HEAD"
+		common_dir = _get_git_common_dir(git_dir)
+		tokens.append(_stat_token(head_path))
+		tokens.append(_stat_token(common_dir / "packed-refs"))
+
+		# ? Commits on the checked out branch only touch the loose ref file
+		try:
+			head = head_path.read_text(encoding="utf-8").strip()
+		except OSError:
+			continue
+		if head.startswith("ref:"):
+			ref = head.split(":", 1)[1].strip()
+			for base in dict.fromkeys((git_dir, common_dir)):
+				tokens.append(_stat_token(base / ref))
+
+	return _hash_tokens(tokens)
+
+
+def get_bench_fingerprint(entry: Path, apps_fingerprint: str | None = None) -> str:
+	"""
+	Fingerprint a bench from its apps and the listing of its sites directory.
+
+	Args:
+		entry (Path): Path to bench directory.
+		apps_fingerprint (str | None): Precomputed `get_apps_fingerprint` result.
+
+	Returns:
+		str: Bench fingerprint.
+	"""
+	sites_path = entry / "sites"
+	tokens = [
+		apps_fingerprint or get_apps_fingerprint(entry),
+		_stat_token(sites_path / "common_site_config.json"),
+		*sorted(s.name for s in sites_path.iterdir() if s.is_dir()),
+	]
+	return _hash_tokens(tokens)
+
+
+def get_site_fingerprint(site_path: Path, apps_fingerprint: str) -> str:
+	"""
+	Fingerprint a site from its bench apps, its directory and `site_config.json`.
+
+	Args:
+		site_path (Path): Path to site directory.
+		apps_fingerprint (str): `get_apps_fingerprint` result of the site's bench.
+
+	Returns:
+		str: Site fingerprint.
+	"""
+	return _hash_tokens(
+		[apps_fingerprint, _stat_token(site_path), _stat_token(site_path / "site_config.json")]
+	)
+
+
+def iter_site_dirs(entry: Path) -> Iterator[Path]:
+	"""
+	Yield the site directories of a bench, ordered by name.
+
+	Args:
+		entry (Path): Path to bench directory.
+
+	Yields:
+		Path: Site directories, `sites/assets` left out.
+	"""
+	for site_path in sorted((entry / "sites").iterdir()):
+		if site_path.is_dir() and site_path.name != "assets":
+			yield site_path
+
+
+def is_bench_unchanged(entry: Path, known_fingerprints: dict) -> bool:
+	"""
+	Check a bench and each of its sites against the fingerprints of the previous sync.
+
+	The bench fingerprint does not cover the sites' own `site_config.json`, so a bench is
+	only unchanged when every site fingerprint matches too. Sites that failed last time
+	have no fingerprint and make their bench resync.
+
+	Args:
+		entry (Path): Path to bench directory.
+		known_fingerprints (dict): Fingerprints from `get_known_fingerprints`.
+
+	Returns:
+		bool: True when the bench can be skipped, False when its tree cannot be read.
+	"""
+	known_bench = (known_fingerprints.get("benches") or {}).get(entry.name)
+	if not known_bench:
+		return False
+
+	known_sites = known_fingerprints.get("sites") or {}
+	try:
+		apps_fingerprint = get_apps_fingerprint(entry)
+		if get_bench_fingerprint(entry, apps_fingerprint) != known_bench:
+			return False
+		return all(
+			known_sites.get(f"{entry.name}-{site_path.name}")
+			== get_site_fingerprint(site_path, apps_fingerprint)
+			for site_path in iter_site_dirs(entry)
+		)
+	except OSError:
+		return False
+
+
+def get_known_fingerprints() -> dict:
+	"""
+	Get the fingerprints stored by the previous sync.
+
+	Returns:
+		dict: {"benches": {bench_name: fingerprint}, "sites": {site_docname: fingerprint}}
+	"""
+	return {
+		"benches": dict(frappe.get_all("BM Bench", fields=["name", "fingerprint"], as_list=True)),
+		"sites": dict(frappe.get_all("BM Site", fields=["name", "fingerprint"], as_list=True)),
+	}
+
+
 # ? -------------------------------------------------------------
 # ? Bench & site parsing
 # ? -------------------------------------------------------------
@@ -538,31 +1310,29 @@ def _robust_load_json_array(raw: str):
 		raise ValueError("Unable to parse bench version output as JSON/pyliteral")
 
 
-def parse_installed_apps(entry: Path) -> tuple[dict, str | None, str | None, str | None]:
+def _get_bench_versions_cli(entry: Path) -> tuple[list, str | None]:
 	"""
-	Parse installed apps for a bench.
+	Get app versions of a bench using `bench version --format json`.
 
 	Args:
 		entry (Path): Path to bench directory.
 
 	Returns:
-		tuple: (apps_dict, frappe_version, frappe_branch, error_message)
+		tuple: (apps, error_message) where apps is a list of
+		{"app", "branch", "version", "commit"} dicts.
 	"""
-	installed_apps = {}
-	frappe_version, frappe_branch, error_message = None, None, None
-
 	version_json, err = run_cmd("bench version --format json", cwd=entry)
 	if err:
-		return installed_apps, None, None, f"{entry} - bench version --format json - {err}"
+		return [], f"{entry} - bench version --format json - {err}"
 
 	if not version_json:
-		return installed_apps, None, None, None
+		return [], None
 
 	try:
 		apps_data = _robust_load_json_array(version_json)
 	except Exception as e:
-		frappe.log_error(f"bench version returned non-JSON output for {entry}: {e}", "BenchMate Sync")
-		return installed_apps, None, None, None
+		_log_error(f"bench version returned non-JSON output for {entry}: {e}", "BenchMate Sync")
+		return [], None
 
 	# ? Normalize structure
 	try:
@@ -580,6 +1350,34 @@ def parse_installed_apps(entry: Path) -> tuple[dict, str | None, str | None, str
 	except Exception:
 		apps = []
 
+	return apps, None
+
+
+def parse_installed_apps(entry: Path) -> tuple[dict, str | None, str | None, str | None]:
+	"""
+	Parse installed apps for a bench.
+
+	Reads the bench tree directly and only falls back to
+	`bench version --format json` when the native reader fails.
+
+	Args:
+		entry (Path): Path to bench directory.
+
+	Returns:
+		tuple: (apps_dict, frappe_version, frappe_branch, error_message)
+	"""
+	installed_apps = {}
+	frappe_version, frappe_branch, error_message = None, None, None
+
+	try:
+		apps = read_bench_versions(entry)
+	except Exception as e:
+		# ? Fallback: ask the bench CLI
+		_log_error(f"Native introspection failed for {entry}, using bench version: {e}", "BenchMate Sync")
+		apps, err = _get_bench_versions_cli(entry)
+		if err:
+			return installed_apps, None, None, err
+
 	# ? Collect app details
 	try:
 		for app in apps:
@@ -594,7 +1392,7 @@ def parse_installed_apps(entry: Path) -> tuple[dict, str | None, str | None, str
 
 			app_path = entry / "apps" / app_name
 			app_repo = get_git_remote(app_path)
-			app_title = get_app_title(app_path, app_name)
+			app_title = get_app_title(app_path, app_name, app_commit)
 
 			installed_apps[app_name] = {
 				"app_name": app_name,
@@ -608,12 +1406,14 @@ def parse_installed_apps(entry: Path) -> tuple[dict, str | None, str | None, str
 			if app_name == "frappe":
 				frappe_version, frappe_branch = app_version, app_branch
 	except Exception as e:
-		frappe.log_error(f"Unexpected error while processing bench apps for {entry}: {e}", "BenchMate Sync")
+		_log_error(f"Unexpected error while processing bench apps for {entry}: {e}", "BenchMate Sync")
 
 	return installed_apps, frappe_version, frappe_branch, error_message
 
 
-def get_site_apps(bench_path: Path, site_name: str, bench_apps: dict) -> tuple[dict, str | None]:
+def get_site_apps(
+	bench_path: Path, site_name: str, bench_apps: dict, site_db: SiteDBReader | None = None
+) -> tuple[dict, str | None]:
 	"""
 	Get installed apps for a site within a bench.
 
@@ -621,12 +1421,24 @@ def get_site_apps(bench_path: Path, site_name: str, bench_apps: dict) -> tuple[d
 		bench_path (Path): Path to bench.
 		site_name (str): Name of site.
 		bench_apps (dict): Available bench apps metadata.
+		site_db (SiteDBReader | None): Reader used to query the site database directly.
+			`bench list-apps` is used when not provided or when the query fails.
 
 	Returns:
 		tuple: (site_apps, error_message)
 	"""
+	if site_db:
+		try:
+			app_list = site_db.get_installed_apps(bench_path, site_name)
+		except Exception as e:
+			_log_error(
+				f"Direct DB app listing failed for site {site_name}, using list-apps: {e}", "BenchMate Sync"
+			)
+		else:
+			return {app_name: bench_apps[app_name] for app_name in app_list if app_name in bench_apps}, None
+
 	cmd = f"bench --site {site_name} list-apps --format json"
-	result, err = run_cmd(cmd, cwd=bench_path)
+	result, err = run_site_cmd(bench_path, ["--site", site_name, "list-apps", "--format", "json"])
 
 	if err:
 		return {}, f"{bench_path} - {cmd} - {err}"
@@ -651,75 +1463,222 @@ def get_site_apps(bench_path: Path, site_name: str, bench_apps: dict) -> tuple[d
 				site_apps[app_name] = bench_apps[app_name]
 
 	except Exception as e:
-		frappe.log_error(
+		_log_error(
 			f"{cmd} returned invalid JSON for site {site_name}: {e}\nRaw Output:\n{result}", "BenchMate Sync"
 		)
 
 	return site_apps, None
 
 
-def get_all_benches(default_path: str):
+def inspect_bench(
+	entry: Path,
+	site_pool: ThreadPoolExecutor | None = None,
+	site_db: SiteDBReader | None = None,
+	known_sites: dict | None = None,
+) -> dict:
 	"""
-	Scan a given path and return all valid benches with metadata.
+	Inspect a single bench directory and return its metadata.
 
 	Args:
-		default_path (str): Root benches path.
+		entry (Path): Path to bench directory.
+		site_pool (ThreadPoolExecutor | None): Pool used to inspect sites in parallel.
+			Sites are inspected sequentially when not provided.
+		site_db (SiteDBReader | None): Reader used to list site apps from the site databases.
+		known_sites (dict | None): Stored site fingerprints by BM Site name.
+			Sites whose fingerprint matches are left out of the result.
 
 	Returns:
-		list[dict]: List of benches with their sites, apps, and status.
+		dict: Bench metadata with its sites, apps, status and fingerprint.
 	"""
-	benches: list[dict] = []
-	root = Path(default_path).expanduser().resolve()
+	is_error = False
+	error_message = None
+	bench_apps, frappe_version, frappe_branch, sites = {}, None, None, {}
+	known_sites = known_sites or {}
+	fingerprint = None
 
-	if not root.exists():
-		frappe.log_error(f"Path does not exist: {root}", "BenchMate Sync")
-		return benches
+	try:
+		apps_fingerprint = get_apps_fingerprint(entry)
+		fingerprint = get_bench_fingerprint(entry, apps_fingerprint)
+
+		bench_apps, frappe_version, frappe_branch, err = parse_installed_apps(entry)
+		if err:
+			is_error, error_message = True, err
+
+		# ? Skip sites unchanged since the last sync
+		site_dirs, site_fingerprints = [], {}
+		for s in iter_site_dirs(entry):
+			site_fingerprint = get_site_fingerprint(s, apps_fingerprint)
+			if known_sites.get(f"{entry.name}-{s.name}") == site_fingerprint:
+				continue
+			site_dirs.append(s)
+			site_fingerprints[s.name] = site_fingerprint
+
+		# ? Inspect sites in the shared site pool, keeping the directory order
+		if site_pool:
+			futures = [
+				site_pool.submit(_collect_errors, get_site_apps, entry, s.name, bench_apps, site_db)
+				for s in site_dirs
+			]
+			site_results = []
+			for future in futures:
+				result, errors = future.result()
+				for args in errors:
+					_log_error(*args)
+				site_results.append(result)
+		else:
+			site_results = [get_site_apps(entry, s.name, bench_apps, site_db) for s in site_dirs]
+
+		# ? A failing or timed out site only degrades its own record
+		for s, (site_apps, site_err) in zip(site_dirs, site_results, strict=True):
+			sites[s.name] = {
+				"site_name": s.name,
+				"bench_name": entry.name,
+				"path": str(s),
+				"installed_apps": site_apps,
+				"is_error": bool(site_err),
+				"error_message": site_err,
+				"fingerprint": None if site_err else site_fingerprints[s.name],
+			}
+
+	except Exception as e:
+		# ? Keep the failure on this bench instead of aborting the whole scan
+		_log_error(f"Unexpected error while inspecting bench {entry}: {e}", "BenchMate Sync")
+		is_error, error_message = True, f"{entry} - {e!s}"
+
+	return {
+		"bench_name": entry.name,
+		"path": str(entry),
+		"branch": frappe_branch,
+		"version": frappe_version,
+		"sites": sites,
+		"installed_apps": bench_apps,
+		"is_error": is_error,
+		"error_message": error_message,
+		# ? Errored benches keep no fingerprint so the next sync retries them
+		"fingerprint": None if is_error else fingerprint,
+	}
+
+
+def discover_benches(
+	root: Path, known_fingerprints: dict | None = None, bench_names: list[str] | None = None
+) -> Iterator[Path]:
+	"""
+	Discovery stage of the sync pipeline: yield bench directories under a root path.
+
+	Args:
+		root (Path): Root benches path.
+		known_fingerprints (dict | None): Fingerprints from `get_known_fingerprints`; benches whose
+			fingerprint and site fingerprints all match are skipped, see `is_bench_unchanged`.
+		bench_names (list[str] | None): Only yield these bench directories.
+
+	Yields:
+		Path: Bench directories (must have sites/ + Procfile), ordered by name.
+	"""
 
-	for entry in root.iterdir():
-		if not entry.is_dir():
+	for entry in sorted(root.iterdir()):
+		if not (entry.is_dir() and (entry / "sites").is_dir() and (entry / "Procfile").is_file()):
 			continue
 
-		sites_path = entry / "sites"
-		procfile_path = entry / "Procfile"
+		# ? Restrict the scan to the requested benches
+		if bench_names is not None and entry.name not in bench_names:
+			continue
 
-		# ? Identify valid bench (must have sites/ + Procfile)
-		if not (sites_path.is_dir() and procfile_path.is_file()):
+		# ? Skip benches unchanged since the last sync
+		if known_fingerprints and is_bench_unchanged(entry, known_fingerprints):
 			continue
 
-		is_error = False
-		error_message = None
+		yield entry
 
-		bench_apps, frappe_version, frappe_branch, err = parse_installed_apps(entry)
-		if err:
-			is_error, error_message = True, err
 
-		sites = {}
-		for s in sites_path.iterdir():
-			if s.is_dir() and s.name != "assets":
-				site_apps, site_err = get_site_apps(entry, s.name, bench_apps)
-				if site_err and not error_message:
-					is_error, error_message = True, site_err
-				sites[s.name] = {
-					"site_name": s.name,
-					"bench_name": entry.name,
-					"path": str(s),
-					"installed_apps": site_apps,
-				}
-
-		benches.append(
-			{
-				"bench_name": entry.name,
-				"path": str(entry),
-				"branch": frappe_branch,
-				"version": frappe_version,
-				"sites": sites,
-				"installed_apps": bench_apps,
-				"is_error": is_error,
-				"error_message": error_message,
-			}
-		)
+def iter_benches(
+	default_path: str,
+	max_workers: int = 1,
+	site_db: SiteDBReader | None = None,
+	known_fingerprints: dict | None = None,
+	bench_names: list[str] | None = None,
+) -> Iterator[dict]:
+	"""
+	Inspection stage of the sync pipeline: stream inspected benches under a path.
+
+	Benches and their sites are inspected in parallel when `max_workers` is greater
+	than 1. At most `2 * max_workers` benches are in flight at any time, so memory
+	stays bounded regardless of fleet size. Benches are always yielded in bench
+	directory order.
+
+	Args:
+		default_path (str): Root benches path.
+		max_workers (int): Number of benches/sites inspected concurrently.
+		site_db (SiteDBReader | None): Reader used to list site apps from the site databases.
+		known_fingerprints (dict | None): Fingerprints from `get_known_fingerprints`.
+			Benches and sites unchanged since the last sync are skipped.
+		bench_names (list[str] | None): Only scan these bench directories.
+
+	Yields:
+		dict: Bench metadata with its sites, apps, and status.
+	"""
+	root = Path(default_path).expanduser().resolve()
 
-	return benches
+	if not root.exists():
+		_log_error(f"Path does not exist: {root}", "BenchMate Sync")
+		return
+
+	known_fingerprints = known_fingerprints or {}
+	known_sites = known_fingerprints.get("sites") or {}
+	entries = discover_benches(root, known_fingerprints, bench_names)
+
+	# ? Sequential scan
+	if max_workers <= 1:
+		for entry in entries:
+			yield inspect_bench(entry, site_db=site_db, known_sites=known_sites)
+		return
+
+	# ? Parallel scan, benches and sites use separate pools so a bench never waits on its own pool
+	with (
+		ThreadPoolExecutor(max_workers, thread_name_prefix="benchmate-bench") as bench_pool,
+		ThreadPoolExecutor(max_workers, thread_name_prefix="benchmate-site") as site_pool,
+	):
+		in_flight = deque()
+
+		for entry in itertools.chain(entries, [None]):
+			if entry is not None:
+				in_flight.append(
+					bench_pool.submit(_collect_errors, inspect_bench, entry, site_pool, site_db, known_sites)
+				)
+
+			# ? Hand over finished benches in order once the window is full (or discovery is done)
+			while in_flight and (entry is None or len(in_flight) >= 2 * max_workers):
+				bench, errors = in_flight.popleft().result()
+
+				# ? Log errors buffered by the worker threads
+				for args in errors:
+					frappe.log_error(*args)
+
+				yield bench
+
+
+def get_all_benches(
+	default_path: str,
+	max_workers: int = 1,
+	site_db: SiteDBReader | None = None,
+	known_fingerprints: dict | None = None,
+	bench_names: list[str] | None = None,
+):
+	"""
+	Scan a given path and return all valid benches with metadata.
+	See `iter_benches` for the arguments.
+
+	Returns:
+		list[dict]: List of benches with their sites, apps, and status.
+	"""
+	return list(
+		iter_benches(
+			default_path,
+			max_workers=max_workers,
+			site_db=site_db,
+			known_fingerprints=known_fingerprints,
+			bench_names=bench_names,
+		)
+	)
 
 
 # ! benchmate.api.sync.after_install
@@ -743,6 +1702,9 @@ def set_default_bench_path():
 	# ? Update the BM Settings DocType with the default path
 	frappe.db.set_value("BM Settings", "BM Settings", "default_path", default_bench_path)
 
+	# ? set_value skips on_update, drop the cached settings here
+	clear_benchmate_settings_cache()
+
 
 def get_current_bench_dir():
 	"""
@@ -1,21 +1,45 @@
+from contextlib import contextmanager
+
 import frappe
 
+# ? Redis key holding the version of BM Settings, changed on every save
+SETTINGS_VERSION_KEY = "benchmate_settings_version"
+
+# ? Settings resolved by this worker process, per site: (version, settings)
+_settings_cache: dict[str, tuple[str, dict]] = {}
+
 
 def get_benchmate_settings():
-	"""Get Benchmate settings if enabled, else raise ValidationError."""
+	"""
+	Get Benchmate settings if enabled, else raise ValidationError.
+
+	The resolved settings, passwords included, are cached for the current request or job and
+	in the worker process until BM Settings is saved (see `clear_benchmate_settings_cache`).
+	Inside `benchmate_settings_batch` they are resolved once for the whole batch.
+	"""
+
+	# ? Resolved once per request, job or batch
+	benchmate_settings = getattr(frappe.local, "benchmate_settings", None)
+
+	if benchmate_settings is None:
+		# ? Reuse the worker's copy while BM Settings has not been saved since
+		version = frappe.cache.get_value(SETTINGS_VERSION_KEY)
+		cached = _settings_cache.get(frappe.local.site)
+		if version and cached and cached[0] == version:
+			benchmate_settings = cached[1]
+		else:
+			if not version:
+				version = frappe.generate_hash(length=12)
+				frappe.cache.set_value(SETTINGS_VERSION_KEY, version)
+			benchmate_settings = load_benchmate_settings()
+			_settings_cache[frappe.local.site] = (version, benchmate_settings)
+
+		frappe.local.benchmate_settings = benchmate_settings
 
 	# ? Check if settings are enabled
-	if frappe.db.get_single_value("BM Settings", "enable"):
-		# ? Fetch settings document
-		benchmate_settings_doc = frappe.get_single("BM Settings")
-
-		# ? Collect and return required settings
-		benchmate_settings = {
-			"default_path": benchmate_settings_doc.get("default_path"),
-			"sudo_password": benchmate_settings_doc.get_password("sudo_password"),
-			"db_password": benchmate_settings_doc.get_password("db_password"),
-		}
-		return benchmate_settings
+	if benchmate_settings.get("enable"):
+		# ? Callers get their own copy, the cached one stays untouched
+		return dict(benchmate_settings)
 
 	# ? Raise error if settings are disabled
 	else:
@@ -25,6 +49,86 @@ def get_benchmate_settings():
 		)
 
 
+def load_benchmate_settings() -> dict:
+	"""
+	Read BM Settings from the database and decrypt its passwords, bypassing the caches.
+
+	Returns:
+		dict: Settings as returned by `get_benchmate_settings`, plus the "enable" flag.
+	"""
+
+	# ? Fetch settings document
+	benchmate_settings_doc = frappe.get_single("BM Settings")
+	if not frappe.utils.cint(benchmate_settings_doc.get("enable")):
+		return {"enable": 0}
+
+	# ? Collect and return required settings
+	return {
+		"enable": 1,
+		"default_path": benchmate_settings_doc.get("default_path"),
+		"sudo_password": benchmate_settings_doc.get_password("sudo_password"),
+		"db_password": benchmate_settings_doc.get_password("db_password"),
+		"sync_workers": frappe.utils.cint(benchmate_settings_doc.get("sync_workers")) or 1,
+		"site_apps_source": benchmate_settings_doc.get("site_apps_source") or "CLI",
+		"command_timeout": frappe.utils.cint(benchmate_settings_doc.get("command_timeout")) or 120,
+		"sync_batch_size": frappe.utils.cint(benchmate_settings_doc.get("sync_batch_size")),
+		"use_worker_pool": frappe.utils.cint(benchmate_settings_doc.get("use_worker_pool")),
+		"worker_pool_size": frappe.utils.cint(benchmate_settings_doc.get("worker_pool_size")) or 4,
+		"workers_per_bench": frappe.utils.cint(benchmate_settings_doc.get("workers_per_bench")) or 2,
+		"worker_idle_timeout": frappe.utils.cint(benchmate_settings_doc.get("worker_idle_timeout")) or 300,
+		"max_actions_per_bench": frappe.utils.cint(benchmate_settings_doc.get("max_actions_per_bench")),
+		"max_heavy_actions": frappe.utils.cint(benchmate_settings_doc.get("max_heavy_actions")),
+		"max_heavy_actions_per_disk": frappe.utils.cint(
+			benchmate_settings_doc.get("max_heavy_actions_per_disk")
+		),
+		"use_helper": frappe.utils.cint(benchmate_settings_doc.get("use_helper")),
+		"helper_socket": benchmate_settings_doc.get("helper_socket") or "/run/benchmate/helper.sock",
+		"helper_token": benchmate_settings_doc.get_password("helper_token", raise_exception=False),
+		"backup_engine": benchmate_settings_doc.get("backup_engine") or "Bench",
+		"backup_jobs": frappe.utils.cint(benchmate_settings_doc.get("backup_jobs")) or 4,
+		"restore_engine": benchmate_settings_doc.get("restore_engine") or "Bench",
+		"restore_jobs": frappe.utils.cint(benchmate_settings_doc.get("restore_jobs")) or 4,
+		"file_backup_mode": benchmate_settings_doc.get("file_backup_mode") or "Archive",
+		"bulk_backup_io_priority": benchmate_settings_doc.get("bulk_backup_io_priority") or "Low",
+		"bulk_backup_nice": min(frappe.utils.cint(benchmate_settings_doc.get("bulk_backup_nice")), 19),
+	}
+
+
+def clear_benchmate_settings_cache():
+	"""
+	Drop the cached settings of this request and, through a new version, of every worker.
+	Called when BM Settings is saved.
+	"""
+	frappe.cache.set_value(SETTINGS_VERSION_KEY, frappe.generate_hash(length=12))
+	_settings_cache.pop(frappe.local.site, None)
+	frappe.local.benchmate_settings = None
+
+
+@contextmanager
+def benchmate_settings_batch():
+	"""
+	Resolve the settings, secrets included, once for a batch of jobs or items.
+
+	Every `get_benchmate_settings` call inside the block returns the same snapshot without
+	checking for changes, so all items of the batch run with the same settings.
+
+	Usage:
+		with benchmate_settings_batch():
+			for bench_name in bench_names:
+				...
+
+	Yields:
+		dict: The settings of the batch.
+	"""
+	previous = getattr(frappe.local, "benchmate_settings", None)
+	frappe.local.benchmate_settings = None
+	try:
+		settings = get_benchmate_settings()
+		yield settings
+	finally:
+		frappe.local.benchmate_settings = previous
+
+
 # ! benchmate.api.utils.get_sites
 @frappe.whitelist()
 def get_sites(bench_name: str):
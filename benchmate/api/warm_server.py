@@ -0,0 +1,192 @@
+"""
+Warm interpreter of a bench, started with the bench's own `env/bin/python` from its `sites` directory.
+
+Frappe and the commands of every installed app are imported once. Each request then
+forks a child that runs a `bench` command (the same `frappe.utils.bench_helper`
+entry point the bench CLI uses) without paying for interpreter startup and imports.
+
+This file runs inside other benches, so it only uses the standard library and the
+bench's own Frappe. Requests and responses are JSON lines on stdin and stdout:
+
+	-> {"id": 1, "args": ["--site", "a.localhost", "backup"], "input": "", "priority": null}
+	-> {"id": 1, "signal": 15}
+	<- {"ready": true, "pid": 1234}
+	<- {"id": 1, "data": "Backup Summary ..."}
+	<- {"id": 1, "exit": 0}
+"""
+
+import codecs
+import json
+import os
+import selectors
+import signal
+import subprocess
+import sys
+import traceback
+
+
+def preload():
+	"""Import Frappe and every app's commands, shared by all forked children."""
+	from frappe.utils import bench_helper
+
+	bench_helper.get_app_groups()
+	return bench_helper
+
+
+def set_priority(priority: dict):
+	"""Lower the CPU (`nice`) and I/O (`ionice`) priority of the child, e.g. for bulk backups."""
+	if priority.get("nice"):
+		os.nice(int(priority["nice"]))
+	if priority.get("io_class"):
+		cmd = ["ionice", "-c", str(int(priority["io_class"])), "-p", str(os.getpid())]
+		if int(priority["io_class"]) == 2:
+			cmd[3:3] = ["-n", str(int(priority.get("io_level") or 0))]
+		try:
+			subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+		except FileNotFoundError:
+			pass
+
+
+def run_child(bench_helper, args: list[str], input_fd: int, output_fd: int, priority: dict | None):
+	"""Run a bench command in the forked child and exit with its status."""
+	os.setsid()
+	for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+		signal.signal(sig, signal.SIG_DFL)
+	if priority:
+		set_priority(priority)
+
+	os.dup2(input_fd, 0)
+	os.dup2(output_fd, 1)
+	os.dup2(output_fd, 2)
+	sys.stdin = os.fdopen(0, "r", closefd=False)
+	sys.stdout = os.fdopen(1, "w", buffering=1, closefd=False)
+	sys.stderr = os.fdopen(2, "w", buffering=1, closefd=False)
+
+	code = 0
+	sys.argv = ["bench", "frappe", *args]
+	try:
+		bench_helper.main()
+	except SystemExit as e:
+		code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+	except BaseException:
+		traceback.print_exc()
+		code = 1
+
+	sys.stdout.flush()
+	sys.stderr.flush()
+	os._exit(code)
+
+
+class WarmServer:
+	"""Fork a child per request and relay its output, several requests may run at once."""
+
+	def __init__(self, bench_helper):
+		self.bench_helper = bench_helper
+		self.selector = selectors.DefaultSelector()
+		self.children: dict[int, dict] = {}
+		self.buffer = b""
+
+	def send(self, message: dict):
+		sys.stdout.write(json.dumps(message) + "\n")
+		sys.stdout.flush()
+
+	def start(self, request_id: int, args: list[str], input_text: str, priority: dict | None = None):
+		input_read, input_write = os.pipe()
+		output_read, output_write = os.pipe()
+
+		pid = os.fork()
+		if pid == 0:
+			os.close(input_write)
+			os.close(output_read)
+			run_child(self.bench_helper, args, input_read, output_write, priority)
+
+		os.close(input_read)
+		os.close(output_write)
+		if input_text:
+			os.write(input_write, input_text.encode())
+		os.close(input_write)
+
+		self.children[output_read] = {
+			"id": request_id,
+			"pid": pid,
+			"decoder": codecs.getincrementaldecoder("utf-8")(errors="replace"),
+		}
+		self.selector.register(output_read, selectors.EVENT_READ)
+
+	def signal(self, request_id: int, sig: int):
+		for child in self.children.values():
+			if child["id"] == request_id:
+				try:
+					os.killpg(child["pid"], sig)
+				except ProcessLookupError:
+					pass
+
+	def handle_request(self, line: bytes):
+		request = {}
+		try:
+			request = json.loads(line)
+			if "signal" in request:
+				self.signal(request["id"], int(request["signal"]))
+			else:
+				self.start(
+					request["id"],
+					[str(arg) for arg in request["args"]],
+					request.get("input") or "",
+					request.get("priority"),
+				)
+		except Exception as e:
+			self.send({"id": request.get("id"), "error": str(e)})
+
+	def handle_output(self, fd: int):
+		child = self.children[fd]
+		try:
+			data = os.read(fd, 64 * 1024)
+		except OSError:
+			data = b""
+
+		if data:
+			self.send({"id": child["id"], "data": child["decoder"].decode(data)})
+			return
+
+		# ? Output closed, the command exited
+		self.selector.unregister(fd)
+		os.close(fd)
+		del self.children[fd]
+
+		remaining = child["decoder"].decode(b"", final=True)
+		if remaining:
+			self.send({"id": child["id"], "data": remaining})
+
+		_, status = os.waitpid(child["pid"], 0)
+		self.send({"id": child["id"], "exit": os.waitstatus_to_exitcode(status)})
+
+	def serve(self):
+		stdin_fd = sys.stdin.fileno()
+		self.selector.register(stdin_fd, selectors.EVENT_READ)
+		self.send({"ready": True, "pid": os.getpid()})
+
+		while True:
+			for key, _ in self.selector.select():
+				if key.fd != stdin_fd:
+					self.handle_output(key.fd)
+					continue
+
+				data = os.read(stdin_fd, 64 * 1024)
+				if not data:
+					# ? The owner went away, do not leave commands running
+					for child in self.children.values():
+						try:
+							os.killpg(child["pid"], signal.SIGTERM)
+						except ProcessLookupError:
+							pass
+					return
+
+				self.buffer += data
+				while b"\n" in self.buffer:
+					line, self.buffer = self.buffer.split(b"\n", 1)
+					if line.strip():
+						self.handle_request(line)
+
+
+if __name__ == "__main__":
+	WarmServer(preload()).serve()
@@ -0,0 +1,320 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+from benchmate.api.sync import (
+	_get_git_dir,
+	get_apps_fingerprint,
+	get_bench_fingerprint,
+	get_site_fingerprint,
+)
+
+# ? inotify flags, see inotify(7)
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_bench_dir(path: Path) -> bool:
+	"""Check whether a directory is a bench (must have sites/ + Procfile)."""
+	return path.is_dir() and (path / "sites").is_dir() and (path / "Procfile").is_file()
+
+
+def get_bench_watches(bench_path: Path) -> list[tuple[Path, frozenset | None]]:
+	"""
+	List the directories to watch for a bench, with the entry names that matter in each.
+
+	Watches the bench root, `sites/`, every site directory (for `site_config.json`),
+	and each app's git directory (`HEAD`, `packed-refs`) and `refs/heads`.
+
+	Args:
+		bench_path (Path): Path to bench directory.
+
+	Returns:
+		list[tuple[Path, frozenset | None]]: (directory, relevant names); None means any
+		entry except lock files.
+	"""
+	sites_path = bench_path / "sites"
+	watches = [
+		(bench_path, frozenset({"sites", "apps", "Procfile"})),
+		(sites_path, None),
+	]
+
+	for site_path in sorted(sites_path.iterdir()) if sites_path.is_dir() else []:
+		if site_path.is_dir() and site_path.name != "assets":
+			watches.append((site_path, frozenset({"site_config.json"})))
+
+	apps_path = bench_path / "apps"
+	for app_path in sorted(apps_path.iterdir()) if apps_path.is_dir() else []:
+		git_dir = _get_git_dir(app_path)
+		if git_dir:
+			watches.append((git_dir, frozenset({"HEAD", "packed-refs"})))
+			if (git_dir / "refs" / "heads").is_dir():
+				watches.append((git_dir / "refs" / "heads", None))
+
+	return watches
+
+
+class InotifyBackend:
+	"""
+	Report changed benches using Linux inotify.
+
+	Args:
+		root (Path): Root benches path.
+
+	Raises:
+		OSError: If inotify is unavailable or the watch limit is reached.
+	"""
+
+	def __init__(self, root: Path):
+		libc_name = ctypes.util.find_library("c")
+		if not libc_name:
+			raise OSError(errno.ENOSYS, "libc not found")
+
+		self._libc = ctypes.CDLL(libc_name, use_errno=True)
+		if not hasattr(self._libc, "inotify_init1"):
+			raise OSError(errno.ENOSYS, "inotify is not supported on this platform")
+
+		self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+		if self._fd < 0:
+			raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+		self.root = root
+		# ? wd -> (bench name or None for the root, relevant names)
+		self._watches: dict[int, tuple[str | None, frozenset | None]] = {}
+		self._add_watch(root, None, None)
+
+		for entry in sorted(root.iterdir()):
+			if is_bench_dir(entry):
+				self.refresh([entry.name])
+
+	def _add_watch(self, path: Path, bench_name: str | None, names: frozenset | None):
+		wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+		if wd < 0:
+			err = ctypes.get_errno()
+			# ? The directory may vanish between listing and watching
+			if err in (errno.ENOENT, errno.ENOTDIR):
+				return
+			raise OSError(err, f"inotify_add_watch failed for {path}")
+		self._watches[wd] = (bench_name, names)
+
+	def refresh(self, bench_names: list[str]):
+		"""
+		Re-register the watches of the given benches, picking up new sites and apps.
+
+		Args:
+			bench_names (list[str]): Bench directory names.
+		"""
+		for wd, (bench_name, _names) in list(self._watches.items()):
+			if bench_name in bench_names:
+				self._libc.inotify_rm_watch(self._fd, wd)
+				del self._watches[wd]
+
+		for bench_name in bench_names:
+			bench_path = self.root / bench_name
+			if is_bench_dir(bench_path):
+				for path, names in get_bench_watches(bench_path):
+					self._add_watch(path, bench_name, names)
+
+	def wait(self, timeout: float) -> set[str]:
+		"""
+		Wait for filesystem events.
+
+		Args:
+			timeout (float): Seconds to wait.
+
+		Returns:
+			set[str]: Names of benches that changed.
+		"""
+		readable, _, _ = select.select([self._fd], [], [], timeout)
+		if not readable:
+			return set()
+
+		try:
+			data = os.read(self._fd, 64 * 1024)
+		except BlockingIOError:
+			return set()
+
+		changed = set()
+		offset = 0
+		while offset < len(data):
+			wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+			offset += _EVENT_HEADER.size
+			name = data[offset : offset + length].rstrip(b"\0").decode(errors="replace")
+			offset += length
+
+			# ? Events were dropped, treat every bench as changed
+			if mask & IN_Q_OVERFLOW:
+				changed.update(b for b, _names in self._watches.values() if b)
+				continue
+
+			if wd not in self._watches:
+				continue
+
+			bench_name, names = self._watches[wd]
+			if bench_name is None:
+				# ? A bench directory was created, removed or renamed under the root
+				if name and mask & IN_ISDIR:
+					changed.add(name)
+				continue
+
+			if names is None and not name.endswith(".lock"):
+				changed.add(bench_name)
+			elif names is not None and (name in names or mask & IN_DELETE_SELF):
+				changed.add(bench_name)
+
+		return changed
+
+	def close(self):
+		"""Close the inotify file descriptor."""
+		os.close(self._fd)
+
+
+class PollingBackend:
+	"""
+	Report changed benches by comparing bench fingerprints on an interval.
+
+	Args:
+		root (Path): Root benches path.
+		poll_interval (float): Seconds between scans.
+	"""
+
+	def __init__(self, root: Path, poll_interval: float = 30.0):
+		self.root = root
+		self.poll_interval = poll_interval
+		self._fingerprints = self._scan()
+		self._next_poll = time.monotonic() + poll_interval
+
+	def _scan(self) -> dict[str, tuple | None]:
+		return {
+			entry.name: self._fingerprint(entry)
+			for entry in sorted(self.root.iterdir())
+			if is_bench_dir(entry)
+		}
+
+	@staticmethod
+	def _fingerprint(bench_path: Path) -> tuple | None:
+		"""Combine the bench fingerprint with the fingerprints of all its sites."""
+		try:
+			apps_fingerprint = get_apps_fingerprint(bench_path)
+			return (
+				get_bench_fingerprint(bench_path, apps_fingerprint),
+				*(
+					get_site_fingerprint(site_path, apps_fingerprint)
+					for site_path in sorted((bench_path / "sites").iterdir())
+					if site_path.is_dir()
+				),
+			)
+		except OSError:
+			return None
+
+	def refresh(self, bench_names: list[str]):
+		"""Nothing to re-register, fingerprints cover new sites and apps."""
+
+	def wait(self, timeout: float) -> set[str]:
+		"""
+		Sleep until the next poll (or the timeout) and return the benches that changed.
+
+		Args:
+			timeout (float): Seconds to wait.
+
+		Returns:
+			set[str]: Names of benches that changed.
+		"""
+		time.sleep(max(0.0, min(timeout, self._next_poll - time.monotonic())))
+		if time.monotonic() < self._next_poll:
+			return set()
+
+		self._next_poll = time.monotonic() + self.poll_interval
+		fingerprints = self._scan()
+		changed = {
+			name
+			for name in fingerprints.keys() | self._fingerprints.keys()
+			if fingerprints.get(name) != self._fingerprints.get(name)
+		}
+		self._fingerprints = fingerprints
+		return changed
+
+	def close(self):
+		"""Nothing to release."""
+
+
+class InventoryWatcher:
+	"""
+	Watch the benches root and hand debounced per-bench changes to a callback.
+
+	Uses inotify when available and falls back to polling fingerprints.
+
+	Args:
+		root (str): Root benches path.
+		on_change (Callable): Called with a sorted list of changed bench names.
+		debounce (float): Seconds a bench must stay quiet before it is reported.
+		poll_interval (float): Seconds between scans in polling mode.
+		use_inotify (bool): Try inotify before falling back to polling.
+	"""
+
+	def __init__(
+		self,
+		root: str,
+		on_change,
+		debounce: float = 5.0,
+		poll_interval: float = 30.0,
+		use_inotify: bool = True,
+	):
+		self.root = Path(root).expanduser().resolve()
+		self.on_change = on_change
+		self.debounce = debounce
+		self.backend = None
+
+		if use_inotify:
+			try:
+				self.backend = InotifyBackend(self.root)
+			except OSError:
+				self.backend = None
+		if self.backend is None:
+			self.backend = PollingBackend(self.root, poll_interval)
+
+	def run(self, stop_event=None):
+		"""
+		Run until `stop_event` is set (forever when not given).
+
+		Args:
+			stop_event (threading.Event | None): Event used to stop the watcher.
+		"""
+		pending: dict[str, float] = {}
+
+		try:
+			while not (stop_event and stop_event.is_set()):
+				now = time.monotonic()
+				timeout = min((t + self.debounce - now for t in pending.values()), default=1.0)
+
+				for bench_name in self.backend.wait(max(0.0, min(timeout, 1.0))):
+					pending[bench_name] = time.monotonic()
+
+				# ? Report benches that stayed quiet for the debounce window
+				now = time.monotonic()
+				ready = sorted(b for b, t in pending.items() if now - t >= self.debounce)
+				if ready:
+					for bench_name in ready:
+						del pending[bench_name]
+					self.backend.refresh(ready)
+					self.on_change(ready)
+		finally:
+			self.backend.close()
@@ -0,0 +1,511 @@
+"""
+Warm per-bench worker processes for site-level bench commands.
+
+Every `bench` call pays for a full CLI bootstrap, even though site commands
+(`list-apps`, `backup`, `migrate`, ...) all run inside the same bench's
+`env/bin/python`. A worker is a `warm_server.py` process started from that
+virtualenv: Frappe and every app's commands are imported once, then each command
+runs in a forked child and its output is streamed back over the worker's pipe.
+
+`WorkerPool` keeps up to `max_per_bench` workers per bench and `max_workers` in
+total, starts them on demand, evicts the ones idle for `idle_timeout` and restarts
+workers whose bench apps changed. A pool lives in one process: within a sync job
+every site after the first of a bench is served warm, in long-running processes
+(the inventory watcher, the privileged helper) workers stay warm between calls.
+
+This module must not import Frappe, the privileged helper runs outside of any site.
+"""
+
+import json
+import os
+import pwd
+import queue
+import selectors
+import signal
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+WARM_SERVER_PATH = Path(__file__).with_name("warm_server.py")
+
+# ? Seconds between SIGTERM and SIGKILL when a command is terminated
+KILL_GRACE = 10
+
+# ? Seconds a new interpreter may take to import Frappe and the app commands
+START_TIMEOUT = 120
+
+
+def get_code_fingerprint(bench_path: Path) -> tuple:
+	"""Identity of the installed apps of a bench, a warm interpreter is restarted when it changes."""
+	paths = [bench_path / "sites" / "apps.txt"]
+	for app_path in sorted((bench_path / "apps").glob("*")):
+		paths += [app_path / ".git" / "HEAD", app_path / ".git" / "index"]
+
+	fingerprint = []
+	for path in paths:
+		try:
+			stat = path.stat()
+		except OSError:
+			continue
+		fingerprint.append((str(path), stat.st_mtime_ns, stat.st_size))
+	return tuple(fingerprint)
+
+
+class WarmInterpreter:
+	"""
+	A `warm_server.py` process of a bench, shared by concurrent requests.
+
+	Args:
+		bench_path (Path): Bench directory.
+		user (int | None): User id the interpreter runs as, the current user when not given.
+		group (int | None): Group id the interpreter runs as.
+	"""
+
+	def __init__(self, bench_path: Path, user: int | None = None, group: int | None = None):
+		self.bench_path = Path(bench_path)
+		self.user = user
+		self.group = group
+		self.fingerprint = get_code_fingerprint(self.bench_path)
+		self.proc: subprocess.Popen | None = None
+		self._queues: dict[int, queue.Queue] = {}
+		self._next_id = 0
+		self._lock = threading.Lock()
+		self.last_used = time.monotonic()
+
+	@property
+	def alive(self) -> bool:
+		return self.proc is not None and self.proc.poll() is None
+
+	@property
+	def busy(self) -> int:
+		"""Number of commands running."""
+		with self._lock:
+			return len(self._queues)
+
+	def start(self, timeout: float = START_TIMEOUT):
+		"""
+		Start the interpreter and wait until Frappe and the app commands are imported.
+
+		Args:
+			timeout (float): Seconds to wait for the interpreter to be ready.
+
+		Raises:
+			RuntimeError: If the interpreter exited, hung or sent something else than its ready line.
+				It is killed before raising.
+		"""
+		python = self.bench_path / "env" / "bin" / "python"
+		env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+		if self.user is not None:
+			home = pwd.getpwuid(self.user)
+			env.update({"HOME": home.pw_dir, "USER": home.pw_name, "LOGNAME": home.pw_name})
+
+		self.proc = subprocess.Popen(
+			[str(python), str(WARM_SERVER_PATH)],
+			cwd=self.bench_path / "sites",
+			stdin=subprocess.PIPE,
+			stdout=subprocess.PIPE,
+			env=env,
+			user=self.user,
+			group=self.group,
+			extra_groups=[] if self.user is not None and os.geteuid() == 0 else None,
+			start_new_session=True,
+		)
+
+		try:
+			if not json.loads(self._read_ready_line(timeout)).get("ready"):
+				raise ValueError("unexpected first message")
+		except Exception as e:
+			self.kill()
+			raise RuntimeError(f"Warm interpreter of {self.bench_path} failed to start: {e}") from e
+
+		threading.Thread(target=self._read, name=f"warm-{self.bench_path.name}", daemon=True).start()
+
+	def _read_ready_line(self, timeout: float) -> bytes:
+		"""
+		Read the ready line within the timeout, a hung import must not block the caller.
+		The interpreter sends nothing else before its first request, so the raw reads
+		leave no data behind for `_read`.
+		"""
+		fd = self.proc.stdout.fileno()
+		deadline = time.monotonic() + timeout
+		data = b""
+		with selectors.DefaultSelector() as selector:
+			selector.register(fd, selectors.EVENT_READ)
+			while b"\n" not in data:
+				remaining = deadline - time.monotonic()
+				if remaining <= 0 or not selector.select(remaining):
+					raise TimeoutError(f"not ready after {timeout:.1f}s")
+				chunk = os.read(fd, 65536)
+				if not chunk:
+					raise EOFError("exited before it was ready")
+				data += chunk
+		return data.partition(b"\n")[0]
+
+	def _read(self):
+		"""Route the interpreter output to the queue of each request."""
+		for line in self.proc.stdout:
+			try:
+				message = json.loads(line)
+			except ValueError:
+				continue
+			with self._lock:
+				target = self._queues.get(message.get("id"))
+			if target:
+				target.put(message)
+
+		# ? The interpreter exited, fail the requests still waiting
+		with self._lock:
+			waiting, self._queues = list(self._queues.values()), {}
+		for target in waiting:
+			target.put({"error": "Warm interpreter exited"})
+
+	def _send(self, message: dict):
+		with self._lock:
+			self.proc.stdin.write((json.dumps(message) + "\n").encode())
+			self.proc.stdin.flush()
+
+	def submit(
+		self, args: list[str], input_text: str = "", priority: dict | None = None
+	) -> tuple[int, queue.Queue]:
+		"""
+		Start a bench command.
+
+		Args:
+			args (list[str]): Arguments after `bench`.
+			input_text (str): Text written to the command's stdin.
+			priority (dict | None): {"nice", "io_class", "io_level"} the command runs with.
+
+		Returns:
+			tuple[int, queue.Queue]: Request id and the queue receiving {"data"}, then {"exit"} or {"error"}.
+		"""
+		messages = queue.Queue()
+		with self._lock:
+			self._next_id += 1
+			request_id = self._next_id
+			self._queues[request_id] = messages
+		self._send({"id": request_id, "args": args, "input": input_text, "priority": priority})
+		return request_id, messages
+
+	def release(self, request_id: int):
+		"""Forget a finished request."""
+		with self._lock:
+			self._queues.pop(request_id, None)
+		self.last_used = time.monotonic()
+
+	def terminate(self, request_id: int, sig: int = signal.SIGTERM):
+		"""Send a signal to the process group of a running command."""
+		try:
+			self._send({"id": request_id, "signal": int(sig)})
+		except (BrokenPipeError, ValueError):
+			pass
+
+	def kill(self):
+		"""Kill the interpreter and its process group right away."""
+		if not self.proc:
+			return
+		try:
+			os.killpg(self.proc.pid, signal.SIGKILL)
+		except ProcessLookupError:
+			pass
+		self.proc.wait()
+		for pipe in (self.proc.stdin, self.proc.stdout):
+			try:
+				pipe.close()
+			except OSError:
+				pass
+
+	def close(self):
+		"""Stop the interpreter, its running commands are terminated."""
+		if not self.proc:
+			return
+		try:
+			self.proc.stdin.close()
+		except OSError:
+			pass
+		try:
+			self.proc.wait(timeout=KILL_GRACE)
+		except subprocess.TimeoutExpired:
+			os.killpg(self.proc.pid, signal.SIGKILL)
+			self.proc.wait()
+
+
+class WorkerPool:
+	"""
+	Warm workers per bench, each running one command at a time.
+
+	Args:
+		max_workers (int): Workers alive at the same time over all benches.
+		max_per_bench (int): Workers of a single bench, i.e. its concurrent commands.
+		idle_timeout (float): Seconds after which an idle worker is stopped.
+	"""
+
+	def __init__(self, max_workers: int = 4, max_per_bench: int = 2, idle_timeout: float = 300.0):
+		self.max_workers = max_workers
+		self.max_per_bench = max_per_bench
+		self.idle_timeout = idle_timeout
+		self._workers: dict[Path, list[WarmInterpreter]] = {}
+		self._busy: set[WarmInterpreter] = set()
+		self._starting = 0
+		self._condition = threading.Condition()
+		self._pid = os.getpid()
+		self._reaper: threading.Thread | None = None
+
+	def configure(
+		self,
+		max_workers: int | None = None,
+		max_per_bench: int | None = None,
+		idle_timeout: float | None = None,
+	):
+		"""
+		Change the pool limits, applied from the next acquire.
+
+		Args:
+			max_workers (int | None): Workers alive at the same time over all benches.
+			max_per_bench (int | None): Workers of a single bench.
+			idle_timeout (float | None): Seconds after which an idle worker is stopped.
+		"""
+		with self._condition:
+			self.max_workers = max_workers or self.max_workers
+			self.max_per_bench = max_per_bench or self.max_per_bench
+			self.idle_timeout = idle_timeout or self.idle_timeout
+			self._condition.notify_all()
+
+	def _check_fork(self):
+		"""Forget workers inherited from a parent process (e.g. a forked job), they are not ours to use."""
+		if self._pid != os.getpid():
+			self._workers, self._busy, self._starting = {}, set(), 0
+			self._condition = threading.Condition()
+			self._reaper = None
+			self._pid = os.getpid()
+
+	def _total(self) -> int:
+		return sum(len(workers) for workers in self._workers.values()) + self._starting
+
+	def _remove(self, worker: WarmInterpreter):
+		workers = self._workers.get(worker.bench_path, [])
+		if worker in workers:
+			workers.remove(worker)
+		if not workers:
+			self._workers.pop(worker.bench_path, None)
+		threading.Thread(target=worker.close, daemon=True).start()
+
+	def acquire(
+		self,
+		bench_path: Path,
+		user: int | None = None,
+		group: int | None = None,
+		timeout: float | None = None,
+	) -> WarmInterpreter:
+		"""
+		Get an idle worker of a bench, starting one when the limits allow, else wait for one.
+
+		Args:
+			bench_path (Path): Bench directory.
+			user (int | None): User id a new worker runs as.
+			group (int | None): Group id a new worker runs as.
+			timeout (float | None): Seconds to wait for a worker.
+
+		Returns:
+			WarmInterpreter: Worker reserved for the caller, hand it back with `release`.
+		"""
+		self._check_fork()
+		bench_path = Path(bench_path)
+		fingerprint = get_code_fingerprint(bench_path)
+		deadline = time.monotonic() + timeout if timeout else None
+
+		with self._condition:
+			self._start_reaper()
+			while True:
+				workers = self._workers.get(bench_path, [])
+
+				# ? Drop dead workers and idle ones started before the apps changed
+				for worker in list(workers):
+					if not worker.alive or (worker not in self._busy and worker.fingerprint != fingerprint):
+						self._remove(worker)
+
+				workers = self._workers.get(bench_path, [])
+				for worker in workers:
+					if worker not in self._busy:
+						self._busy.add(worker)
+						return worker
+
+				if len(workers) < self.max_per_bench:
+					if self._total() < self.max_workers or self._evict_idle_other(bench_path):
+						self._starting += 1
+						break
+
+				remaining = deadline - time.monotonic() if deadline else None
+				if remaining is not None and remaining <= 0:
+					raise TimeoutError(f"No worker of {bench_path} became free")
+				self._condition.wait(timeout=remaining)
+
+		# ? Start outside the lock, importing Frappe takes a while
+		worker = WarmInterpreter(bench_path, user=user, group=group)
+		try:
+			remaining = deadline - time.monotonic() if deadline else START_TIMEOUT
+			worker.start(timeout=max(1.0, min(remaining, START_TIMEOUT)))
+		finally:
+			with self._condition:
+				self._starting -= 1
+				if worker.alive:
+					self._workers.setdefault(bench_path, []).append(worker)
+					self._busy.add(worker)
+				self._condition.notify_all()
+		return worker
+
+	def _evict_idle_other(self, bench_path: Path) -> bool:
+		"""Stop the least recently used idle worker of another bench to make room."""
+		idle = [
+			worker
+			for path, workers in self._workers.items()
+			if path != bench_path
+			for worker in workers
+			if worker not in self._busy
+		]
+		if not idle:
+			return False
+		self._remove(min(idle, key=lambda worker: worker.last_used))
+		return True
+
+	def release(self, worker: WarmInterpreter):
+		"""Hand a worker back to the pool."""
+		with self._condition:
+			self._busy.discard(worker)
+			if not worker.alive or worker.fingerprint != get_code_fingerprint(worker.bench_path):
+				self._remove(worker)
+			self._condition.notify_all()
+
+	def _start_reaper(self):
+		if self._reaper and self._reaper.is_alive():
+			return
+		self._reaper = threading.Thread(target=self._reap, name="benchmate-pool-reaper", daemon=True)
+		self._reaper.start()
+
+	def _reap(self):
+		"""Stop workers idle for longer than the idle timeout."""
+		while True:
+			time.sleep(min(30.0, self.idle_timeout))
+			with self._condition:
+				if self._pid != os.getpid():
+					return
+				now = time.monotonic()
+				for workers in list(self._workers.values()):
+					for worker in list(workers):
+						if worker not in self._busy and now - worker.last_used > self.idle_timeout:
+							self._remove(worker)
+
+	def run(
+		self,
+		bench_path: Path,
+		args: list[str],
+		on_output=None,
+		on_idle=None,
+		timeout: float | None = None,
+		cancel_check=None,
+		cancel_interval: float = 2.0,
+		user: int | None = None,
+		group: int | None = None,
+		priority: dict | None = None,
+	) -> dict:
+		"""
+		Run a bench command on a warm worker of a bench.
+
+		Args:
+			bench_path (Path): Bench directory.
+			args (list[str]): Arguments after `bench`, e.g. ["--site", "a.localhost", "list-apps"].
+			on_output (Callable | None): Receives output as it arrives, else it is collected.
+			on_idle (Callable | None): Called while no output arrives, e.g. to flush a log.
+			timeout (float | None): Seconds before the command is terminated, waiting for a worker included.
+			cancel_check (Callable | None): Returns True when the command should be cancelled.
+			cancel_interval (float): Seconds between two `cancel_check` calls.
+			user (int | None): User id a new worker runs as.
+			group (int | None): Group id a new worker runs as.
+			priority (dict | None): {"nice", "io_class", "io_level"} the command runs with.
+
+		Returns:
+			dict: {"output", "returncode", "timed_out", "cancelled", "error", "duration"}
+		"""
+		started = time.monotonic()
+		deadline = started + timeout if timeout else None
+		output, returncode, error = [], None, None
+		timed_out = cancelled = False
+		next_cancel_check = started
+
+		try:
+			worker = self.acquire(bench_path, user=user, group=group, timeout=timeout)
+		except TimeoutError:
+			return self._result(output, None, True, False, None, started)
+
+		request_id, messages = worker.submit(args, priority=priority)
+		try:
+			while returncode is None and error is None:
+				now = time.monotonic()
+				if cancel_check and now >= next_cancel_check:
+					next_cancel_check = now + cancel_interval
+					if cancel_check():
+						cancelled = True
+						break
+				if deadline and now >= deadline:
+					timed_out = True
+					break
+
+				try:
+					message = messages.get(
+						timeout=0.5 if not deadline else max(0.0, min(0.5, deadline - now))
+					)
+				except queue.Empty:
+					if on_idle:
+						on_idle()
+					continue
+
+				if "data" in message:
+					if on_output:
+						on_output(message["data"])
+					else:
+						output.append(message["data"])
+				elif "exit" in message:
+					returncode = message["exit"]
+				elif "error" in message:
+					error = message["error"]
+		finally:
+			if returncode is None and error is None:
+				terminate(worker, request_id, messages)
+			worker.release(request_id)
+			self.release(worker)
+
+		return self._result(output, returncode, timed_out, cancelled, error, started)
+
+	@staticmethod
+	def _result(output, returncode, timed_out, cancelled, error, started) -> dict:
+		return {
+			"output": "".join(output),
+			"returncode": returncode,
+			"timed_out": timed_out,
+			"cancelled": cancelled,
+			"error": error,
+			"duration": round(time.monotonic() - started, 3),
+		}
+
+	def close(self):
+		"""Stop every worker."""
+		with self._condition:
+			for workers in list(self._workers.values()):
+				for worker in list(workers):
+					self._remove(worker)
+
+
+def terminate(worker: WarmInterpreter, request_id: int, messages: queue.Queue):
+	"""Terminate a running command, escalating to SIGKILL after the grace period."""
+	for sig in (signal.SIGTERM, signal.SIGKILL):
+		worker.terminate(request_id, sig)
+		try:
+			while not {"exit", "error"} & messages.get(timeout=KILL_GRACE).keys():
+				pass
+			return
+		except queue.Empty:
+			continue
+
+
+# ? Process-wide pool used by the sync and the site actions
+worker_pool = WorkerPool()
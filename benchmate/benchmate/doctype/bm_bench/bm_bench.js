@@ -37,6 +37,15 @@ function addBenchActions(frm) {
 		__("Actions")
 	);
 
+	// ? Add "Backup All Sites" button and pair it with handler
+	frm.add_custom_button(
+		__("Backup All Sites"),
+		function () {
+			backupAllSites(frm);
+		},
+		__("Actions")
+	);
+
 	// ? Add "Restore Site" button and pair it with handler
 	frm.add_custom_button(
 		__("Restore Site"),
@@ -63,6 +72,15 @@ function addBenchActions(frm) {
 		},
 		__("Actions")
 	);
+
+	// ? Add "Sync Bench" button and pair it with handler
+	frm.add_custom_button(
+		__("Sync Bench"),
+		function () {
+			syncBench(frm);
+		},
+		__("Actions")
+	);
 }
 
 // ? Function to handle Cerate Site action
@@ -80,6 +98,7 @@ function createSite(frm) {
 		primary_action_label: __("Create"),
 		primary_action(values) {
 			dialog.hide();
+
 			frappe.call({
 				method: "benchmate.api.actions.create_site.execute",
 				args: {
@@ -99,6 +118,12 @@ function createSite(frm) {
 							},
 							5
 						);
+
+						// ? Follow the action output live through the BM Log it was queued as
+						benchmate.open_log_tail_dialog(
+							r.message.data.log,
+							__(`Create Site - ${values.site_name}`)
+						);
 					}
 
 					// ? If error show error message
@@ -268,6 +293,12 @@ function dropSite(frm) {
 							},
 							5
 						);
+
+						// ? Follow the action output live through the BM Log it was queued as
+						benchmate.open_log_tail_dialog(
+							r.message.data.log,
+							__(`Drop Site - ${values.site_name}`)
+						);
 					} else {
 						// ? Show error message if failed
 						frappe.show_alert(
@@ -365,6 +396,12 @@ function backupSite(frm) {
 							},
 							5
 						);
+
+						// ? Follow the action output live through the BM Log it was queued as
+						benchmate.open_log_tail_dialog(
+							r.message.data.log,
+							__(`Backup Site - ${values.site_name}`)
+						);
 					} else {
 						// ? Show error message if failed
 						frappe.show_alert(
@@ -384,6 +421,40 @@ function backupSite(frm) {
 	dialog.show();
 }
 
+// ? Function to handle the Backup All Sites action from BM Bench form
+function backupAllSites(frm) {
+	frappe.confirm(__("Back up all active sites of {0}?", [frm.doc.name]), () => {
+		// ? Call server-side method to queue a backup of every site of the bench
+		frappe.call({
+			method: "benchmate.api.actions.backup_sites.execute",
+			args: {
+				bench_name: frm.doc.name,
+			},
+			freeze: true,
+			freeze_message: __(`Queueing Backups Of Bench ${frm.doc.name}...`),
+
+			// ? Handle callback after server execution
+			callback: function (r) {
+				frappe.show_alert(
+					{
+						message: __(r.message.message),
+						indicator: r.message.success ? "green" : "red",
+					},
+					5
+				);
+
+				// ? Follow the aggregated BM Log listing every site as its backup ends
+				if (r.message.success) {
+					benchmate.open_log_tail_dialog(
+						r.message.data.log,
+						__(`Backup Sites - ${frm.doc.name}`)
+					);
+				}
+			},
+		});
+	});
+}
+
 // ? Function to handle the Restore Site action from BM Bench form
 function restoreSite(frm) {
 	// ? Create a dialog box for site selection and restore confirmation
@@ -446,18 +517,18 @@ function restoreSite(frm) {
 				fieldname: "public_files_path",
 				fieldtype: "Attach",
 				description:
-					"Upload the public files backup. Usually file name ends in -files.tar",
+					"Upload the public files backup. Usually file name ends in -files.tar, or the -files.json manifest of a deduplicated file backup (restores public and private files)",
 				reqd: 1,
-				options: { restrictions: { allowed_file_types: [".tar"] } },
+				options: { restrictions: { allowed_file_types: [".tar", ".json"] } },
 			},
 			{
 				label: __("Private Files"),
 				fieldname: "private_files_path",
 				fieldtype: "Attach",
 				description:
-					"Upload the private files backup. Usually file name ends in -private-files.tar",
-				reqd: 1,
-				options: { restrictions: { allowed_file_types: [".tar"] } },
+					"Upload the private files backup. Usually file name ends in -private-files.tar, not needed with a files manifest",
+				mandatory_depends_on: "eval:!(doc.public_files_path || '').endsWith('.json')",
+				options: { restrictions: { allowed_file_types: [".tar", ".json"] } },
 			},
 		],
 
@@ -492,6 +563,12 @@ function restoreSite(frm) {
 							},
 							5
 						);
+
+						// ? Follow the action output live through the BM Log it was queued as
+						benchmate.open_log_tail_dialog(
+							r.message.data.log,
+							__(`Restore Site - ${values.site_name}`)
+						);
 					} else {
 						// ? Show error message if failed
 						frappe.show_alert(
@@ -510,3 +587,28 @@ function restoreSite(frm) {
 	// ? Display the dialog to the user
 	dialog.show();
 }
+
+// ? Function to handle Sync Bench action
+function syncBench(frm) {
+	// ? Call server-side method to enqueue the sync of this bench
+	frappe.call({
+		method: "benchmate.api.sync.enqueue_sync_bench",
+		args: {
+			bench_name: frm.doc.name,
+			force: 1,
+		},
+		freeze: true,
+		freeze_message: __(`Enqueuing Sync Of Bench ${frm.doc.name}...`),
+
+		// ? Handle callback after server execution
+		callback: function (r) {
+			frappe.show_alert(
+				{
+					message: __(r.message.message),
+					indicator: r.message.success ? "green" : "red",
+				},
+				5
+			);
+		},
+	});
+}
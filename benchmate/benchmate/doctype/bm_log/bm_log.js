@@ -1,8 +1,51 @@
 // Copyright (c) 2025, Karan Mistry and contributors
 // For license information, please see license.txt
 
-// frappe.ui.form.on("BM Log", {
-// 	refresh(frm) {
+frappe.ui.form.on("BM Log", {
+	refresh: function (frm) {
+		// ? Stop following the previously rendered log
+		if (frm.log_tail) {
+			frm.log_tail.stop();
+			frm.log_tail = null;
+		}
 
-// 	},
-// });
+		// ? Render chunked, queued and running logs as a live tail through the ranged read API
+		if (frm.doc.line_count || ["Queued", "In Process"].includes(frm.doc.status)) {
+			frm.log_tail = new benchmate.LogTail({
+				wrapper: frm.get_field("log_viewer").$wrapper,
+				log_name: frm.doc.name,
+				on_status: () => frm.reload_doc(),
+			}).start();
+		}
+
+		// ? Allow cancelling scheduled site actions and bulk backups that did not end yet
+		if (
+			(frm.doc.bench_name || frm.doc.action === "Backup Sites") &&
+			["Queued", "In Process"].includes(frm.doc.status)
+		) {
+			frm.add_custom_button(__("Cancel Action"), () => cancelAction(frm));
+		}
+	},
+});
+
+// ? Cancel the action after confirmation, a running command is terminated by its job
+function cancelAction(frm) {
+	frappe.confirm(__("Cancel {0}?", [frm.doc.title]), () => {
+		frappe.call({
+			method: "benchmate.api.scheduler.cancel_action",
+			args: {
+				log_name: frm.doc.name,
+			},
+			callback: function (r) {
+				frappe.show_alert(
+					{
+						message: __(r.message.message),
+						indicator: r.message.success ? "orange" : "red",
+					},
+					5
+				);
+				if (r.message.success) frm.reload_doc();
+			},
+		});
+	});
+}
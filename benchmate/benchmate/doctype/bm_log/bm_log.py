@@ -1,9 +1,11 @@
 # Copyright (c) 2025, Karan Mistry and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
 
 
 class BMLog(Document):
-	pass
+	def on_trash(self):
+		# ? Remove the output chunks of this log
+		frappe.db.delete("BM Log Chunk", {"log": self.name})
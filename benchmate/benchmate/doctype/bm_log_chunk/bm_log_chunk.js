@@ -0,0 +1,8 @@
+// Copyright (c) 2026, Karan Mistry and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("BM Log Chunk", {
+// 	refresh(frm) {
+
+// 	},
+// });
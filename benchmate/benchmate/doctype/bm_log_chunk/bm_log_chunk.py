@@ -0,0 +1,14 @@
+# Copyright (c) 2026, Karan Mistry and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class BMLogChunk(Document):
+	pass
+
+
+def on_doctype_update():
+	# ? Ranged reads look chunks up by log and start line
+	frappe.db.add_index("BM Log Chunk", ["log", "start_line"])
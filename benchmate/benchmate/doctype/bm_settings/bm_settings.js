@@ -15,14 +15,19 @@ function addSyncBenchDetailsButton(frm) {
 		frm.add_custom_button("Sync Bench Details", () => {
 			enqueueSyncBenchDetailsButton();
 		});
+
+		// ? Add custom button to resync everything, ignoring unchanged fingerprints
+		frm.add_custom_button("Full Resync", () => {
+			enqueueSyncBenchDetailsButton(true);
+		});
 	}
 }
 
-function enqueueSyncBenchDetailsButton() {
+function enqueueSyncBenchDetailsButton(force = false) {
 	// ? Call Frappe backend method to enqueue sync
 	frappe.call({
 		method: "benchmate.api.sync.enqueue_sync_bench_details",
-		args: {},
+		args: { force: force ? 1 : 0 },
 
 		// ? Freeze the UI with message while processing
 		freeze: true,
@@ -4,6 +4,10 @@
 # import frappe
 from frappe.model.document import Document
 
+from benchmate.api.utils import clear_benchmate_settings_cache
+
 
 class BMSettings(Document):
-	pass
+	def on_update(self):
+		# ? Workers and requests holding the old settings reload them
+		clear_benchmate_settings_cache()
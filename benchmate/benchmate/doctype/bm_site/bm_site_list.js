@@ -0,0 +1,44 @@
+// Copyright (c) 2025, Karan Mistry and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["BM Site"] = {
+	onload: function (listview) {
+		// ? Back up the selected sites in one bulk action
+		listview.page.add_actions_menu_item(__("Backup Sites"), function () {
+			const site_names = listview.get_checked_items(true);
+			backupSites(__("Back up {0} selected sites?", [site_names.length]), { site_names });
+		});
+
+		// ? Back up every active site of every bench
+		listview.page.add_menu_item(__("Backup All Sites"), function () {
+			backupSites(__("Back up all active sites of all benches?"), {});
+		});
+	},
+};
+
+// ? Queue the bulk backup after confirmation and follow its aggregated BM Log
+function backupSites(message, args) {
+	frappe.confirm(message, () => {
+		frappe.call({
+			method: "benchmate.api.actions.backup_sites.execute",
+			args: args,
+			freeze: true,
+			freeze_message: __("Queueing Site Backups..."),
+
+			// ? Handle callback after server execution
+			callback: function (r) {
+				frappe.show_alert(
+					{
+						message: __(r.message.message),
+						indicator: r.message.success ? "green" : "red",
+					},
+					5
+				);
+
+				if (r.message.success) {
+					benchmate.open_log_tail_dialog(r.message.data.log, __("Backup Sites"));
+				}
+			},
+		});
+	});
+}
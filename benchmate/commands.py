@@ -0,0 +1,60 @@
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+def resync_changed_benches(site: str, bench_names: list[str]):
+	"""
+	Resync the given benches inside a fresh Frappe context.
+
+	Args:
+		site (str): Site where BenchMate is installed.
+		bench_names (list[str]): Bench directory names that changed.
+	"""
+	from benchmate.api.sync import sync_benches
+
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		# ? The watcher already saw these benches change, do not skip them on stored fingerprints
+		result = sync_benches(bench_names, force=True)
+		click.echo(f"Resynced {', '.join(bench_names)}: {len(result['updated_sites'])} site(s) updated")
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(title="BenchMate Watcher", message=frappe.get_traceback())
+		frappe.db.commit()
+	finally:
+		frappe.destroy()
+
+
+@click.command("benchmate-watch")
+@click.option("--debounce", default=5.0, type=float, help="Seconds a bench must stay quiet before resyncing")
+@click.option("--poll-interval", default=30.0, type=float, help="Seconds between scans in polling mode")
+@click.option("--polling", is_flag=True, default=False, help="Poll fingerprints instead of using inotify")
+@pass_context
+def watch_inventory(context, debounce, poll_interval, polling):
+	"""Watch the BenchMate default path and resync benches as they change on disk."""
+	from benchmate.api.utils import get_benchmate_settings
+	from benchmate.api.watcher import InventoryWatcher
+
+	site = get_site(context)
+
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		default_path = get_benchmate_settings().get("default_path")
+	finally:
+		frappe.destroy()
+
+	watcher = InventoryWatcher(
+		default_path,
+		on_change=lambda bench_names: resync_changed_benches(site, bench_names),
+		debounce=debounce,
+		poll_interval=poll_interval,
+		use_inotify=not polling,
+	)
+	click.echo(f"Watching {watcher.root} using {type(watcher.backend).__name__}")
+	watcher.run()
+
+
+commands = [watch_inventory]
@@ -26,7 +26,7 @@ app_license = "agpl-3.0"
 
 # include js, css files in header of desk.html
 # app_include_css = "/assets/benchmate/css/benchmate.css"
-# app_include_js = "/assets/benchmate/js/benchmate.js"
+app_include_js = "/assets/benchmate/js/benchmate.js"
 
 # include js, css files in header of web template
 # web_include_css = "/assets/benchmate/css/benchmate.css"
@@ -161,6 +161,12 @@ after_install = "benchmate.api.sync.after_install"
 # 	],
 # }
 
+scheduler_events = {
+	"all": [
+		"benchmate.api.scheduler.dispatch_actions",
+	],
+}
+
 # Testing
 # -------
 
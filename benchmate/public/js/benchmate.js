@@ -0,0 +1,168 @@
+frappe.provide("benchmate");
+
+// ? Live tail of a BM Log: loads the last lines through the ranged read API,
+// ? then appends the lines pushed over realtime, resuming from the last received line.
+benchmate.LogTail = class LogTail {
+	constructor({ wrapper, log_name, page_size = 500, on_status = null }) {
+		this.$wrapper = $(wrapper);
+		this.log_name = log_name;
+		this.page_size = page_size;
+		this.on_status = on_status;
+
+		// ? Next line expected, null until the initial tail is loaded
+		this.offset = null;
+		this.start_line = 0;
+		this.pending = [];
+		this.catching_up = false;
+		this.handler = (data) => this.on_message(data);
+	}
+
+	start() {
+		this.$wrapper.html(`
+			<div class="log-tail">
+				<button class="btn btn-xs btn-default load-earlier hidden">${__("Load Earlier Lines")}</button>
+				<pre class="log-lines" style="max-height: 600px; overflow: auto; white-space: pre-wrap;"></pre>
+				<div class="text-muted small log-info"></div>
+			</div>
+		`);
+		this.$pre = this.$wrapper.find(".log-lines");
+		this.$wrapper.find(".load-earlier").on("click", () => this.load_earlier());
+
+		// ? Subscribe before loading the tail so no pushed lines are missed
+		frappe.realtime.doc_subscribe("BM Log", this.log_name);
+		frappe.realtime.on("benchmate_log", this.handler);
+
+		this.call("benchmate.api.logs.tail_log", { lines: this.page_size }, (data) => {
+			this.start_line = data.start;
+			this.offset = data.end;
+			this.$pre.text(data.lines.join("\n"));
+			this.update_info(data.line_count);
+			this.scroll_to_end(true);
+			this.drain();
+		});
+		return this;
+	}
+
+	stop() {
+		// ? Keep the document subscription, the BM Log form shares it
+		frappe.realtime.off("benchmate_log", this.handler);
+	}
+
+	on_message(data) {
+		if (data.log !== this.log_name) return;
+
+		// ? Queue messages until the tail or a catch-up read is loaded
+		this.pending.push(data);
+		if (this.offset !== null && !this.catching_up) this.drain();
+	}
+
+	drain() {
+		while (this.pending.length) {
+			const data = this.pending.shift();
+
+			// ? Lines were missed (e.g. after a reconnect), read them from the committed chunks
+			if (data.start > this.offset) {
+				this.pending.unshift(data);
+				this.catch_up(data.line_count);
+				return;
+			}
+
+			const lines = data.lines.slice(this.offset - data.start);
+			if (lines.length) {
+				this.append(lines);
+				this.offset = data.start + data.lines.length;
+			}
+			this.update_info(data.line_count);
+			if (data.status && this.on_status) this.on_status(data.status);
+		}
+	}
+
+	catch_up(end) {
+		this.catching_up = true;
+		this.call("benchmate.api.logs.get_log_lines", { start: this.offset, end: end }, (data) => {
+			this.catching_up = false;
+			if (data.lines.length) {
+				this.append(data.lines);
+				this.offset = data.end;
+			} else {
+				// ? Nothing to catch up on, continue from the reported end
+				this.offset = Math.max(this.offset, end);
+			}
+			this.drain();
+		});
+	}
+
+	load_earlier() {
+		const end = this.start_line;
+		this.call(
+			"benchmate.api.logs.get_log_lines",
+			{ start: Math.max(0, end - this.page_size), end: end },
+			(data) => {
+				// ? An exhausted range returns no lines, do not prepend an empty one
+				if (data.lines.length) {
+					this.$pre.text(data.lines.join("\n") + "\n" + this.$pre.text());
+				}
+				this.start_line = data.start;
+				this.update_info(data.line_count);
+			}
+		);
+	}
+
+	append(lines) {
+		const pre = this.$pre.get(0);
+		const at_end = pre.scrollHeight - pre.scrollTop - pre.clientHeight < 40;
+		pre.append((pre.textContent ? "\n" : "") + lines.join("\n"));
+		this.scroll_to_end(at_end);
+	}
+
+	scroll_to_end(force) {
+		const pre = this.$pre.get(0);
+		if (force) pre.scrollTop = pre.scrollHeight;
+	}
+
+	update_info(line_count) {
+		this.$wrapper.find(".load-earlier").toggleClass("hidden", this.start_line <= 0);
+		this.$wrapper
+			.find(".log-info")
+			.text(__("Showing lines {0} to {1} of {2}", [this.start_line + 1, this.offset, line_count]));
+	}
+
+	call(method, args, callback) {
+		frappe.call({
+			method: method,
+			args: { log_name: this.log_name, ...args },
+			callback: (r) => {
+				if (!r.message.success) {
+					frappe.show_alert({ message: __(r.message.message), indicator: "red" }, 5);
+					return;
+				}
+				callback(r.message.data);
+			},
+		});
+	}
+};
+
+// ? Show a BM Log in a dialog that follows new output until it is closed
+benchmate.open_log_tail_dialog = function (log_name, title) {
+	const dialog = new frappe.ui.Dialog({
+		title: title || log_name,
+		size: "extra-large",
+		fields: [{ fieldtype: "HTML", fieldname: "log_tail" }],
+		primary_action_label: __("Open Log"),
+		primary_action() {
+			frappe.set_route("Form", "BM Log", log_name);
+		},
+	});
+
+	const tail = new benchmate.LogTail({
+		wrapper: dialog.get_field("log_tail").$wrapper,
+		log_name: log_name,
+		on_status: (status) => {
+			dialog.set_title(`${title || log_name} (${__(status)})`);
+		},
+	}).start();
+
+	dialog.onhide = () => tail.stop();
+	dialog.show();
+	return dialog;
+};
@@ -0,0 +1,213 @@
+# Copyright (c) 2025, Karan Mistry and Contributors
+# See license.txt
+
+import copy
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from frappe.tests import UnitTestCase
+
+from benchmate.api.log_sink import LogSink
+from benchmate.api.logs import read_log_lines
+
+LOG_NAME = "Backup Site-0000001"
+
+
+class FakeDB:
+	"""
+	In-memory stand-in for the BM Log and BM Log Chunk tables with transactions and savepoints.
+	`fail_updates` makes that many `UPDATE tabBM Log` statements fail, e.g. on a lock wait timeout.
+	"""
+
+	def __init__(self, log: str = ""):
+		self.committed = {
+			"log": {"line_count": 0, "byte_count": 0, "status": "In Process", "log": log},
+			"chunks": [],
+		}
+		self.working = copy.deepcopy(self.committed)
+		self.savepoints = {}
+		self.fail_updates = 0
+
+	def savepoint(self, save_point: str):
+		self.savepoints[save_point] = copy.deepcopy(self.working)
+
+	def commit(self):
+		self.committed = copy.deepcopy(self.working)
+		self.savepoints = {}
+
+	def rollback(self, save_point: str | None = None):
+		self.working = copy.deepcopy(self.savepoints[save_point] if save_point else self.committed)
+
+	def get_value(self, doctype: str, name: str, fields, as_dict: bool = False):
+		log = self.working["log"]
+		if isinstance(fields, str):
+			return log[fields]
+		return SimpleNamespace(**{field: log[field] for field in fields})
+
+	def sql(self, query: str, values, as_dict: bool = False):
+		if query.startswith("UPDATE"):
+			if self.fail_updates:
+				self.fail_updates -= 1
+				raise Exception("Lock wait timeout exceeded; try restarting transaction")
+			log = self.working["log"]
+			log["line_count"] += values["lines"]
+			log["byte_count"] += values["bytes"]
+			log["status"] = values["status"] or log["status"]
+			return []
+
+		# ? Chunks overlapping a range of lines, by start line
+		_log_name, end, start = values
+		return [
+			SimpleNamespace(**chunk)
+			for chunk in sorted(self.working["chunks"], key=lambda chunk: chunk["start_line"])
+			if chunk["start_line"] < end and chunk["start_line"] + chunk["line_count"] > start
+		]
+
+	def insert_chunk(self, values: dict):
+		self.working["chunks"].append({key: values[key] for key in ("start_line", "line_count", "content")})
+
+
+class LogStorageTestCase(UnitTestCase):
+	"""
+	Base class patching `frappe` in the log modules with a FakeDB.
+	"""
+
+	def setUp(self):
+		self.db = FakeDB()
+		self.fake_frappe = SimpleNamespace(
+			db=self.db,
+			get_doc=lambda values: SimpleNamespace(insert=lambda **kwargs: self.db.insert_chunk(values)),
+			publish_realtime=Mock(),
+			log_error=Mock(),
+			throw=Mock(side_effect=Exception),
+			DoesNotExistError=Exception,
+		)
+		for module in ("benchmate.api.log_sink", "benchmate.api.logs"):
+			patcher = patch(f"{module}.frappe", self.fake_frappe)
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+	def committed_chunks(self) -> list[tuple[int, int, str]]:
+		return [
+			(chunk["start_line"], chunk["line_count"], chunk["content"])
+			for chunk in self.db.committed["chunks"]
+		]
+
+
+class TestLogSink(LogStorageTestCase):
+	"""
+	Unit tests for buffering, flushing and line numbering of LogSink.
+	"""
+
+	def test_incomplete_line_is_held_back(self):
+		sink = LogSink(LOG_NAME, flush_interval=3600)
+		sink.write("one\ntw")
+		sink.flush()
+		self.assertEqual(self.committed_chunks(), [(0, 1, "one\n")])
+
+		# ? The held back part is written with the rest of its line
+		sink.write("o\nthree")
+		sink.flush()
+		self.assertEqual(self.committed_chunks(), [(0, 1, "one\n"), (1, 1, "two\n")])
+
+		# ? Closing writes the incomplete last line
+		sink.close()
+		self.assertEqual(self.committed_chunks()[-1], (2, 1, "three"))
+		self.assertEqual(self.db.committed["log"]["line_count"], 3)
+		self.assertEqual(self.db.committed["log"]["byte_count"], len("one\ntwo\nthree"))
+
+		# ? Viewers get every written chunk with its start line
+		self.assertEqual(
+			[call.args[1]["start"] for call in self.fake_frappe.publish_realtime.call_args_list], [0, 1, 2]
+		)
+
+	def test_flush_when_buffer_is_full(self):
+		sink = LogSink(LOG_NAME, flush_bytes=10, flush_interval=3600)
+		sink.write("12345\n")
+		self.assertEqual(self.committed_chunks(), [])
+
+		sink.write("67890\n")
+		self.assertEqual(self.committed_chunks(), [(0, 2, "12345\n67890\n")])
+
+	def test_long_line_is_held_back_then_wrapped(self):
+		sink = LogSink(LOG_NAME, flush_bytes=10, flush_interval=3600, max_line_length=30)
+
+		# ? A line longer than the buffer is not split across chunks
+		sink.write("done\n" + "x" * 12)
+		sink.write("x" * 8)
+		self.assertEqual(self.committed_chunks(), [(0, 1, "done\n")])
+		sink.write("x" * 5 + "\n")
+		self.assertEqual(self.committed_chunks(), [(0, 1, "done\n"), (1, 1, "x" * 25 + "\n")])
+
+		# ? A line reaching the limit is wrapped, every stored line is counted once
+		sink.write("y" * 20)
+		sink.write("y" * 15)
+		self.assertEqual(self.committed_chunks()[-1], (2, 1, "y" * 35 + "\n"))
+		sink.write("z\n")
+		sink.close()
+		self.assertEqual(self.committed_chunks()[-1], (3, 1, "z\n"))
+		self.assertEqual(self.db.committed["log"]["line_count"], 4)
+		self.assertEqual(read_log_lines(LOG_NAME, start=1, end=3)["lines"], ["x" * 25, "y" * 35])
+
+	def test_failed_flush_is_retried(self):
+		sink = LogSink(LOG_NAME, flush_interval=3600)
+		sink.write("one\ntwo\n")
+
+		# ? The chunk is inserted, then the BM Log update fails
+		self.db.fail_updates = 1
+		sink.set_status("Success")
+		self.assertEqual(self.committed_chunks(), [])
+		self.assertEqual(self.db.working["chunks"], [])
+		self.fake_frappe.log_error.assert_called_once()
+
+		# ? Output and status are written once by the retry, without an orphan chunk
+		sink.write("three\n")
+		sink.close()
+		self.assertEqual(self.committed_chunks(), [(0, 3, "one\ntwo\nthree\n")])
+		self.assertEqual(self.db.committed["log"]["line_count"], 3)
+		self.assertEqual(self.db.committed["log"]["status"], "Success")
+
+
+class TestReadLogLines(LogStorageTestCase):
+	"""
+	Unit tests for ranged reads across the chunks of a BM Log.
+	"""
+
+	def setUp(self):
+		super().setUp()
+
+		# ? Chunks of lines 0-2, 3-5 and 6-9
+		sink = LogSink(LOG_NAME, flush_interval=3600)
+		for lines in (range(0, 3), range(3, 6), range(6, 10)):
+			sink.write("".join(f"line {line}\n" for line in lines))
+			sink.flush()
+		sink.set_status("Success")
+
+	def test_range_across_chunks(self):
+		data = read_log_lines(LOG_NAME, start=2, end=7)
+		self.assertEqual(data["lines"], [f"line {line}" for line in range(2, 7)])
+		self.assertEqual((data["start"], data["end"], data["line_count"]), (2, 7, 10))
+		self.assertEqual(data["status"], "Success")
+
+		# ? Ranges on chunk boundaries
+		self.assertEqual(read_log_lines(LOG_NAME, start=3, end=6)["lines"], ["line 3", "line 4", "line 5"])
+		self.assertEqual(read_log_lines(LOG_NAME, start=0, end=1)["lines"], ["line 0"])
+
+	def test_end_past_last_line(self):
+		data = read_log_lines(LOG_NAME, start=8, end=50)
+		self.assertEqual(data["lines"], ["line 8", "line 9"])
+		self.assertEqual(data["end"], 10)
+
+		data = read_log_lines(LOG_NAME, start=10)
+		self.assertEqual((data["lines"], data["start"], data["end"]), ([], 10, 10))
+
+	def test_tail(self):
+		self.assertEqual(read_log_lines(LOG_NAME, tail=4)["lines"], [f"line {line}" for line in range(6, 10)])
+		self.assertEqual(len(read_log_lines(LOG_NAME, tail=50)["lines"]), 10)
+
+	def test_unchunked_log(self):
+		self.fake_frappe.db = FakeDB(log="first\nsecond\nthird\n")
+
+		self.assertEqual(read_log_lines(LOG_NAME, start=1)["lines"], ["second", "third"])
+		data = read_log_lines(LOG_NAME, tail=1)
+		self.assertEqual((data["lines"], data["start"], data["line_count"]), (["third"], 2, 3))
@@ -0,0 +1,303 @@
+# Copyright (c) 2025, Karan Mistry and Contributors
+# See license.txt
+
+import json
+import os
+import queue
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from frappe.tests import UnitTestCase
+
+from benchmate.api.site_backup import (
+	MANIFEST_VERSION,
+	FileStore,
+	Restore,
+	Throughput,
+	backup_files,
+	find_manifest,
+	get_restore_path,
+	iter_member_lines,
+	iter_statements,
+	restore_files,
+	route_statement,
+	write_member,
+)
+
+# ? Excerpt of a mysqldump/mariadb-dump backup: a multi-line CREATE TABLE, a view placeholder
+# ? table created before the tables and the view itself created at the end
+MYSQLDUMP = """-- MariaDB dump 10.19  Distrib 10.6.16-MariaDB
+--
+-- Host: localhost    Database: _1bd3e0294da19198
+/*!40101 SET NAMES utf8mb4 */;
+/*!40014 SET @OLD_FOREIGN_KEY_CHECKS=@@FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS=0 */;
+
+--
+-- Table structure for table `tabNote`
+--
+
+DROP TABLE IF EXISTS `tabNote`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+CREATE TABLE `tabNote` (
+  `name` varchar(140) NOT NULL,
+  `content` longtext DEFAULT NULL,
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+LOCK TABLES `tabNote` WRITE;
+/*!40000 ALTER TABLE `tabNote` DISABLE KEYS */;
+INSERT INTO `tabNote` VALUES ('n1','a;\\nb;'),('n2',NULL);
+/*!40000 ALTER TABLE `tabNote` ENABLE KEYS */;
+UNLOCK TABLES;
+
+--
+-- Temporary table structure for view `tab``Report`
+--
+
+DROP TABLE IF EXISTS `tab``Report`;
+/*!50001 DROP VIEW IF EXISTS `tab``Report`*/;
+/*!50001 CREATE TABLE `tab``Report` (
+  `name` tinyint NOT NULL
+) ENGINE=MyISAM */;
+
+--
+-- Final view structure for view `tab``Report`
+--
+
+/*!50001 DROP TABLE IF EXISTS `tab``Report`*/;
+/*!50001 DROP VIEW IF EXISTS `tab``Report`*/;
+/*!50001 CREATE ALGORITHM=UNDEFINED */
+/*!50001 VIEW `tab``Report` AS select `tabNote`.`name` AS `name` from `tabNote` */;
+"""
+
+
+class TestSiteBackupDump(UnitTestCase):
+	"""
+	Unit tests for splitting and locating the statements of a dump.
+	"""
+
+	def test_iter_statements(self):
+		statements = list(iter_statements(MYSQLDUMP.splitlines(keepends=True)))
+
+		# ? Comments are dropped, multi-line statements are kept whole
+		self.assertFalse([statement for statement in statements if statement.startswith("--")])
+		self.assertIn(
+			"CREATE TABLE `tabNote` (\n  `name` varchar(140) NOT NULL,\n  `content` longtext DEFAULT NULL,\n"
+			"  PRIMARY KEY (`name`)\n) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;",
+			statements,
+		)
+		self.assertIn("INSERT INTO `tabNote` VALUES ('n1','a;\\nb;'),('n2',NULL);", statements)
+		self.assertIn(
+			"/*!50001 CREATE TABLE `tab``Report` (\n  `name` tinyint NOT NULL\n) ENGINE=MyISAM */;",
+			statements,
+		)
+		self.assertEqual(
+			statements[-1],
+			"/*!50001 CREATE ALGORITHM=UNDEFINED */\n"
+			"/*!50001 VIEW `tab``Report` AS select `tabNote`.`name` AS `name` from `tabNote` */;",
+		)
+		self.assertEqual(len(statements), 17)
+
+	def test_route_statements(self):
+		routes = [route_statement(statement) for statement in iter_statements(MYSQLDUMP.splitlines(True))]
+
+		self.assertEqual(
+			routes,
+			[
+				("session", None),
+				("session", None),
+				("table", "tabNote"),
+				("session", None),
+				("table", "tabNote"),
+				("session", None),
+				("skip", None),
+				("table", "tabNote"),
+				("table", "tabNote"),
+				("table", "tabNote"),
+				("skip", None),
+				# ? The placeholder is dropped through its table, the view is created at the end
+				("table", "tab`Report"),
+				("deferred", None),
+				("table", "tab`Report"),
+				("table", "tab`Report"),
+				("deferred", None),
+				("deferred", None),
+			],
+		)
+
+	def test_split_sends_a_table_to_one_worker(self):
+		# ? Another table between the view placeholder and the final view
+		table = (
+			"--\n-- Table structure for table `tabToDo`\n--\n\n"
+			"DROP TABLE IF EXISTS `tabToDo`;\n"
+			"CREATE TABLE `tabToDo` (\n  `name` varchar(140) NOT NULL,\n  PRIMARY KEY (`name`)\n) ENGINE=InnoDB;\n"
+			+ "".join(f"INSERT INTO `tabToDo` VALUES ('t{i}');\n" for i in range(4))
+			+ "\n"
+		)
+		dump = MYSQLDUMP.replace("--\n-- Final view structure", table + "--\n-- Final view structure")
+
+		# ? Split over in-process queues without workers, then read what each worker would run
+		restore = Restore({"db_name": "_1bd3e0294da19198"}, "", Path("dump.sql"), jobs=2)
+		restore.ctx = SimpleNamespace(Queue=lambda maxsize: queue.Queue())
+		restore.start = Mock()
+		restore.run_statements = Mock()
+		with patch("benchmate.api.site_backup.iter_dump_lines", return_value=dump.splitlines(True)):
+			restore.load_by_splitting()
+
+		tables = []
+		for inbox in restore.queues[1:]:
+			messages = [inbox.get_nowait() for _ in range(inbox.qsize())]
+			tables.append([value for kind, value in filter(None, messages) if kind == "table"])
+
+		# ? The later drop of the placeholder goes to the worker that created it, before the view
+		self.assertEqual(tables, [["tabNote"], ["tab`Report", "tabToDo", "tab`Report"]])
+		self.assertEqual(
+			restore.run_statements.call_args.args[0][-1],
+			"/*!50001 CREATE ALGORITHM=UNDEFINED */\n"
+			"/*!50001 VIEW `tab``Report` AS select `tabNote`.`name` AS `name` from `tabNote` */;",
+		)
+
+	def test_find_manifest(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			tmp = Path(tmp)
+			database_path = tmp / "20250101_000000-a_localhost-database.sql.gz"
+			texts = {
+				"header": "SET FOREIGN_KEY_CHECKS=0;\n",
+				"tabNote": "DROP TABLE IF EXISTS `tabNote`;\nINSERT INTO `tabNote` VALUES ('n1');\n",
+				"footer": "SET FOREIGN_KEY_CHECKS=1;\n",
+			}
+
+			# ? Join the members like `dump` does, recording their offsets
+			entries = {}
+			with open(database_path, "wb") as out:
+				for name, text in texts.items():
+					part = tmp / f"{name}.sql.gz"
+					entries[name] = {"name": name, "offset": out.tell(), **write_member(part, text, 1)}
+					out.write(part.read_bytes())
+
+			manifest = {
+				"version": MANIFEST_VERSION,
+				"database": database_path.name,
+				"header": entries["header"],
+				"tables": [entries["tabNote"]],
+				"footer": entries["footer"],
+			}
+			manifest_path = tmp / "20250101_000000-a_localhost-database.json"
+			manifest_path.write_text(json.dumps(manifest))
+
+			self.assertEqual(find_manifest(database_path), manifest)
+			for name, text in texts.items():
+				self.assertEqual("".join(iter_member_lines(database_path, entries[name])), text)
+
+			# ? A member that does not match its checksum is refused once read
+			with self.assertRaises(ValueError):
+				list(iter_member_lines(database_path, {**entries["tabNote"], "sha256": "0" * 64}))
+
+			# ? Another version or a footer that does not end the dump
+			manifest_path.write_text(json.dumps({**manifest, "version": MANIFEST_VERSION + 1}))
+			self.assertIsNone(find_manifest(database_path))
+			manifest_path.write_text(
+				json.dumps(
+					{**manifest, "footer": {**entries["footer"], "offset": entries["footer"]["offset"] - 1}}
+				)
+			)
+			self.assertIsNone(find_manifest(database_path))
+
+			# ? A dump appended to after the manifest was written
+			manifest_path.write_text(json.dumps(manifest))
+			with open(database_path, "ab") as out:
+				out.write(b"\0")
+			self.assertIsNone(find_manifest(database_path))
+
+			# ? Only `-database.sql.gz` dumps have a manifest
+			self.assertIsNone(find_manifest(database_path.with_name("backup.sql.gz")))
+
+
+class TestSiteBackupFiles(UnitTestCase):
+	"""
+	Unit tests for the deduplicated file store and the files manifest.
+	"""
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.sites_path = Path(self.tmp.name)
+		self.cwd = os.getcwd()
+		os.chdir(self.sites_path)
+
+	def tearDown(self):
+		os.chdir(self.cwd)
+		self.tmp.cleanup()
+
+	def write_file(self, path: str, data: bytes):
+		path = self.sites_path / path
+		path.parent.mkdir(parents=True, exist_ok=True)
+		path.write_bytes(data)
+
+	def test_file_store(self):
+		store = FileStore(self.sites_path / "store")
+		text, random = b"frappe " * 10000, os.urandom(10000)
+
+		text_digest, written = store.put(text)
+		self.assertLess(written, len(text))
+		self.assertTrue(store.object_path(text_digest).with_name(f"{text_digest}.z").is_file())
+
+		random_digest, written = store.put(random)
+		self.assertEqual(written, len(random))
+		self.assertTrue(store.object_path(random_digest).is_file())
+
+		# ? Chunks are stored once
+		self.assertEqual(store.put(text), (text_digest, 0))
+		self.assertEqual(store.get(text_digest), text)
+		self.assertEqual(store.get(random_digest), random)
+
+		store.object_path(random_digest).write_bytes(b"corrupt")
+		with self.assertRaises(ValueError):
+			store.get(random_digest)
+
+	def test_backup_and_restore_files(self):
+		self.write_file("a.localhost/public/files/logo.png", os.urandom(5000))
+		self.write_file("a.localhost/private/files/notes/report.txt", b"report " * 1000)
+		(self.sites_path / "a.localhost/private/files/empty").mkdir()
+
+		store = FileStore(self.sites_path / "a.localhost/private/file-store")
+		first_path = self.sites_path / "first-files.json"
+		stats = backup_files("a.localhost", store, first_path, jobs=2)
+		self.assertEqual((stats["files"], stats["changed_files"]), (2, 2))
+		self.assertGreater(stats["written_bytes"], 0)
+
+		# ? Unchanged files are neither read nor written again
+		second_path = self.sites_path / "second-files.json"
+		stats = backup_files("a.localhost", store, second_path, jobs=2)
+		self.assertEqual((stats["changed_files"], stats["written_bytes"]), (0, 0))
+		self.assertEqual(json.loads(second_path.read_text())["stats"]["written_bytes"], 0)
+
+		written = restore_files(second_path, "b.localhost", jobs=2, throughput=Throughput())
+		self.assertEqual(written, 2)
+		for path in ("public/files/logo.png", "private/files/notes/report.txt"):
+			self.assertEqual(
+				(self.sites_path / "b.localhost" / path).read_bytes(),
+				(self.sites_path / "a.localhost" / path).read_bytes(),
+			)
+		self.assertTrue((self.sites_path / "b.localhost/private/files/empty").is_dir())
+
+		# ? Files already in place are kept
+		self.assertEqual(restore_files(second_path, "b.localhost", jobs=2, throughput=Throughput()), 0)
+
+		# ? Chunks only the deleted manifests referred to are pruned, chunks still in use are kept
+		self.write_file("a.localhost/public/files/logo.png", b"new logo")
+		first_path.unlink()
+		second_path.unlink()
+		stats = backup_files("a.localhost", store, self.sites_path / "third-files.json", jobs=2)
+		self.assertEqual((stats["written_bytes"], stats["pruned_objects"]), (len(b"new logo"), 1))
+
+	def test_get_restore_path(self):
+		root = self.sites_path / "a.localhost" / "public" / "files"
+
+		self.assertEqual(get_restore_path(root, "a/b.txt"), root / "a" / "b.txt")
+		self.assertEqual(get_restore_path(root, "a/../b.txt"), root / "b.txt")
+		for path in ("../b.txt", "a/../../b.txt", "/etc/passwd", ".", ""):
+			with self.assertRaises(ValueError, msg=path):
+				get_restore_path(root, path)
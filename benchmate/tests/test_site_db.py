@@ -0,0 +1,129 @@
+# Copyright (c) 2025, Karan Mistry and Contributors
+# See license.txt
+
+import json
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from frappe.tests import UnitTestCase
+
+from benchmate.api.site_db import SiteDBReader, read_site_config
+from benchmate.api.sync import get_site_apps
+
+DB_NAME = "_1bd3e0294da19198"
+INSTALLED_APPS = ["frappe", "erpnext", "benchmate"]
+
+
+class TestSiteDBReader(UnitTestCase):
+	"""
+	Unit tests for SiteDBReader.
+	A SQLite database attached under the site's db_name stands in for MariaDB.
+	"""
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.bench_path = Path(self.tmp.name) / "frappe-bench"
+		self.db_path = Path(self.tmp.name) / f"{DB_NAME}.sqlite"
+
+		site_path = self.bench_path / "sites" / "site1.local"
+		site_path.mkdir(parents=True)
+		(self.bench_path / "sites" / "common_site_config.json").write_text(json.dumps({"db_host": "db"}))
+		(site_path / "site_config.json").write_text(json.dumps({"db_name": DB_NAME, "db_password": "secret"}))
+
+		with sqlite3.connect(self.db_path) as conn:
+			conn.execute("CREATE TABLE tabDefaultValue (parent TEXT, defkey TEXT, defvalue TEXT)")
+			conn.execute(
+				"INSERT INTO tabDefaultValue VALUES ('__global', 'installed_apps', ?)",
+				(json.dumps(INSTALLED_APPS),),
+			)
+		self.connect_calls = []
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def connect(self, **kwargs):
+		"""Connection factory attaching the site database under its db_name."""
+		self.connect_calls.append(kwargs)
+		conn = sqlite3.connect(":memory:")
+		conn.execute(f"ATTACH DATABASE '{self.db_path}' AS `{DB_NAME}`")
+		return conn
+
+	def test_installed_apps_from_site_database(self):
+		reader = SiteDBReader(connect=self.connect)
+		try:
+			self.assertEqual(reader.get_installed_apps(self.bench_path, "site1.local"), INSTALLED_APPS)
+		finally:
+			reader.close()
+
+		# ? Site credentials are used on the host from common_site_config.json
+		self.assertEqual(
+			self.connect_calls,
+			[{"host": "db", "port": 3306, "user": DB_NAME, "password": "secret"}],
+		)
+
+	def test_connections_are_reused(self):
+		reader = SiteDBReader(root_password="root", connect=self.connect)
+		try:
+			for _ in range(3):
+				reader.get_installed_apps(self.bench_path, "site1.local")
+		finally:
+			reader.close()
+
+		self.assertEqual(len(self.connect_calls), 1)
+		self.assertEqual(self.connect_calls[0]["user"], "root")
+
+	def test_failed_connection_is_discarded(self):
+		reader = SiteDBReader(connect=self.connect)
+		try:
+			site_config = read_site_config(self.bench_path, "site1.local")
+			with reader._get_pool(site_config).connection() as conn:
+				conn.close()
+
+			# ? The closed connection was returned, the query fails and it is dropped from the pool
+			with self.assertRaises(sqlite3.ProgrammingError):
+				reader.get_installed_apps(self.bench_path, "site1.local")
+			self.assertEqual(reader.get_installed_apps(self.bench_path, "site1.local"), INSTALLED_APPS)
+		finally:
+			reader.close()
+
+		self.assertEqual(len(self.connect_calls), 2)
+
+	def test_missing_installed_apps(self):
+		with sqlite3.connect(self.db_path) as conn:
+			conn.execute("DELETE FROM tabDefaultValue")
+
+		reader = SiteDBReader(connect=self.connect)
+		try:
+			with self.assertRaises(ValueError):
+				reader.get_installed_apps(self.bench_path, "site1.local")
+		finally:
+			reader.close()
+
+	def test_invalid_db_name(self):
+		site_config = self.bench_path / "sites" / "site1.local" / "site_config.json"
+		site_config.write_text(json.dumps({"db_name": "x`; DROP TABLE y", "db_password": "secret"}))
+
+		reader = SiteDBReader(connect=self.connect)
+		with self.assertRaises(ValueError):
+			reader.get_installed_apps(self.bench_path, "site1.local")
+		self.assertEqual(self.connect_calls, [])
+
+	def test_site_apps_fall_back_to_list_apps(self):
+		bench_apps = {app: {"app_name": app} for app in INSTALLED_APPS}
+		reader = SiteDBReader(connect=self.connect)
+		self.db_path.unlink()
+
+		with (
+			patch(
+				"benchmate.api.sync.run_site_cmd", return_value=('["frappe", "benchmate"]', None)
+			) as list_apps,
+			patch("benchmate.api.sync._log_error"),
+		):
+			site_apps, error = get_site_apps(self.bench_path, "site1.local", bench_apps, reader)
+		reader.close()
+
+		list_apps.assert_called_once()
+		self.assertIsNone(error)
+		self.assertEqual(list(site_apps), ["frappe", "benchmate"])